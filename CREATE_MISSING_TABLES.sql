@@ -33,4 +33,119 @@ CREATE TABLE reminders (
   created_at TEXT NOT NULL
 );
 
+-- 4. Product full-text search (used by /shop/search in app_supabase.py)
+ALTER TABLE products ADD COLUMN IF NOT EXISTS fts TSVECTOR
+  GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(category, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+  ) STORED;
+
+CREATE INDEX IF NOT EXISTS products_fts_idx ON products USING GIN (fts);
+
+-- Discounted price; the search functions below rank and band products by it when it is lower
+ALTER TABLE products ADD COLUMN IF NOT EXISTS sale_price NUMERIC;
+
+-- One ranked page of product IDs plus the total number of matches
+CREATE OR REPLACE FUNCTION search_products(q TEXT, selected_category TEXT, min_price NUMERIC, max_price NUMERIC, lim INT, off INT)
+RETURNS TABLE (id BIGINT, total BIGINT)
+LANGUAGE sql STABLE AS $$
+  WITH matched AS (
+    SELECT p.id, p.name, p.category,
+           CASE WHEN q IS NULL THEN 0 ELSE ts_rank_cd(p.fts, to_tsquery('simple', q)) END AS rank,
+           CASE WHEN p.sale_price IS NOT NULL AND p.sale_price < p.price THEN p.sale_price ELSE p.price END AS effective_price
+    FROM products p
+    WHERE q IS NULL OR p.fts @@ to_tsquery('simple', q)
+  )
+  SELECT m.id::BIGINT, COUNT(*) OVER ()
+  FROM matched m
+  WHERE (selected_category IS NULL OR m.category = selected_category)
+    AND (min_price IS NULL OR m.effective_price >= min_price)
+    AND (max_price IS NULL OR m.effective_price < max_price)
+  ORDER BY m.rank DESC, m.category, m.name, m.id
+  LIMIT lim OFFSET off;
+$$;
+
+-- Category and price-band counts; each facet ignores its own filter.
+-- Price bands are numbered by width_bucket() over band_edges, the inner edges of
+-- SUPABASE_PRICE_BANDS in product_search.py (0 = below the first edge).
+CREATE OR REPLACE FUNCTION product_search_facets(q TEXT, selected_category TEXT, min_price NUMERIC, max_price NUMERIC,
+                                                 band_edges NUMERIC[])
+RETURNS TABLE (facet TEXT, value TEXT, count BIGINT)
+LANGUAGE sql STABLE AS $$
+  WITH matched AS (
+    SELECT p.category,
+           CASE WHEN p.sale_price IS NOT NULL AND p.sale_price < p.price THEN p.sale_price ELSE p.price END AS effective_price
+    FROM products p
+    WHERE q IS NULL OR p.fts @@ to_tsquery('simple', q)
+  )
+  SELECT 'category', m.category, COUNT(*)
+  FROM matched m
+  WHERE (min_price IS NULL OR m.effective_price >= min_price)
+    AND (max_price IS NULL OR m.effective_price < max_price)
+  GROUP BY m.category
+  UNION ALL
+  SELECT 'price', b.band::TEXT, COUNT(*)
+  FROM (
+    SELECT width_bucket(m.effective_price::NUMERIC, band_edges) AS band
+    FROM matched m
+    WHERE selected_category IS NULL OR m.category = selected_category
+  ) b
+  GROUP BY b.band;
+$$;
+
+-- 5. Reminder dispatch (reminders.py): absolute due time, range-scanned by the scheduler
+ALTER TABLE reminders ADD COLUMN IF NOT EXISTS due_at TEXT;
+CREATE INDEX IF NOT EXISTS reminders_due_idx ON reminders (due_at, id);
+
+-- 6. Repeating reminders (recurrence.py): one row per rule, occurrences are never stored
+CREATE TABLE IF NOT EXISTS reminder_rules (
+  id BIGINT PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
+  user_id TEXT NOT NULL REFERENCES users(email),
+  message TEXT NOT NULL,
+  freq TEXT NOT NULL,
+  every INTEGER NOT NULL DEFAULT 1,
+  by_time TEXT,
+  by_day TEXT,
+  starts_at TEXT NOT NULL,
+  until_at TEXT,
+  max_count INTEGER,
+  next_due TEXT,
+  created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS reminder_rules_due_idx ON reminder_rules (next_due, id);
+CREATE INDEX IF NOT EXISTS reminder_rules_user_idx ON reminder_rules (user_id);
+
+-- 7. Reminder delivery claims (reminders.py): one row per sent or cancelled reminder, shared by all instances
+CREATE TABLE IF NOT EXISTS reminder_deliveries (
+  reminder_key TEXT PRIMARY KEY,
+  fired_at TEXT NOT NULL
+);
+
+-- 8. Outgoing email queue (mail_outbox.py, SupabaseMailOutbox): request handlers insert, a sender drains
+CREATE TABLE IF NOT EXISTS email_outbox (
+  id BIGINT PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
+  recipient TEXT NOT NULL,
+  subject TEXT NOT NULL,
+  body TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'pending',
+  attempts INTEGER NOT NULL DEFAULT 0,
+  next_attempt_at TEXT NOT NULL,
+  last_error TEXT,
+  created_at TEXT NOT NULL,
+  sent_at TEXT
+);
+CREATE INDEX IF NOT EXISTS email_outbox_due_idx ON email_outbox (status, next_attempt_at);
+
+-- 9. Admin digest events (admin_digest.py, SupabaseAdminDigest): digest_id is the outbox row they went out in
+CREATE TABLE IF NOT EXISTS notification_events (
+  id BIGINT PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
+  kind TEXT NOT NULL,
+  summary TEXT NOT NULL,
+  link TEXT,
+  created_at TEXT NOT NULL,
+  digest_id BIGINT
+);
+CREATE INDEX IF NOT EXISTS notification_events_pending_idx ON notification_events (digest_id, created_at);
+
 -- Tables created!
@@ -0,0 +1,165 @@
+"""Digest batching for admin notification emails.
+
+Routine events (subscription requests, new contact messages) are stored in
+``notification_events`` and coalesced into one digest email per
+ADMIN_DIGEST_WINDOW seconds (default 900). Event kinds listed in
+ADMIN_DIGEST_PRIORITY skip the digest and are queued immediately. Digests are
+flushed from the mail outbox thread, so they also go out through the outbox.
+
+``SupabaseAdminDigest`` keeps the events in a Supabase ``notification_events``
+table next to ``SupabaseMailOutbox``'s queue, so all instances share one digest.
+"""
+import sqlite3
+from datetime import datetime, timedelta
+
+from mail_outbox import subject_line
+
+TIME_FMT = "%Y-%m-%d %H:%M:%S"
+
+EVENT_LABELS = {
+    'subscription_request': 'Subscription request',
+    'contact_message': 'New contact message',
+}
+
+
+class AdminDigest:
+
+    def __init__(self, db_path, config, outbox):
+        self.db_path = db_path
+        self.config = config
+        self.outbox = outbox
+        self._ready = False
+        outbox.add_producer(self.flush_due)
+
+    def _connect(self):
+        if not self._ready:
+            # Make sure email_outbox exists before we enqueue inside our own transaction
+            self.outbox._connect().close()
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._ready:
+            conn.execute('''CREATE TABLE IF NOT EXISTS notification_events
+                            (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                             kind TEXT NOT NULL,
+                             summary TEXT NOT NULL,
+                             link TEXT,
+                             created_at TEXT NOT NULL,
+                             digest_id INTEGER)''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_notification_events_pending ON notification_events(digest_id, created_at)")
+            conn.commit()
+            self._ready = True
+        return conn
+
+    def window(self):
+        return int(self.config.get('ADMIN_DIGEST_WINDOW', 900))
+
+    def priority_kinds(self):
+        """ADMIN_DIGEST_PRIORITY as a set: a list, or a comma-separated string as set from .env."""
+        kinds = self.config.get('ADMIN_DIGEST_PRIORITY') or ()
+        if isinstance(kinds, str):
+            kinds = kinds.split(',')
+        return {kind.strip() for kind in kinds if kind.strip()}
+
+    def record(self, kind, summary, link=None):
+        """Queue ``kind`` for the next digest, or send it now if it is a priority kind."""
+        if not self.outbox.is_configured():
+            return False
+        label = EVENT_LABELS.get(kind, kind)
+        if kind in self.priority_kinds() or self.window() <= 0:
+            body = summary + (f"\n\n{link}" if link else '')
+            return self.outbox.enqueue(subject_line(f"{label}: {summary}"), body) is not None
+        self._store(kind, summary, link, datetime.now().strftime(TIME_FMT))
+        self.outbox.start()
+        return True
+
+    def _store(self, kind, summary, link, created_at):
+        conn = self._connect()
+        try:
+            conn.execute("INSERT INTO notification_events (kind, summary, link, created_at) VALUES (?, ?, ?, ?)",
+                         (kind, summary, link, created_at))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def flush_due(self):
+        """Send one digest if the oldest undigested event is older than the window."""
+        cutoff = (datetime.now() - timedelta(seconds=self.window())).strftime(TIME_FMT)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            oldest = conn.execute("SELECT MIN(created_at) FROM notification_events WHERE digest_id IS NULL").fetchone()[0]
+            if not oldest or oldest > cutoff:
+                conn.commit()
+                return 0
+            rows = conn.execute("""SELECT id, kind, summary, link, created_at FROM notification_events
+                                   WHERE digest_id IS NULL ORDER BY id""").fetchall()
+            subject, body = self._compose(rows)
+            digest_id = self.outbox.enqueue(subject, body, conn=conn)
+            if digest_id is None:
+                conn.commit()
+                return 0
+            conn.executemany("UPDATE notification_events SET digest_id = ? WHERE id = ?",
+                             [(digest_id, r[0]) for r in rows])
+            conn.commit()
+            return len(rows)
+        finally:
+            conn.close()
+
+    def _compose(self, rows):
+        groups = {}
+        for _, kind, summary, link, created_at in rows:
+            groups.setdefault(kind, {'items': [], 'link': None})
+            groups[kind]['items'].append(f"  - {summary} ({created_at})")
+            groups[kind]['link'] = link or groups[kind]['link']
+
+        counts = ', '.join(f"{len(g['items'])} {EVENT_LABELS.get(k, k).lower()}(s)" for k, g in groups.items())
+        subject = f"Dream Baby Care admin digest: {counts}"
+        parts = []
+        for kind, group in groups.items():
+            section = f"{EVENT_LABELS.get(kind, kind)}s ({len(group['items'])}):\n" + "\n".join(group['items'])
+            if group['link']:
+                section += f"\n\nReview them here: {group['link']}"
+            parts.append(section)
+        return subject, "\n\n".join(parts) + "\n\n--\nDream Baby Care"
+
+
+class SupabaseAdminDigest(AdminDigest):
+    """The same digest over the Supabase ``notification_events`` table.
+
+    Events being flushed are claimed by setting ``digest_id`` to 0 where it is
+    still NULL, so two instances never put the same event in a digest.
+    """
+
+    def __init__(self, client, config, outbox):
+        super().__init__(None, config, outbox)
+        self._client = client
+
+    @property
+    def client(self):
+        return self._client() if callable(self._client) else self._client
+
+    def _store(self, kind, summary, link, created_at):
+        self.client.table('notification_events').insert(
+            {'kind': kind, 'summary': summary, 'link': link, 'created_at': created_at}).execute()
+
+    def flush_due(self):
+        cutoff = (datetime.now() - timedelta(seconds=self.window())).strftime(TIME_FMT)
+        oldest = (self.client.table('notification_events').select('created_at').is_('digest_id', 'null')
+                  .order('created_at').limit(1).execute().data or [])
+        if not oldest or oldest[0]['created_at'] > cutoff:
+            return 0
+        pending = self.client.table('notification_events').select('id').is_('digest_id', 'null').execute().data or []
+        claimed = (self.client.table('notification_events').update({'digest_id': 0})
+                   .in_('id', [r['id'] for r in pending]).is_('digest_id', 'null').execute().data or [])
+        if not claimed:
+            return 0
+        ids = [r['id'] for r in claimed]
+        rows = [(r['id'], r['kind'], r['summary'], r['link'], r['created_at'])
+                for r in sorted(claimed, key=lambda r: r['id'])]
+        try:
+            digest_id = self.outbox.enqueue(*self._compose(rows))
+        except Exception:
+            digest_id = None
+        # Record the digest, or hand the events back to the next flush if it could not be queued
+        (self.client.table('notification_events').update({'digest_id': digest_id})
+         .in_('id', ids).eq('digest_id', 0).execute())
+        return len(rows) if digest_id is not None else 0
@@ -0,0 +1,64 @@
+"""In-memory admin statistics refreshed in the background.
+
+The admin dashboard, subscription management and appointments pages read
+their counters from a snapshot held in memory instead of recomputing them on
+every load. A daemon thread reloads the snapshot every ``interval`` seconds,
+and write paths call ``invalidate()`` to have it reloaded straight away.
+Each snapshot carries a ``refreshed_at`` timestamp so pages can show how fresh
+the numbers are.
+"""
+import threading
+from datetime import datetime
+
+
+class AdminStats:
+
+    def __init__(self, loader, interval=30):
+        self.loader = loader
+        self.interval = interval
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        """Reload the counters now and return the new snapshot."""
+        data = dict(self.loader())
+        data['refreshed_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._snapshot = data
+        return data
+
+    def get(self):
+        """Return the current snapshot, loading it synchronously the first time."""
+        self._start()
+        snapshot = self._snapshot
+        if snapshot is None:
+            try:
+                snapshot = self.refresh()
+            except Exception:
+                return {}
+        return snapshot
+
+    def invalidate(self):
+        """Ask the refresher to reload soon (call after writes that change counts)."""
+        self._start()
+        self._wake.set()
+
+    def _start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='admin-stats', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.refresh()
+            except Exception:
+                pass
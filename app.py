@@ -1,27 +1,48 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash, send_from_directory, abort
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash, send_from_directory, abort, g
 from functools import wraps
 from datetime import datetime, timedelta
 import os
-import json
 import sqlite3
-from translations import translations
-import smtplib
-from email.message import EmailMessage
 from urllib.parse import quote
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from server_session import SQLiteSessionStore, CachedSessionStore, ServerSideSessionInterface
+from audit_log import AdminActionLog
+from mail_outbox import MailOutbox
+from admin_digest import AdminDigest
+from reminders import (ReminderScheduler, SQLiteReminderSource, SQLiteRuleSource, OutboxSink, LogSink,
+                       due_at_for, rule_summaries)
+from recurrence import rule_from_form
+from admin_stats import AdminStats
+from catalog import ProductCatalog, SQLiteCatalogVersion
+from product_search import SQLiteProductSearch
+from http_cache import ConditionalGet, build_id_for, make_etag
+from fragment_cache import FragmentCache, FragmentCacheExtension
+import template_cache
+import assets
+import fontawesome
+import stylesheets
+import svg_sprite
+import image_variants
+from compression import CompressionMiddleware
+from lazy_imports import LazyMapping, lazy_client
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Supabase
+# Initialize Supabase lazily: the SDK is only imported and the client only built on first use
 SUPABASE_URL = os.environ.get('SUPABASE_URL')
 SUPABASE_KEY = os.environ.get('SUPABASE_KEY')
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables are required")
+def create_supabase_client():
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables are required")
+    from supabase import create_client
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+get_supabase = lazy_client(create_supabase_client)
+
+# UI strings for every language, imported on first use (see lazy_imports.py)
+translations = LazyMapping('translations', 'translations')
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key_here'  # Change this in production
@@ -29,6 +50,10 @@ app.secret_key = 'your_secret_key_here'  # Change this in production
 app.config['ADMIN_USER'] = 'admin'
 app.config['ADMIN_PASS'] = 'admin123'
 
+# Server-side sessions: the cookie only carries an opaque ID, data lives in babycare.db
+session_store = CachedSessionStore(SQLiteSessionStore('babycare.db'), maxsize=2048, ttl=5)
+app.session_interface = ServerSideSessionInterface(session_store)
+
 # Jinja filter to format numbers as Indian Rupees
 def format_inr(value):
     try:
@@ -39,6 +64,32 @@ def format_inr(value):
 
 app.jinja_env.filters['inr'] = format_inr
 
+# {% cache name, key... %} blocks in templates store rendered HTML here (see fragment_cache.py)
+fragment_cache = FragmentCache(maxsize=256)
+app.jinja_env.add_extension(FragmentCacheExtension)
+app.jinja_env.fragment_cache = fragment_cache
+
+# Templates load from the bytecode cache that check_templates.py precompiles (see template_cache.py)
+template_stats = template_cache.install(app)
+
+# Fingerprinted, precompressed static files built by `python assets.py` (see assets.py)
+asset_manifest = assets.install(app)
+
+# Icon stylesheet: local subset built by `python fontawesome.py`, else the CDN copy
+fontawesome.install(app)
+
+# Purged Bootstrap + styles.css and inline critical CSS built by `python stylesheets.py`
+stylesheets.install(app)
+
+# Resized/WebP variants of local product photos, served from /img (see image_variants.py)
+image_store, responsive_image = image_variants.install(app)
+
+# Product icons from one SVG sprite built by `python svg_sprite.py`; product_image() in templates
+svg_sprite.install(app, raster=responsive_image, remote_srcset=image_variants.remote_srcset)
+
+# gzip/brotli for HTML and JSON responses, streamed chunk by chunk (see compression.py)
+app.wsgi_app = CompressionMiddleware(app.wsgi_app)
+
 # Helper decorator to require login for certain routes
 def login_required(f):
     @wraps(f)
@@ -69,7 +120,7 @@ def admin_required(f):
         user_email = session.get('user_id')
         if user_email:
             try:
-                response = supabase.table('users').select('is_admin').eq('email', user_email).execute()
+                response = get_supabase().table('users').select('is_admin').eq('email', user_email).execute()
                 if response.data and len(response.data) > 0:
                     if int(response.data[0]['is_admin'] or 0) == 1:
                         return f(*args, **kwargs)
@@ -87,7 +138,7 @@ def init_db():
     """
     try:
         # Check if products exist
-        response = supabase.table('products').select('id').limit(1).execute()
+        response = get_supabase().table('products').select('id').limit(1).execute()
         if not response.data:
             # Insert sample products
             sample_products = [
@@ -102,17 +153,17 @@ def init_db():
                 {'name': 'Pacifiers - 2 Pack', 'description': 'Orthodontic pacifiers for newborns', 'price': 200.00, 'image': 'https://images.unsplash.com/photo-1596464716127-f9a0859d0437?auto=format&fit=crop&w=500', 'category': 'Comfort'},
                 {'name': 'Baby Thermometer', 'description': 'Digital thermometer for accurate temperature reading', 'price': 300.00, 'image': 'https://images.unsplash.com/photo-1584634731339-252c581abfc5?auto=format&fit=crop&w=500', 'category': 'Health'},
             ]
-            supabase.table('products').insert(sample_products).execute()
+            get_supabase().table('products').insert(sample_products).execute()
 
         # Check if doctors exist
-        response = supabase.table('doctors').select('id').limit(1).execute()
+        response = get_supabase().table('doctors').select('id').limit(1).execute()
         if not response.data:
             # Insert sample doctors
             sample_doctors = [
                 {'name': 'Dr. Sarah Smith', 'specialization': 'Pediatrician', 'email': 'sarah.smith@clinic.com', 'password': 'doc123', 'image': 'https://images.unsplash.com/photo-1559839734-2b71ea197ec2?auto=format&fit=crop&w=500', 'phone': '+1234567890', 'video_link': 'https://meet.google.com/abc-defg-hij'},
                 {'name': 'Dr. John Doe', 'specialization': 'Child Psychologist', 'email': 'john.doe@clinic.com', 'password': 'doc123', 'image': 'https://images.unsplash.com/photo-1612349317150-e413f6a5b16d?auto=format&fit=crop&w=500', 'phone': '+1987654321', 'video_link': 'https://meet.google.com/xyz-uvwx-yz'}
             ]
-            supabase.table('doctors').insert(sample_doctors).execute()
+            get_supabase().table('doctors').insert(sample_doctors).execute()
     except Exception as e:
         print(f"Error initializing database: {e}")
 
@@ -124,13 +175,14 @@ def ensure_session_id():
     # Also load user language if logged in (existing logic moved here/kept)
     if 'user_id' in session and 'language' not in session:
         load_user_language()
+    reminder_scheduler.start()
 
 # Global language loader
 @app.before_request
 def load_user_language():
     if 'user_id' in session:
         try:
-            response = supabase.table('users').select('language').eq('email', session['user_id']).execute()
+            response = get_supabase().table('users').select('language').eq('email', session['user_id']).execute()
             if response.data and len(response.data) > 0:
                 lang = response.data[0].get('language')
                 if lang:
@@ -145,28 +197,59 @@ def inject_language():
         lang = 'en'
     
     # Inject cart count
-    cart_count = 0
-    if 'session_id' in session:
-        conn = None
-        try:
-            conn = sqlite3.connect('babycare.db')
-            c = conn.cursor()
-            c.execute("SELECT SUM(quantity) FROM cart WHERE session_id = ?", (session['session_id'],))
-            res = c.fetchone()
-            if res and res[0]:
-                cart_count = res[0]
-        except:
-            pass
-        finally:
-            if conn:
-                conn.close()
+    cart_count = get_cart_count()
 
     # Inject logo URL globally (ensure you have a file at static/images/Dream_Baby_Care_Logo (1).jpg)
     logo = 'https://res.cloudinary.com/duucdndfx/image/upload/v1767200335/WhatsApp_Image_2025-11-23_at_10.59.52_PM_nwqgbo.jpg'
 
     return dict(lang=lang, lang_data=translations.get(lang, {}), cart_count=cart_count, logo=logo)
 
-# Admin actions logging helpers
+# Helper: items in the current cart session, computed once per request
+def get_cart_count():
+    if 'cart_count' not in g:
+        g.cart_count = 0
+        if 'session_id' in session:
+            conn = None
+            try:
+                conn = sqlite3.connect('babycare.db')
+                c = conn.cursor()
+                c.execute("SELECT SUM(quantity) FROM cart WHERE session_id = ?", (session['session_id'],))
+                res = c.fetchone()
+                if res and res[0]:
+                    g.cart_count = res[0]
+            except:
+                pass
+            finally:
+                if conn:
+                    conn.close()
+    return g.cart_count
+
+# Helper: content hash of one language's translations (they only change on deploy)
+_translation_versions = {}
+def translations_version(lang):
+    if lang not in _translation_versions:
+        _translation_versions[lang] = make_etag(translations.get(lang, {}))
+    return _translation_versions[lang]
+
+# Helper: everything from the session that base.html shows (navbar, language, cart badge).
+# Returns None while flashed messages are pending so they are never swallowed by a 304.
+def page_viewer_state():
+    if session.get('_flashes'):
+        return None
+    lang = session.get('language', 'en')
+    if lang not in translations:
+        lang = 'en'
+    keys = ('user_id', 'user_name', 'doctor_id', 'admin_logged_in', 'is_admin', 'is_subscribed', 'subscription_pending')
+    return [lang, translations_version(lang), get_cart_count()] + [session.get(k) for k in keys]
+
+app.jinja_env.globals['translations_version'] = translations_version
+
+# Conditional GET (ETag + 304) for read-mostly pages, see http_cache.py
+conditional = ConditionalGet(page_viewer_state, build_id=build_id_for(app))
+
+# Admin actions logging helpers (append-only log with offset index, see audit_log.py)
+action_log = AdminActionLog('admin_actions.log', max_bytes=5 * 1024 * 1024, compress=True, fsync=True)
+
 def get_client_ip():
     """Extract client IP from request, accounting for proxies."""
     if request.headers.get('X-Forwarded-For'):
@@ -189,72 +272,170 @@ def log_admin_action(action, user_id, user_email, prev_is_sub, prev_pending, new
         'ip': get_client_ip()
     }
     try:
-        with open('admin_actions.log', 'a', encoding='utf-8') as f:
-            f.write(json.dumps(entry) + "\n")
+        action_log.append(entry)
     except Exception:
         pass
 
 
-def read_all_admin_actions():
-    """Read all admin actions from log and return as list with log_index for per-entry undo."""
-    if not os.path.exists('admin_actions.log'):
-        return []
+def sync_user_sessions(user_email, is_subscribed, subscription_pending):
+    """Push new subscription flags into every live session of a user."""
     try:
-        with open('admin_actions.log', 'r', encoding='utf-8') as f:
-            lines = [l.strip() for l in f.readlines() if l.strip()]
-            actions = []
-            for i, line in enumerate(lines):
-                try:
-                    entry = json.loads(line)
-                    entry['log_index'] = i  # Store position for undo reference
-                    actions.append(entry)
-                except Exception:
-                    pass
-            return actions
+        session_store.update_user(user_email, {
+            'is_subscribed': int(is_subscribed),
+            'subscription_pending': int(subscription_pending)
+        })
     except Exception:
-        return []
+        pass
+
+
+def log_admin_bulk_action(action, changes):
+    """Log a batch of subscription changes as one entry, so it can be undone as a unit."""
+    entry = {
+        'timestamp': datetime.now().isoformat(),
+        'action': action,
+        'changes': changes,
+        'admin': session.get('admin_user') or session.get('user_id') or 'unknown',
+        'ip': get_client_ip()
+    }
+    try:
+        action_log.append(entry)
+    except Exception:
+        pass
 
 
 def read_last_admin_action():
     """Read the last admin action from log (for legacy undo)."""
-    actions = read_all_admin_actions()
-    return actions[-1] if actions else None
+    try:
+        return action_log.last()
+    except Exception:
+        return None
+
+
+def revert_admin_action(entry):
+    """Restore the previous subscription state recorded in a log entry (single or bulk).
+
+    All users are updated in one transaction, then the undo is logged with the
+    same shape as the entry it reverts. Returns the list of changes reverted.
+    """
+    changes = entry.get('changes') or [entry]
+    conn = sqlite3.connect('babycare.db')
+    try:
+        conn.executemany("UPDATE users SET is_subscribed = ?, subscription_pending = ? WHERE id = ?",
+                         [(int(ch.get('prev_is_subscribed', 0)), int(ch.get('prev_subscription_pending', 0)), ch.get('user_id'))
+                          for ch in changes])
+        conn.commit()
+    finally:
+        conn.close()
+
+    undone = []
+    for ch in changes:
+        sync_user_sessions(ch.get('user_email', ''), ch.get('prev_is_subscribed', 0), ch.get('prev_subscription_pending', 0))
+        undone.append({
+            'user_id': ch.get('user_id'),
+            'user_email': ch.get('user_email', ''),
+            'prev_is_subscribed': int(ch.get('new_is_subscribed', 0)),
+            'prev_subscription_pending': int(ch.get('new_subscription_pending', 0)),
+            'new_is_subscribed': int(ch.get('prev_is_subscribed', 0)),
+            'new_subscription_pending': int(ch.get('prev_subscription_pending', 0))
+        })
+    # Log the undo as an action referencing the original
+    try:
+        if entry.get('changes'):
+            log_admin_bulk_action('undo', undone)
+        else:
+            u = undone[0]
+            log_admin_action('undo', u['user_id'], u['user_email'], u['prev_is_subscribed'], u['prev_subscription_pending'],
+                             u['new_is_subscribed'], u['new_subscription_pending'])
+    except Exception:
+        pass
+    return changes
+
+
+# Queued outgoing email (see mail_outbox.py)
+mail_outbox = MailOutbox('babycare.db', app.config)
+# Routine admin notifications are batched into one digest per ADMIN_DIGEST_WINDOW seconds
+admin_digest = AdminDigest('babycare.db', app.config, mail_outbox)
+# Reminders due in the next 30 minutes sit in a heap; a background thread fires them (see reminders.py)
+# Recurring reminders are stored as one rule each and expanded on demand (see recurrence.py)
+reminder_rules = SQLiteRuleSource('babycare.db')
+reminder_scheduler = ReminderScheduler('babycare.db', [SQLiteReminderSource('babycare.db'), reminder_rules],
+                                       [OutboxSink(mail_outbox), LogSink()])
 
 
 # Helper: send notification email to admin when a user requests subscription
 def send_admin_notification(subject, body):
     # Requires SMTP settings in app.config: SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASS, SMTP_USE_TLS (optional), ADMIN_NOTIFICATION_EMAIL
-    host = app.config.get('SMTP_HOST')
-    admin_email = app.config.get('ADMIN_NOTIFICATION_EMAIL')
-    if not host or not admin_email:
-        return False
+    # Only queues the message; the outbox thread does the SMTP work outside the request
     try:
-        port = app.config.get('SMTP_PORT', 587)
-        user = app.config.get('SMTP_USER')
-        passwd = app.config.get('SMTP_PASS')
-        use_tls = app.config.get('SMTP_USE_TLS', True)
-
-        msg = EmailMessage()
-        msg['Subject'] = subject
-        msg['From'] = user if user else admin_email
-        msg['To'] = admin_email
-        msg.set_content(body)
-
-        if use_tls:
-            server = smtplib.SMTP(host, port, timeout=10)
-            server.starttls()
-        else:
-            server = smtplib.SMTP(host, port, timeout=10)
+        return mail_outbox.enqueue(subject, body) is not None
+    except Exception:
+        return False
 
-        if user and passwd:
-            server.login(user, passwd)
 
-        server.send_message(msg)
-        server.quit()
-        return True
+# Helper: record an admin-facing event; priority kinds (ADMIN_DIGEST_PRIORITY) are sent at once
+def notify_admin_event(kind, summary, link=None):
+    try:
+        return admin_digest.record(kind, summary, link)
     except Exception:
         return False
 
+
+# Counters shown on the admin pages; served from memory by admin_stats (see admin_stats.py)
+def load_admin_stats():
+    conn = sqlite3.connect('babycare.db')
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    try:
+        c.execute("""
+            SELECT COUNT(*) AS total_users,
+                   COALESCE(SUM(CASE WHEN is_subscribed = 1 THEN 1 ELSE 0 END), 0) AS subscribed_users,
+                   COALESCE(SUM(CASE WHEN subscription_pending = 1 THEN 1 ELSE 0 END), 0) AS pending_requests,
+                   (SELECT COUNT(*) FROM contacts) AS total_contacts,
+                   (SELECT COUNT(*) FROM products) AS total_products,
+                   (SELECT COUNT(*) FROM cart) AS total_orders
+            FROM users
+        """)
+        stats = dict(c.fetchone())
+        c.execute("SELECT COALESCE(status, 'Pending') AS status, COUNT(*) AS n FROM appointments GROUP BY 1")
+        stats['appointments_by_status'] = {row['status']: row['n'] for row in c.fetchall()}
+        stats['total_appointments'] = sum(stats['appointments_by_status'].values())
+    finally:
+        conn.close()
+    return stats
+
+admin_stats = AdminStats(load_admin_stats, interval=30)
+
+
+# Indexes backing the paginated admin user lists (safe to run on every start)
+def ensure_sqlite_indexes():
+    try:
+        conn = sqlite3.connect('babycare.db')
+        c = conn.cursor()
+        c.execute("CREATE INDEX IF NOT EXISTS idx_users_created ON users(created_at, id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_users_pending ON users(created_at, id) WHERE subscription_pending = 1")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_users_subscribed ON users(created_at, id) WHERE is_subscribed = 1")
+        conn.commit()
+        conn.close()
+    except Exception:
+        pass
+
+ensure_sqlite_indexes()
+
+# Endpoints whose writes change the admin counters (checkout/remove_from_cart write on GET)
+ADMIN_STATS_WRITE_ENDPOINTS = {
+    'register', 'subscribe', 'contact', 'book_appointment', 'checkout', 'remove_from_cart',
+    'admin_update_appointment_status', 'doctor_update_appointment_status',
+    'admin_approve_subscription', 'admin_reject_subscription', 'admin_grant_subscription',
+    'admin_revoke_subscription', 'admin_bulk_subscriptions', 'admin_undo_last_action', 'admin_undo_action'
+}
+
+@app.after_request
+def refresh_admin_stats_after_write(response):
+    writes = request.method == 'POST' or request.endpoint in ('checkout', 'remove_from_cart')
+    if writes and request.endpoint in ADMIN_STATS_WRITE_ENDPOINTS and response.status_code < 400:
+        admin_stats.invalidate()
+    return response
+
 # Home page
 @app.route('/')
 def landing():
@@ -267,28 +448,31 @@ def landing():
 def home():
     return render_template('index.html', hero_image="https://images.unsplash.com/photo-1555252333-9f8e92e65df4?auto=format&fit=crop&w=1000")
 
+# Content of the about page (constant; rendered from the fragment cache)
+ABOUT_INFO = {
+    'title': 'About Dream Baby Care',
+    'linkedin_profile': 'https://www.linkedin.com/in/srujan-ss-9b7a1b336/',  # Corrected LinkedIn profile link
+    'description': 'Dream Baby Care is your trusted companion in the beautiful journey of parenthood. We provide smart tracking tools, expert tips, and a curated shop to make your life easier and your baby happier.',
+    'mission': 'To empower every parent with the technology, knowledge, and support they need to raise happy, healthy babies.',
+    'features': [
+        {'icon': 'fas fa-baby-carriage', 'title': 'Smart Tracking', 'desc': 'Effortlessly track sleep, feeding, diaper changes, and health metrics.'},
+        {'icon': 'fas fa-shopping-bag', 'title': 'Curated Shop', 'desc': 'Access high-quality, safe, and essential products for your newborn.'},
+        {'icon': 'fas fa-lightbulb', 'title': 'Expert Guidance', 'desc': 'Get reliable tips on health, hygiene, soothing, and more.'},
+        {'icon': 'fas fa-shield-alt', 'title': 'Secure & Private', 'desc': 'Your family data is kept safe and private.'}
+    ],
+    'values': [
+        {'title': 'Compassion', 'desc': 'We care deeply about the well-being of every family.'},
+        {'title': 'Integrity', 'desc': 'We provide honest, evidence-based information.'},
+        {'title': 'Community', 'desc': 'We are building a supportive community for parents.'}
+    ]
+}
+
 # About page
 @app.route('/about')
 @login_required
+@conditional()
 def about():
-    about_info = {
-        'title': 'About Dream Baby Care',
-        'linkedin_profile': 'https://www.linkedin.com/in/srujan-ss-9b7a1b336/',  # Corrected LinkedIn profile link
-        'description': 'Dream Baby Care is your trusted companion in the beautiful journey of parenthood. We provide smart tracking tools, expert tips, and a curated shop to make your life easier and your baby happier.',
-        'mission': 'To empower every parent with the technology, knowledge, and support they need to raise happy, healthy babies.',
-        'features': [
-            {'icon': 'fas fa-baby-carriage', 'title': 'Smart Tracking', 'desc': 'Effortlessly track sleep, feeding, diaper changes, and health metrics.'},
-            {'icon': 'fas fa-shopping-bag', 'title': 'Curated Shop', 'desc': 'Access high-quality, safe, and essential products for your newborn.'},
-            {'icon': 'fas fa-lightbulb', 'title': 'Expert Guidance', 'desc': 'Get reliable tips on health, hygiene, soothing, and more.'},
-            {'icon': 'fas fa-shield-alt', 'title': 'Secure & Private', 'desc': 'Your family data is kept safe and private.'}
-        ],
-        'values': [
-            {'title': 'Compassion', 'desc': 'We care deeply about the well-being of every family.'},
-            {'title': 'Integrity', 'desc': 'We provide honest, evidence-based information.'},
-            {'title': 'Community', 'desc': 'We are building a supportive community for parents.'}
-        ]
-    }
-    return render_template('about.html', info=about_info)
+    return render_template('about.html', info=ABOUT_INFO)
 
 # Set language preference
 @app.route('/set_language/<lang>')
@@ -308,8 +492,23 @@ def set_language(lang):
     return redirect(request.referrer or url_for('home'))
 
 # Tips page
+# Categories with optional tip videos under static/videos/<slug>/
+TIP_VIDEO_CATEGORIES = ['Feeding', 'Diapering', 'Health', 'Bathing', 'Soothing']
+
+# Helper: modification times of the tip video folders (changes when videos are added or removed)
+def video_manifest_version():
+    stamps = []
+    for cat in TIP_VIDEO_CATEGORIES:
+        folder = os.path.join(app.root_path, 'static', 'videos', cat.lower().replace(' ', '_'))
+        try:
+            stamps.append(os.stat(folder).st_mtime_ns)
+        except OSError:
+            stamps.append(0)
+    return stamps
+
 @app.route('/tips')
 @login_required
+@conditional(video_manifest_version)
 def tips():
     # Get user's language preference from database (or session fallback)
     lang = session.get('language', 'en')
@@ -329,7 +528,7 @@ def tips():
     
     # Look for videos in static/videos/<slug>/
     videos_by_category = {}
-    categories = ['Feeding', 'Diapering', 'Health', 'Bathing', 'Soothing']
+    categories = TIP_VIDEO_CATEGORIES
     for cat in categories:
         slug = cat.lower().replace(' ', '_')
         folder = os.path.join(app.root_path, 'static', 'videos', slug)
@@ -352,71 +551,88 @@ def tips():
                          tips_content=tips_content,
                          categories=categories,
                          videos_by_category=videos_by_category,
+                         videos_version=video_manifest_version(),
                          is_subscribed=is_sub,
                          subscription_pending=sub_pending)
 
-# Shop page
-@app.route('/shop')
-@login_required
-def shop():
+# Helper: load every product as a tuple with the image path resolved (see catalog.py)
+def load_products():
     conn = sqlite3.connect('babycare.db')
     c = conn.cursor()
-    c.execute("SELECT * FROM products")
-    products = c.fetchall()
+    c.execute("SELECT * FROM products ORDER BY id")
+    rows = c.fetchall()
     conn.close()
-    
-    # Group products by category
-    categories = {}
-    for product in products:
-        # Convert tuple to list to make it mutable
+
+    products = []
+    for product in rows:
         product_list = list(product)
         # Prepend the static path to the image filename
-        if product_list[4].startswith('http'):
-            product_list[4] = product_list[4]
-        else:
+        if not product_list[4].startswith('http'):
             product_list[4] = url_for('static', filename=f'images/{product[4]}')
-        category = product[5]  # category is at index 5
-        if category not in categories:
-            categories[category] = []
-        categories[category].append(product_list)
-    
-    return render_template('shop.html', categories=categories)
+        products.append(tuple(product_list))
+    return products
+
+# Products are served from memory and rebuilt when the products table changes
+catalog = ProductCatalog(load_products, id_of=lambda p: p[0], category_of=lambda p: p[5],
+                         probe=SQLiteCatalogVersion('babycare.db'), check_interval=30)
+
+# Shop page
+@app.route('/shop')
+@login_required
+@conditional(lambda: catalog.snapshot().digest)
+def shop():
+    return render_template('shop.html', categories=catalog.snapshot().categories)
+
+# Full-text product search with category/price facets (see product_search.py)
+product_search = SQLiteProductSearch('babycare.db')
+
+# Product search
+@app.route('/shop/search')
+@login_required
+def shop_search():
+    query = request.args.get('q', '').strip()
+    category = request.args.get('category', '').strip() or None
+    band = request.args.get('price', '').strip() or None
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = 24
+    try:
+        ids, total, facets = product_search.search(query, category=category, band=band,
+                                                   limit=per_page, offset=(page - 1) * per_page)
+    except Exception:
+        ids, total, facets = [], 0, {'category': [], 'price': []}
+
+    # Results are shown from the catalog snapshot, in ranked order
+    snapshot = catalog.snapshot()
+    products = [snapshot.get(pid) for pid in ids if snapshot and snapshot.get(pid)]
+
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'query': query,
+            'total': total,
+            'page': page,
+            'results': [{'id': p[0], 'name': p[1], 'price': p[3], 'sale_price': p[6], 'image': p[4], 'category': p[5]} for p in products],
+            'facets': facets
+        })
+    return render_template('shop_search.html', query=query, products=products, total=total, facets=facets,
+                           category=category, band=band, page=page, has_next=page * per_page < total)
 
 # Product detail page
 @app.route('/product/<int:product_id>')
+@conditional(lambda: catalog.snapshot().digest)
 def product_detail(product_id):
-    conn = sqlite3.connect('babycare.db')
-    c = conn.cursor()
-    c.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-    product = c.fetchone()
-    conn.close()
-    
+    product = catalog.get(product_id)
     if product:
-        # Convert tuple to list to make it mutable
-        product_list = list(product)
-        # Prepend the static path to the image filename
-        if product_list[4].startswith('http'):
-            product_list[4] = product_list[4]
-        else:
-            product_list[4] = url_for('static', filename=f'images/{product[4]}')
-        return render_template('product_detail.html', product=product_list)
+        return render_template('product_detail.html', product=product)
     else:
         return "Product not found", 404
 
 # Add to cart functionality
 @app.route('/add_to_cart/<int:product_id>')
 def add_to_cart(product_id):
-    conn = sqlite3.connect('babycare.db')
-    c = conn.cursor()
-    c.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-    product = c.fetchone()
-    
+    product = catalog.get(product_id)
     if product:
-        conn.close()
         # Redirect to Blinkit search page for the product
         return redirect(f"https://blinkit.com/s/?q={quote(product[1])}")
-    
-    conn.close()
     return redirect(url_for('shop'))
 
 @app.route('/remove_from_cart/<int:product_id>')
@@ -492,6 +708,7 @@ def contact():
                   (name, email, message, date))
         conn.commit()
         conn.close()
+        notify_admin_event('contact_message', f"{name} <{email}>: {message[:80]}", f"{request.url_root}admin/contacts")
         
         return redirect(url_for('contact_success'))
 
@@ -668,7 +885,11 @@ def admin_appointments():
     c.execute(query, tuple(params))
     appointments = c.fetchall()
     conn.close()
-    return render_template('admin_appointments.html', appointments=appointments, current_status=status_filter)
+    stats = admin_stats.get()
+    return render_template('admin_appointments.html', appointments=appointments, current_status=status_filter,
+                           status_counts=stats.get('appointments_by_status', {}),
+                           total_appointments=stats.get('total_appointments'),
+                           stats_refreshed_at=stats.get('refreshed_at'))
 
 @app.route('/admin/appointment/status/<int:appt_id>', methods=['POST'])
 @admin_required
@@ -696,6 +917,7 @@ def doctor_login():
         doctor = c.fetchone()
         conn.close()
         if doctor:
+            session.regenerate()
             session['doctor_id'] = doctor[0]
             session['doctor_name'] = doctor[1]
             return redirect(url_for('doctor_dashboard'))
@@ -764,6 +986,7 @@ def admin_login():
         username = request.form.get('username')
         password = request.form.get('password')
         if username == app.config.get('ADMIN_USER') and password == app.config.get('ADMIN_PASS'):
+            session.regenerate()
             session['admin_logged_in'] = True
             session['admin_user'] = username
             return redirect(url_for('admin_dashboard'))
@@ -824,6 +1047,7 @@ def register():
         conn.commit()
         conn.close()
         
+        session.regenerate()
         session['user_id'] = email
         session['user_name'] = parent_name
         session['language'] = language  # Set language in session
@@ -845,6 +1069,7 @@ def login():
         conn.close()
 
         if user:
+            session.regenerate()
             session['user_id'] = email
             session['user_name'] = user[3]
             # Fetch language and subscription status from DB (safe checks)
@@ -1044,13 +1269,23 @@ def add_reminder():
     if not message or not remind_time:
         return jsonify({'error': 'Message and time are required'}), 400
 
+    now = datetime.now().replace(microsecond=0)
+    try:
+        due = due_at_for(remind_time, now)
+    except ValueError:
+        return jsonify({'error': 'Invalid reminder time'}), 400
+
+    reminder_scheduler.prepare()
     conn = sqlite3.connect('babycare.db')
     c = conn.cursor()
-    created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    c.execute("INSERT INTO reminders (user_id, message, remind_time, created_at) VALUES (?, ?, ?, ?)",
-              (session['user_id'], message, remind_time, created_at))
+    created_at = now.strftime("%Y-%m-%d %H:%M:%S")
+    c.execute("INSERT INTO reminders (user_id, message, remind_time, created_at, due_at) VALUES (?, ?, ?, ?, ?)",
+              (session['user_id'], message, remind_time, created_at, due.strftime("%Y-%m-%d %H:%M:%S")))
+    reminder_id = c.lastrowid
     conn.commit()
     conn.close()
+    reminder_scheduler.add(f'reminder:{reminder_id}', due,
+                           {'id': reminder_id, 'user_id': session['user_id'], 'message': message, 'due_at': due})
     return jsonify({'success': True, 'message': 'Reminder set!'})
 
 @app.route('/tracker/reminder/delete/<int:reminder_id>', methods=['POST'])
@@ -1059,10 +1294,37 @@ def delete_reminder(reminder_id):
     conn = sqlite3.connect('babycare.db')
     c = conn.cursor()
     c.execute("DELETE FROM reminders WHERE id = ? AND user_id = ?", (reminder_id, session['user_id']))
+    deleted = c.rowcount
     conn.commit()
     conn.close()
+    if deleted:
+        reminder_scheduler.cancel(f'reminder:{reminder_id}')
     return jsonify({'success': True, 'message': 'Reminder deleted!'})
 
+@app.route('/tracker/reminder/rule/add', methods=['POST'])
+@login_required
+def add_reminder_rule():
+    message = request.form.get('message')
+    if not message:
+        return jsonify({'error': 'Message is required'}), 400
+
+    now = datetime.now().replace(microsecond=0)
+    try:
+        rule = rule_from_form(request.form, now)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    rule_id = reminder_rules.add_rule(session['user_id'], message, rule, now)
+    reminder_scheduler.add_rule(rule_id, rule, {'user_id': session['user_id'], 'message': message}, now)
+    return jsonify({'success': True, 'message': f'Repeating reminder set: {rule.describe()}'})
+
+@app.route('/tracker/reminder/rule/delete/<int:rule_id>', methods=['POST'])
+@login_required
+def delete_reminder_rule(rule_id):
+    if reminder_rules.delete_rule(rule_id, session['user_id']):
+        reminder_scheduler.cancel_rule(rule_id)
+    return jsonify({'success': True, 'message': 'Repeating reminder deleted!'})
+
 # Tracker page (separate full page)
 @app.route('/tracker')
 @login_required
@@ -1084,6 +1346,8 @@ def tracker_page():
     c.execute("SELECT * FROM reminders WHERE user_id = ? ORDER BY remind_time ASC", (session['user_id'],))
     reminders = c.fetchall()
     conn.close()
+    # Repeating reminders: only their next few occurrences are computed
+    recurring = rule_summaries(reminder_rules.rules_for(session['user_id']), datetime.now())
     
     # Process data for statistics and better display
     today_str = datetime.now().strftime("%Y-%m-%d")
@@ -1149,7 +1413,8 @@ def tracker_page():
                          activities=formatted_activities, 
                          stats=stats,
                          current_date=display_date,
-                         reminders=reminders)
+                         reminders=reminders,
+                         recurring=recurring)
 
 
 # Simple analyzer for activities to produce health insights
@@ -1483,100 +1748,66 @@ def subscribe():
             session['subscription_pending'] = 1
         except Exception:
             pass
-        # Send admin notification (best-effort)
-        try:
-            subject = f"Subscription request: {session.get('user_id')}"
-            # Send admin to the comprehensive admin panel
-            body = f"User {session.get('user_id')} has requested subscription access. Please verify payment and approve in the admin panel: {request.url_root}admin/manage_subscriptions"
-            send_admin_notification(subject, body)
-        except Exception:
-            pass
+        # Notify admin (best-effort, batched into the admin digest)
+        notify_admin_event('subscription_request',
+                           f"User {session.get('user_id')} has requested subscription access",
+                           f"{request.url_root}admin/manage_subscriptions")
 
         return redirect(url_for('user_dashboard'))
 
     # GET: render subscribe instructions and QR
     return render_template('subscribe.html', price=99)
 
+# Columns the admin user tables may be sorted by
+ADMIN_USER_SORTS = ('created_at', 'parent_name', 'email', 'baby_name')
+
+
 # Admin Dashboard - View all users
 @app.route('/admin/dashboard')
 @admin_required
 def admin_dashboard():
+    # Server-side paging/sorting/search for the users table
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 10, type=int), 1), 100)
+    search = request.args.get('q', '').strip()
+    sort = request.args.get('sort', 'created_at')
+    if sort not in ADMIN_USER_SORTS:
+        sort = 'created_at'
+    direction = 'ASC' if request.args.get('dir') == 'asc' else 'DESC'
+
+    # Counters come from the in-memory snapshot kept fresh by admin_stats
+    stats = dict(admin_stats.get())
+
     conn = sqlite3.connect('babycare.db')
+    conn.row_factory = sqlite3.Row
     c = conn.cursor()
-    
-    # Get all users
-    c.execute("SELECT * FROM users ORDER BY created_at DESC")
-    users = c.fetchall()
-    
-    # Get stats
-    c.execute("SELECT COUNT(*) FROM users")
-    total_users = c.fetchone()[0]
-    
-    c.execute("SELECT COUNT(*) FROM contacts")
-    total_contacts = c.fetchone()[0]
-    
-    c.execute("SELECT COUNT(*) FROM products")
-    total_products = c.fetchone()[0]
-    
-    c.execute("SELECT COUNT(*) FROM cart")
-    total_orders = c.fetchone()[0]
-    
+
+    query = """SELECT id, email, parent_name, baby_name, baby_dob, baby_age, phone, address, created_at,
+                      COALESCE(is_subscribed, 0) AS is_subscribed,
+                      COALESCE(subscription_pending, 0) AS subscription_pending
+               FROM users"""
+    params = []
+    if search:
+        query += " WHERE email LIKE ? OR parent_name LIKE ? OR baby_name LIKE ?"
+        params += [f"%{search}%"] * 3
+    # sort column comes from the ADMIN_USER_SORTS whitelist; id breaks ties so pages are stable
+    query += f" ORDER BY {sort} {direction}, id {direction} LIMIT ? OFFSET ?"
+    params += [per_page + 1, (page - 1) * per_page]
+    c.execute(query, tuple(params))
+    users_list = [dict(row) for row in c.fetchall()]
+    has_next = len(users_list) > per_page
+    users_list = users_list[:per_page]
+
     # Fetch recent contact messages (last 5)
     c.execute("SELECT name, email, message, date FROM contacts ORDER BY date DESC LIMIT 5")
-    recent_contacts = c.fetchall()
+    recent_contacts = [tuple(row) for row in c.fetchall()]
 
     conn.close()
-    
-    users_list = []
-    pending_count = 0
-    subscribed_count = 0
-    for user in users:
-        is_sub = 0
-        sub_pending = 0
-        # users table may have these columns added via migration
-        try:
-            # columns: id, email, password, parent_name, baby_name, baby_dob, baby_age, phone, address, created_at, language?, is_admin?, is_subscribed?, subscription_pending?
-            # Safely extract by position if present
-            # try to read by name where possible - fall back to positions
-            is_sub = int(user[10]) if len(user) > 10 and user[10] is not None else 0
-        except Exception:
-            is_sub = 0
-        try:
-            sub_pending = int(user[11]) if len(user) > 11 and user[11] is not None else 0
-        except Exception:
-            sub_pending = 0
-
-        if is_sub:
-            subscribed_count += 1
-        if sub_pending:
-            pending_count += 1
-
-        users_list.append({
-            'id': user[0],
-            'email': user[1],
-            'parent_name': user[3],
-            'baby_name': user[4],
-            'baby_dob': user[5],
-            'baby_age': user[6],
-            'phone': user[7],
-            'address': user[8],
-            'created_at': user[9],
-            'is_subscribed': is_sub,
-            'subscription_pending': sub_pending
-        })
-    
-    stats = {
-        'total_users': total_users,
-        'total_contacts': total_contacts,
-        'total_products': total_products,
-        'total_orders': total_orders
-    }
-    
-    # add counts to stats for convenience
-    stats['pending_requests'] = pending_count
-    stats['subscribed_users'] = subscribed_count
 
-    return render_template('admin_dashboard.html', users=users_list, stats=stats, recent_contacts=recent_contacts)
+    pagination = {'page': page, 'per_page': per_page, 'has_next': has_next,
+                  'q': search, 'sort': sort, 'dir': direction.lower()}
+    return render_template('admin_dashboard.html', users=users_list, stats=stats, recent_contacts=recent_contacts,
+                           pagination=pagination)
 
 
 # Admin - Manage users page
@@ -1670,6 +1901,7 @@ def admin_approve_subscription(user_id):
         new_pending = 0
         c.execute("UPDATE users SET is_subscribed = ?, subscription_pending = ? WHERE id = ?", (new_is_sub, new_pending, user_id))
         conn.commit()
+        sync_user_sessions(user_email, new_is_sub, new_pending)
         flash(f"Approved subscription for {user_email}", 'success')
         try:
             log_admin_action('approve', user_id, user_email, prev_is_sub, prev_pending, new_is_sub, new_pending)
@@ -1706,6 +1938,7 @@ def admin_reject_subscription(user_id):
         new_pending = 0
         c.execute("UPDATE users SET subscription_pending = ?, is_subscribed = ? WHERE id = ?", (new_pending, new_is_sub, user_id))
         conn.commit()
+        sync_user_sessions(user_email, new_is_sub, new_pending)
         flash(f"Rejected subscription request for {user_email}", 'warning')
         try:
             log_admin_action('reject', user_id, user_email, prev_is_sub, prev_pending, new_is_sub, new_pending)
@@ -1721,73 +1954,73 @@ def admin_reject_subscription(user_id):
 
 
 # --- Comprehensive Admin Subscription Management ---
+# Tab name -> WHERE clause; the pending/subscribed ones match the partial indexes in ensure_sqlite_indexes()
+SUBSCRIPTION_TABS = {
+    'pending': ("subscription_pending = 1",),
+    'subscribed': ("is_subscribed = 1",),
+    'all': ()
+}
+
 @app.route('/admin/manage_subscriptions')
 @admin_required
 def admin_manage_subscriptions():
-    """Admin page to manage all user subscriptions: grant, revoke, approve pending requests."""
-    conn = sqlite3.connect('babycare.db')
-    c = conn.cursor()
-    
-    # Pending requests
-    try:
-        c.execute("""SELECT id, email, parent_name, baby_name, created_at 
-                     FROM users WHERE subscription_pending = 1 ORDER BY created_at DESC""")
-        pending_requests = []
-        for row in c.fetchall():
-            pending_requests.append({
-                'id': row[0],
-                'email': row[1],
-                'parent_name': row[2],
-                'baby_name': row[3],
-                'created_at': row[4]
-            })
-    except Exception:
-        pending_requests = []
-    
-    # Subscribed users
-    try:
-        c.execute("""SELECT id, email, parent_name, baby_name, created_at 
-                     FROM users WHERE is_subscribed = 1 ORDER BY created_at DESC""")
-        subscribed_users = []
-        for row in c.fetchall():
-            subscribed_users.append({
-                'id': row[0],
-                'email': row[1],
-                'parent_name': row[2],
-                'baby_name': row[3],
-                'created_at': row[4]
-            })
-    except Exception:
-        subscribed_users = []
-    
-    # All users with subscription status
+    """Admin page to manage all user subscriptions: grant, revoke, approve pending requests.
+
+    Only the selected tab is queried, one keyset page at a time (newest first).
+    """
+    tab = request.args.get('tab', 'pending')
+    if tab not in SUBSCRIPTION_TABS:
+        tab = 'pending'
+    search = request.args.get('q', '').strip()
+    cursor = request.args.get('after', '')
+    per_page = 50
+
+    query = """SELECT id, email, parent_name, baby_name, created_at,
+                      COALESCE(is_subscribed, 0) AS is_subscribed,
+                      COALESCE(subscription_pending, 0) AS subscription_pending
+               FROM users"""
+    where = list(SUBSCRIPTION_TABS[tab])
+    params = []
+    if search:
+        where.append("(email LIKE ? OR parent_name LIKE ?)")
+        params += [f"%{search}%"] * 2
+    if '|' in cursor:
+        # Keyset pagination: continue strictly after the last (created_at, id) shown
+        after_created, after_id = cursor.rsplit('|', 1)
+        where.append("(created_at, id) < (?, ?)")
+        params += [after_created, int(after_id) if after_id.isdigit() else 0]
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(per_page + 1)
+
     try:
-        c.execute("""SELECT id, email, parent_name, baby_name, is_subscribed, subscription_pending 
-                     FROM users ORDER BY created_at DESC""")
-        all_users = []
-        for row in c.fetchall():
-            all_users.append({
-                'id': row[0],
-                'email': row[1],
-                'parent_name': row[2],
-                'baby_name': row[3],
-                'is_subscribed': int(row[4]) if row[4] else 0,
-                'subscription_pending': int(row[5]) if row[5] else 0
-            })
+        conn = sqlite3.connect('babycare.db')
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        c.execute(query, tuple(params))
+        rows = [dict(row) for row in c.fetchall()]
+        conn.close()
     except Exception:
-        all_users = []
-    
-    conn.close()
-    
-    pending_count = len(pending_requests)
-    subscribed_count = len(subscribed_users)
-    
+        rows = []
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = f"{rows[-1]['created_at']}|{rows[-1]['id']}"
+
+    stats = admin_stats.get()
     return render_template('admin_manage_subscriptions.html',
-                          pending_requests=pending_requests,
-                          subscribed_users=subscribed_users,
-                          all_users=all_users,
-                          pending_count=pending_count,
-                          subscribed_count=subscribed_count)
+                          tab=tab,
+                          search=search,
+                          cursor=cursor,
+                          next_cursor=next_cursor,
+                          pending_requests=rows if tab == 'pending' else [],
+                          subscribed_users=rows if tab == 'subscribed' else [],
+                          all_users=rows if tab == 'all' else [],
+                          pending_count=stats.get('pending_requests', 0),
+                          subscribed_count=stats.get('subscribed_users', 0),
+                          stats_refreshed_at=stats.get('refreshed_at'))
 
 
 @app.route('/admin/undo_last_action', methods=['POST'])
@@ -1798,21 +2031,12 @@ def admin_undo_last_action():
         flash('No admin actions to undo.', 'info')
         return redirect(url_for('admin_dashboard'))
 
-    user_id = last.get('user_id')
-    prev_is_sub = int(last.get('prev_is_subscribed', 0))
-    prev_pending = int(last.get('prev_subscription_pending', 0))
     try:
-        conn = sqlite3.connect('babycare.db')
-        c = conn.cursor()
-        c.execute("UPDATE users SET is_subscribed = ?, subscription_pending = ? WHERE id = ?", (prev_is_sub, prev_pending, user_id))
-        conn.commit()
-        conn.close()
-        flash(f"Reverted last admin action for user ID {user_id}", 'success')
-        # Log the undo as an action referencing the original
-        try:
-            log_admin_action('undo', user_id, last.get('user_email', ''), last.get('new_is_subscribed', 0), last.get('new_subscription_pending', 0), prev_is_sub, prev_pending)
-        except Exception:
-            pass
+        reverted = revert_admin_action(last)
+        if last.get('changes'):
+            flash(f"Reverted last admin action for {len(reverted)} users", 'success')
+        else:
+            flash(f"Reverted last admin action for user ID {last.get('user_id')}", 'success')
     except Exception:
         flash('Failed to undo last admin action.', 'danger')
 
@@ -1841,6 +2065,7 @@ def admin_grant_subscription(user_id):
         new_pending = 0
         c.execute("UPDATE users SET is_subscribed = ?, subscription_pending = ? WHERE id = ?", (new_is_sub, new_pending, user_id))
         conn.commit()
+        sync_user_sessions(user_email, new_is_sub, new_pending)
         flash(f"Granted subscription access to {user_email}", 'success')
         try:
             log_admin_action('grant', user_id, user_email, prev_is_sub, prev_pending, new_is_sub, new_pending)
@@ -1876,6 +2101,7 @@ def admin_revoke_subscription(user_id):
         new_pending = 0
         c.execute("UPDATE users SET is_subscribed = ?, subscription_pending = ? WHERE id = ?", (new_is_sub, new_pending, user_id))
         conn.commit()
+        sync_user_sessions(user_email, new_is_sub, new_pending)
         flash(f"Revoked subscription access from {user_email}", 'warning')
         try:
             log_admin_action('revoke', user_id, user_email, prev_is_sub, prev_pending, new_is_sub, new_pending)
@@ -1889,46 +2115,118 @@ def admin_revoke_subscription(user_id):
     return redirect(url_for('admin_manage_subscriptions'))
 
 
+# Bulk action -> (new is_subscribed, new subscription_pending), same as the single-user routes
+SUBSCRIPTION_ACTIONS = {
+    'approve': (1, 0),
+    'reject': (0, 0),
+    'grant': (1, 0),
+    'revoke': (0, 0)
+}
+
+
+@app.route('/admin/bulk_subscriptions', methods=['POST'])
+@admin_required
+def admin_bulk_subscriptions():
+    """Approve, reject, grant or revoke subscriptions for all selected users at once.
+
+    The users are read and updated in a single transaction and the change is
+    logged as one entry, so the whole batch can be undone together.
+    """
+    action = request.form.get('action', '')
+    user_ids = sorted({int(u) for u in request.form.getlist('user_ids') if u.isdigit()})
+    back = request.referrer or url_for('admin_manage_subscriptions')
+    if action not in SUBSCRIPTION_ACTIONS or not user_ids:
+        flash('Select at least one user and an action.', 'info')
+        return redirect(back)
+
+    new_is_sub, new_pending = SUBSCRIPTION_ACTIONS[action]
+    changes = []
+    conn = sqlite3.connect('babycare.db')
+    try:
+        c = conn.cursor()
+        c.execute("BEGIN IMMEDIATE")
+        # Stay below SQLite's bound-parameter limit on older builds
+        for i in range(0, len(user_ids), 500):
+            chunk = user_ids[i:i + 500]
+            marks = ','.join('?' * len(chunk))
+            c.execute(f"SELECT id, email, is_subscribed, subscription_pending FROM users WHERE id IN ({marks})", chunk)
+            for row in c.fetchall():
+                changes.append({
+                    'user_id': row[0],
+                    'user_email': row[1],
+                    'prev_is_subscribed': int(row[2] or 0),
+                    'prev_subscription_pending': int(row[3] or 0),
+                    'new_is_subscribed': new_is_sub,
+                    'new_subscription_pending': new_pending
+                })
+            c.execute(f"UPDATE users SET is_subscribed = ?, subscription_pending = ? WHERE id IN ({marks})",
+                      [new_is_sub, new_pending] + chunk)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        flash(f"Failed to {action} the selected subscriptions; nothing was changed.", 'danger')
+        return redirect(back)
+    finally:
+        conn.close()
+
+    for ch in changes:
+        sync_user_sessions(ch['user_email'], new_is_sub, new_pending)
+    if changes:
+        log_admin_bulk_action(action, changes)
+    flash(f"Applied {action} to {len(changes)} user(s).", 'success' if new_is_sub else 'warning')
+    return redirect(back)
+
+
 # Admin action log viewer
 @app.route('/admin/action_log')
 @admin_required
 def admin_action_log():
-    """Display all admin actions with per-action undo buttons."""
-    all_actions = read_all_admin_actions()
-    # Reverse to show newest first
-    all_actions.reverse()
-    return render_template('admin_action_log.html', actions=all_actions, total_actions=len(all_actions))
+    """Display one page of admin actions (newest first) with per-action undo buttons."""
+    page = request.args.get('page', 1, type=int)
+    filters = {
+        'admin': request.args.get('admin', '').strip() or None,
+        'user': request.args.get('user', '').strip() or None,
+        'action': request.args.get('action', '').strip() or None,
+        'since': request.args.get('since', '').strip() or None,
+        'until': request.args.get('until', '').strip() or None
+    }
+    try:
+        actions, has_next = action_log.query(page=page, per_page=50, **filters)
+        total_actions = action_log.count()
+    except Exception:
+        actions, has_next, total_actions = [], False, 0
+    return render_template('admin_action_log.html', actions=actions, total_actions=total_actions,
+                           page=max(page, 1), has_next=has_next, filters=filters)
 
 
-@app.route('/admin/undo_action/<int:log_index>', methods=['POST'])
+@app.route('/admin/undo_action/<int:action_id>', methods=['POST'])
 @admin_required
-def admin_undo_action(log_index):
-    """Undo a specific admin action by log index."""
-    all_actions = read_all_admin_actions()
-    if log_index < 0 or log_index >= len(all_actions):
+def admin_undo_action(action_id):
+    """Undo a specific admin action by its log ID."""
+    try:
+        target = action_log.get(action_id)
+    except Exception:
+        target = None
+    if not target:
         flash('Action not found in log.', 'danger')
         return redirect(url_for('admin_action_log'))
 
-    target = all_actions[log_index]
-    user_id = target.get('user_id')
-    prev_is_sub = int(target.get('prev_is_subscribed', 0))
-    prev_pending = int(target.get('prev_subscription_pending', 0))
-
     try:
-        conn = sqlite3.connect('babycare.db')
-        c = conn.cursor()
-        c.execute("UPDATE users SET is_subscribed = ?, subscription_pending = ? WHERE id = ?", (prev_is_sub, prev_pending, user_id))
-        conn.commit()
-        conn.close()
-        flash(f"Reverted action on user ID {user_id}: {target.get('action')}", 'success')
-        try:
-            log_admin_action('undo', user_id, target.get('user_email', ''), target.get('new_is_subscribed', 0), target.get('new_subscription_pending', 0), prev_is_sub, prev_pending)
-        except Exception:
-            pass
+        reverted = revert_admin_action(target)
+        if target.get('changes'):
+            flash(f"Reverted bulk {target.get('action')} on {len(reverted)} users", 'success')
+        else:
+            flash(f"Reverted action on user ID {target.get('user_id')}: {target.get('action')}", 'success')
     except Exception:
         flash('Failed to undo action.', 'danger')
 
-    return redirect(url_for('admin_action_log'))
+    return redirect(request.referrer or url_for('admin_action_log'))
+
+@app.route('/admin/template_timings')
+@admin_required
+def admin_template_timings():
+    """Per-template compile/cache-load and render timings for this worker."""
+    return jsonify(template_stats.report())
 
 if __name__ == '__main__':
     init_db()
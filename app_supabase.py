@@ -1,26 +1,57 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash, send_from_directory, abort
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash, send_from_directory, abort, g
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import os
-import json
-from translations import translations
-import smtplib
-from email.message import EmailMessage
 from urllib.parse import quote
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from audit_log import AdminActionLog
+from mail_outbox import SupabaseMailOutbox
+from admin_digest import SupabaseAdminDigest
+from reminders import (ReminderScheduler, SupabaseDeliveryLog, SupabaseReminderSource, SupabaseRuleSource,
+                       OutboxSink, LogSink, due_at_for, rule_summaries)
+from recurrence import rule_from_form
+from admin_stats import AdminStats
+from catalog import ProductCatalog
+from product_search import SupabaseProductSearch
+from http_cache import ConditionalGet, build_id_for, make_etag
+from fragment_cache import FragmentCache, FragmentCacheExtension
+import template_cache
+import assets
+import fontawesome
+import stylesheets
+import svg_sprite
+import image_variants
+from compression import CompressionMiddleware
+from lazy_imports import LazyMapping, lazy_client
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Supabase
+# Initialize Supabase lazily: the SDK is only imported and the client only built on first use
 SUPABASE_URL = os.environ.get('SUPABASE_URL')
 SUPABASE_KEY = os.environ.get('SUPABASE_KEY')
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables are required")
+def create_supabase_client():
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables are required")
+    from supabase import create_client
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+get_supabase = lazy_client(create_supabase_client)
+
+# UI strings for every language, imported on first use (see lazy_imports.py)
+translations = LazyMapping('translations', 'translations')
+
+# Bounded pool for independent Supabase round trips issued by a single request
+supabase_pool = ThreadPoolExecutor(max_workers=8)
+
+def supabase_count(table, **filters):
+    """Exact row count of ``table`` (optionally filtered by equality) via a HEAD request."""
+    query = get_supabase().table(table).select('id', count='exact', head=True)
+    for column, value in filters.items():
+        query = query.eq(column, value)
+    return query.execute().count or 0
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key_here'  # Change this in production
@@ -38,6 +69,33 @@ def format_inr(value):
 
 app.jinja_env.filters['inr'] = format_inr
 
+# {% cache name, key... %} blocks in templates store rendered HTML here (see fragment_cache.py)
+fragment_cache = FragmentCache(maxsize=256)
+app.jinja_env.add_extension(FragmentCacheExtension)
+app.jinja_env.fragment_cache = fragment_cache
+
+# Templates load from the bytecode cache that check_templates.py precompiles (see template_cache.py)
+template_stats = template_cache.install(app)
+
+# Fingerprinted, precompressed static files built by `python assets.py` (see assets.py)
+asset_manifest = assets.install(app)
+
+# Icon stylesheet: local subset built by `python fontawesome.py`, else the CDN copy
+fontawesome.install(app)
+
+# Purged Bootstrap + styles.css and inline critical CSS built by `python stylesheets.py`
+stylesheets.install(app)
+
+# Resized/WebP variants of local product photos, served from /img (see image_variants.py)
+image_store, responsive_image = image_variants.install(app)
+
+# Product icons from one SVG sprite built by `python svg_sprite.py`; product_image() in templates
+# (remote Unsplash photos get a srcset of CDN-resized copies)
+svg_sprite.install(app, raster=responsive_image, remote_srcset=image_variants.remote_srcset)
+
+# gzip/brotli for HTML and JSON responses, streamed chunk by chunk (see compression.py)
+app.wsgi_app = CompressionMiddleware(app.wsgi_app)
+
 # Helper decorator to require login for certain routes
 def login_required(f):
     @wraps(f)
@@ -66,7 +124,7 @@ def admin_required(f):
         user_email = session.get('user_id')
         if user_email:
             try:
-                response = supabase.table('users').select('is_admin').eq('email', user_email).execute()
+                response = get_supabase().table('users').select('is_admin').eq('email', user_email).execute()
                 if response.data and len(response.data) > 0:
                     if int(response.data[0].get('is_admin') or 0) == 1:
                         return f(*args, **kwargs)
@@ -84,7 +142,7 @@ def init_db():
     """
     try:
         # Check if products exist
-        response = supabase.table('products').select('id').limit(1).execute()
+        response = get_supabase().table('products').select('id').limit(1).execute()
         if not response.data:
             sample_products = [
                 {'name': 'Diapers - Newborn Size', 'description': 'Soft, absorbent diapers for newborns (30 count)', 'price': 350.00, 'image': 'https://images.unsplash.com/photo-1519689680058-324335c77eba?auto=format&fit=crop&w=500', 'category': 'Diapering'},
@@ -98,15 +156,15 @@ def init_db():
                 {'name': 'Pacifiers - 2 Pack', 'description': 'Orthodontic pacifiers for newborns', 'price': 200.00, 'image': 'https://images.unsplash.com/photo-1596464716127-f9a0859d0437?auto=format&fit=crop&w=500', 'category': 'Comfort'},
                 {'name': 'Baby Thermometer', 'description': 'Digital thermometer for accurate temperature reading', 'price': 300.00, 'image': 'https://images.unsplash.com/photo-1584634731339-252c581abfc5?auto=format&fit=crop&w=500', 'category': 'Health'},
             ]
-            supabase.table('products').insert(sample_products).execute()
+            get_supabase().table('products').insert(sample_products).execute()
 
-        response = supabase.table('doctors').select('id').limit(1).execute()
+        response = get_supabase().table('doctors').select('id').limit(1).execute()
         if not response.data:
             sample_doctors = [
                 {'name': 'Dr. Sarah Smith', 'specialization': 'Pediatrician', 'email': 'sarah.smith@clinic.com', 'password': 'doc123', 'image': 'https://images.unsplash.com/photo-1559839734-2b71ea197ec2?auto=format&fit=crop&w=500', 'phone': '+1234567890', 'video_link': 'https://meet.google.com/abc-defg-hij'},
                 {'name': 'Dr. John Doe', 'specialization': 'Child Psychologist', 'email': 'john.doe@clinic.com', 'password': 'doc123', 'image': 'https://images.unsplash.com/photo-1612349317150-e413f6a5b16d?auto=format&fit=crop&w=500', 'phone': '+1987654321', 'video_link': 'https://meet.google.com/xyz-uvwx-yz'}
             ]
-            supabase.table('doctors').insert(sample_doctors).execute()
+            get_supabase().table('doctors').insert(sample_doctors).execute()
     except Exception as e:
         print(f"Error initializing database: {e}")
 
@@ -115,13 +173,14 @@ def init_db():
 def ensure_session_id():
     if 'session_id' not in session:
         session['session_id'] = os.urandom(16).hex()
+    reminder_scheduler.start()
 
 # Global language loader
 @app.before_request
 def load_user_language():
     if 'user_id' in session:
         try:
-            response = supabase.table('users').select('language').eq('email', session['user_id']).execute()
+            response = get_supabase().table('users').select('language').eq('email', session['user_id']).execute()
             if response.data and len(response.data) > 0:
                 lang = response.data[0].get('language')
                 if lang:
@@ -136,20 +195,82 @@ def inject_language():
         lang = 'en'
     
     # Inject cart count
-    cart_count = 0
-    if 'session_id' in session:
-        try:
-            response = supabase.table('cart').select('quantity').eq('session_id', session['session_id']).execute()
-            if response.data:
-                cart_count = sum(item['quantity'] for item in response.data)
-        except:
-            pass
+    cart_count = get_cart_count()
 
     logo = 'https://res.cloudinary.com/duucdndfx/image/upload/v1767200335/WhatsApp_Image_2025-11-23_at_10.59.52_PM_nwqgbo.jpg'
 
     return dict(lang=lang, lang_data=translations.get(lang, {}), cart_count=cart_count, logo=logo)
 
-# Admin actions logging helpers
+# Helper: cart rows for a cart session, fetched once per request (the cart badge and cart page share them)
+def get_cart_rows(session_id):
+    cache = g.setdefault('cart_rows', {})
+    if session_id not in cache:
+        response = get_supabase().table('cart').select('product_id, quantity').eq('session_id', session_id).execute()
+        cache[session_id] = response.data if response.data else []
+    return cache[session_id]
+
+# Helper: products by ID in a single in_() round trip, returned as {id: product}
+def get_products_by_id(product_ids, columns='*'):
+    ids = sorted({int(pid) for pid in product_ids})
+    if not ids:
+        return {}
+    response = get_supabase().table('products').select(columns).in_('id', ids).execute()
+    return {p['id']: p for p in (response.data or [])}
+
+# Helper: (cart_items, total) for a cart session; two queries however many items it holds.
+# Items are [id, name, price, image, quantity], the row shape cart.html indexes into.
+def get_cart(session_id):
+    rows = get_cart_rows(session_id)
+    products = get_products_by_id([item['product_id'] for item in rows], 'id, name, price, image')
+    cart_items = []
+    total = 0
+    for item in rows:
+        product = products.get(item['product_id'])
+        if product:
+            cart_items.append([product['id'], product['name'], product['price'], product['image'], item['quantity']])
+            total += product['price'] * item['quantity']
+    return cart_items, total
+
+# Helper: items in the current cart session (shares get_cart_rows' per-request cache)
+def get_cart_count():
+    if 'session_id' not in session:
+        return 0
+    try:
+        return sum(item['quantity'] for item in get_cart_rows(session['session_id']))
+    except Exception:
+        return 0
+
+# Helper: content hash of one language's translations (they only change on deploy)
+_translation_versions = {}
+def translations_version(lang):
+    if lang not in _translation_versions:
+        _translation_versions[lang] = make_etag(translations.get(lang, {}))
+    return _translation_versions[lang]
+
+# Helper: everything from the session that base.html shows (navbar, language, cart badge).
+# Returns None while flashed messages are pending so they are never swallowed by a 304.
+def page_viewer_state():
+    if session.get('_flashes'):
+        return None
+    lang = session.get('language', 'en')
+    if lang not in translations:
+        lang = 'en'
+    keys = ('user_id', 'user_name', 'doctor_id', 'admin_logged_in', 'is_admin', 'is_subscribed', 'subscription_pending')
+    return [lang, translations_version(lang), get_cart_count()] + [session.get(k) for k in keys]
+
+app.jinja_env.globals['translations_version'] = translations_version
+
+# Conditional GET (ETag + 304) for read-mostly pages, see http_cache.py
+conditional = ConditionalGet(page_viewer_state, build_id=build_id_for(app))
+
+# Helper: catalog content hash for ETags, or None (no validation) when Supabase is unreachable
+def catalog_version():
+    snapshot = catalog_snapshot()
+    return snapshot.digest if snapshot else None
+
+# Admin actions logging helpers (append-only log with offset index, see audit_log.py)
+action_log = AdminActionLog('admin_actions.log', max_bytes=5 * 1024 * 1024, compress=True, fsync=True)
+
 def get_client_ip():
     """Extract client IP from request, accounting for proxies."""
     if request.headers.get('X-Forwarded-For'):
@@ -171,68 +292,95 @@ def log_admin_action(action, user_id, user_email, prev_is_sub, prev_pending, new
         'ip': get_client_ip()
     }
     try:
-        with open('admin_actions.log', 'a', encoding='utf-8') as f:
-            f.write(json.dumps(entry) + "\n")
+        action_log.append(entry)
     except Exception:
         pass
 
-def read_all_admin_actions():
-    """Read all admin actions from log and return as list with log_index for per-entry undo."""
-    if not os.path.exists('admin_actions.log'):
-        return []
+def log_admin_bulk_action(action, changes):
+    """Log a batch of subscription changes as one entry, so it can be undone as a unit."""
+    entry = {
+        'timestamp': datetime.now().isoformat(),
+        'action': action,
+        'changes': changes,
+        'admin': session.get('admin_user') or session.get('user_id') or 'unknown',
+        'ip': get_client_ip()
+    }
     try:
-        with open('admin_actions.log', 'r', encoding='utf-8') as f:
-            lines = [l.strip() for l in f.readlines() if l.strip()]
-            actions = []
-            for i, line in enumerate(lines):
-                try:
-                    entry = json.loads(line)
-                    entry['log_index'] = i
-                    actions.append(entry)
-                except Exception:
-                    pass
-            return actions
+        action_log.append(entry)
     except Exception:
-        return []
+        pass
 
 def read_last_admin_action():
     """Read the last admin action from log (for legacy undo)."""
-    actions = read_all_admin_actions()
-    return actions[-1] if actions else None
+    try:
+        return action_log.last()
+    except Exception:
+        return None
+
+# Queued outgoing email, kept in Supabase like everything else this app stores (see mail_outbox.py)
+mail_outbox = SupabaseMailOutbox(get_supabase, app.config)
+# Routine admin notifications are batched into one digest per ADMIN_DIGEST_WINDOW seconds
+admin_digest = SupabaseAdminDigest(get_supabase, app.config, mail_outbox)
+# Reminders due in the next 30 minutes sit in a heap; a background thread fires them (see reminders.py)
+# Recurring reminders are stored as one rule each and expanded on demand (see recurrence.py)
+reminder_rules = SupabaseRuleSource(get_supabase)
+# Delivery claims live in Supabase too, so every instance agrees on what was already sent
+reminder_scheduler = ReminderScheduler(SupabaseDeliveryLog(get_supabase),
+                                       [SupabaseReminderSource(get_supabase), reminder_rules],
+                                       [OutboxSink(mail_outbox), LogSink()])
 
 # Helper: send notification email to admin when a user requests subscription
 def send_admin_notification(subject, body):
-    host = app.config.get('SMTP_HOST')
-    admin_email = app.config.get('ADMIN_NOTIFICATION_EMAIL')
-    if not host or not admin_email:
-        return False
+    # Requires SMTP settings in app.config: SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASS, SMTP_USE_TLS (optional), ADMIN_NOTIFICATION_EMAIL
+    # Only queues the message; the outbox thread does the SMTP work outside the request
     try:
-        port = app.config.get('SMTP_PORT', 587)
-        user = app.config.get('SMTP_USER')
-        passwd = app.config.get('SMTP_PASS')
-        use_tls = app.config.get('SMTP_USE_TLS', True)
-
-        msg = EmailMessage()
-        msg['Subject'] = subject
-        msg['From'] = user if user else admin_email
-        msg['To'] = admin_email
-        msg.set_content(body)
-
-        if use_tls:
-            server = smtplib.SMTP(host, port, timeout=10)
-            server.starttls()
-        else:
-            server = smtplib.SMTP(host, port, timeout=10)
-
-        if user and passwd:
-            server.login(user, passwd)
+        return mail_outbox.enqueue(subject, body) is not None
+    except Exception:
+        return False
 
-        server.send_message(msg)
-        server.quit()
-        return True
+# Helper: record an admin-facing event; priority kinds (ADMIN_DIGEST_PRIORITY) are sent at once
+def notify_admin_event(kind, summary, link=None):
+    try:
+        return admin_digest.record(kind, summary, link)
     except Exception:
         return False
 
+APPOINTMENT_STATUSES = ('Pending', 'Confirmed', 'Completed', 'Cancelled')
+
+# Counters shown on the admin pages; served from memory by admin_stats (see admin_stats.py)
+def load_admin_stats():
+    jobs = {
+        'total_users': supabase_pool.submit(supabase_count, 'users'),
+        'subscribed_users': supabase_pool.submit(supabase_count, 'users', is_subscribed=1),
+        'pending_requests': supabase_pool.submit(supabase_count, 'users', subscription_pending=1),
+        'total_contacts': supabase_pool.submit(supabase_count, 'contacts'),
+        'total_products': supabase_pool.submit(supabase_count, 'products'),
+        'total_orders': supabase_pool.submit(supabase_count, 'cart'),
+        'total_appointments': supabase_pool.submit(supabase_count, 'appointments'),
+    }
+    status_jobs = {status: supabase_pool.submit(supabase_count, 'appointments', status=status)
+                   for status in APPOINTMENT_STATUSES}
+    stats = {key: job.result() for key, job in jobs.items()}
+    stats['appointments_by_status'] = {status: job.result() for status, job in status_jobs.items()}
+    return stats
+
+admin_stats = AdminStats(load_admin_stats, interval=30)
+
+# Endpoints whose writes change the admin counters (checkout/remove_from_cart write on GET)
+ADMIN_STATS_WRITE_ENDPOINTS = {
+    'register', 'subscribe', 'contact', 'book_appointment', 'checkout', 'remove_from_cart',
+    'admin_update_appointment_status', 'doctor_update_appointment_status',
+    'admin_approve_subscription', 'admin_reject_subscription', 'admin_grant_subscription',
+    'admin_revoke_subscription', 'admin_bulk_subscriptions', 'admin_undo_action'
+}
+
+@app.after_request
+def refresh_admin_stats_after_write(response):
+    writes = request.method == 'POST' or request.endpoint in ('checkout', 'remove_from_cart')
+    if writes and request.endpoint in ADMIN_STATS_WRITE_ENDPOINTS and response.status_code < 400:
+        admin_stats.invalidate()
+    return response
+
 # ===== ROUTES START HERE =====
 
 # Home page
@@ -247,28 +395,31 @@ def landing():
 def home():
     return render_template('index.html', hero_image="https://images.unsplash.com/photo-1555252333-9f8e92e65df4?auto=format&fit=crop&w=1000")
 
+# Content of the about page (constant; rendered from the fragment cache)
+ABOUT_INFO = {
+    'title': 'About Dream Baby Care',
+    'linkedin_profile': 'https://www.linkedin.com/in/srujan-ss-9b7a1b336/',
+    'description': 'Dream Baby Care is your trusted companion in the beautiful journey of parenthood. We provide smart tracking tools, expert tips, and a curated shop to make your life easier and your baby happier.',
+    'mission': 'To empower every parent with the technology, knowledge, and support they need to raise happy, healthy babies.',
+    'features': [
+        {'icon': 'fas fa-baby-carriage', 'title': 'Smart Tracking', 'desc': 'Effortlessly track sleep, feeding, diaper changes, and health metrics.'},
+        {'icon': 'fas fa-shopping-bag', 'title': 'Curated Shop', 'desc': 'Access high-quality, safe, and essential products for your newborn.'},
+        {'icon': 'fas fa-lightbulb', 'title': 'Expert Guidance', 'desc': 'Get reliable tips on health, hygiene, soothing, and more.'},
+        {'icon': 'fas fa-shield-alt', 'title': 'Secure & Private', 'desc': 'Your family data is kept safe and private.'}
+    ],
+    'values': [
+        {'title': 'Compassion', 'desc': 'We care deeply about the well-being of every family.'},
+        {'title': 'Integrity', 'desc': 'We provide honest, evidence-based information.'},
+        {'title': 'Community', 'desc': 'We are building a supportive community for parents.'}
+    ]
+}
+
 # About page
 @app.route('/about')
 @login_required
+@conditional()
 def about():
-    about_info = {
-        'title': 'About Dream Baby Care',
-        'linkedin_profile': 'https://www.linkedin.com/in/srujan-ss-9b7a1b336/',
-        'description': 'Dream Baby Care is your trusted companion in the beautiful journey of parenthood. We provide smart tracking tools, expert tips, and a curated shop to make your life easier and your baby happier.',
-        'mission': 'To empower every parent with the technology, knowledge, and support they need to raise happy, healthy babies.',
-        'features': [
-            {'icon': 'fas fa-baby-carriage', 'title': 'Smart Tracking', 'desc': 'Effortlessly track sleep, feeding, diaper changes, and health metrics.'},
-            {'icon': 'fas fa-shopping-bag', 'title': 'Curated Shop', 'desc': 'Access high-quality, safe, and essential products for your newborn.'},
-            {'icon': 'fas fa-lightbulb', 'title': 'Expert Guidance', 'desc': 'Get reliable tips on health, hygiene, soothing, and more.'},
-            {'icon': 'fas fa-shield-alt', 'title': 'Secure & Private', 'desc': 'Your family data is kept safe and private.'}
-        ],
-        'values': [
-            {'title': 'Compassion', 'desc': 'We care deeply about the well-being of every family.'},
-            {'title': 'Integrity', 'desc': 'We provide honest, evidence-based information.'},
-            {'title': 'Community', 'desc': 'We are building a supportive community for parents.'}
-        ]
-    }
-    return render_template('about.html', info=about_info)
+    return render_template('about.html', info=ABOUT_INFO)
 
 # Set language preference
 @app.route('/set_language/<lang>')
@@ -277,14 +428,29 @@ def set_language(lang):
         session['language'] = lang
         if 'user_id' in session:
             try:
-                supabase.table('users').update({'language': lang}).eq('email', session['user_id']).execute()
+                get_supabase().table('users').update({'language': lang}).eq('email', session['user_id']).execute()
             except Exception:
                 pass
     return redirect(request.referrer or url_for('home'))
 
 # Tips page
+# Categories with optional tip videos under static/videos/<slug>/
+TIP_VIDEO_CATEGORIES = ['Feeding', 'Diapering', 'Health', 'Bathing', 'Soothing']
+
+# Helper: modification times of the tip video folders (changes when videos are added or removed)
+def video_manifest_version():
+    stamps = []
+    for cat in TIP_VIDEO_CATEGORIES:
+        folder = os.path.join(app.root_path, 'static', 'videos', cat.lower().replace(' ', '_'))
+        try:
+            stamps.append(os.stat(folder).st_mtime_ns)
+        except OSError:
+            stamps.append(0)
+    return stamps
+
 @app.route('/tips')
 @login_required
+@conditional(video_manifest_version)
 def tips():
     lang = session.get('language', 'en')
     if lang not in translations:
@@ -299,7 +465,7 @@ def tips():
             tips_content[key] = lang_data['tips'][key]
     
     videos_by_category = {}
-    categories = ['Feeding', 'Diapering', 'Health', 'Bathing', 'Soothing']
+    categories = TIP_VIDEO_CATEGORIES
     for cat in categories:
         slug = cat.lower().replace(' ', '_')
         folder = os.path.join(app.root_path, 'static', 'videos', slug)
@@ -320,37 +486,80 @@ def tips():
                          tips_content=tips_content,
                          categories=categories,
                          videos_by_category=videos_by_category,
+                         videos_version=video_manifest_version(),
                          is_subscribed=is_sub,
                          subscription_pending=sub_pending)
 
+# Helper: load every product for the in-memory catalog (see catalog.py)
+def load_products():
+    response = get_supabase().table('products').select('*').order('id').execute()
+    return response.data if response.data else []
+
+# Products are served from memory; Supabase has no change feed here, so rebuild every 5 minutes
+catalog = ProductCatalog(load_products, id_of=lambda p: p.get('id'),
+                         category_of=lambda p: p.get('category', 'Other'), check_interval=300)
+
+# Helper: current catalog snapshot, or None when Supabase cannot be reached
+def catalog_snapshot():
+    try:
+        return catalog.snapshot()
+    except Exception:
+        return None
+
 # Shop page
 @app.route('/shop')
 @login_required
+@conditional(catalog_version)
 def shop():
+    snapshot = catalog_snapshot()
+    return render_template('shop.html', categories=snapshot.categories if snapshot else {})
+
+# Full-text product search with category/price facets (see product_search.py)
+product_search = SupabaseProductSearch(get_supabase)
+
+# Helper: a product dict in the row shape shop_search.html indexes into, as in the SQLite products table:
+# [id, name, description, price, image, category, sale_price]
+def product_row(product):
+    return [product.get('id'), product.get('name'), product.get('description') or '', product.get('price'),
+            product.get('image'), product.get('category'), product.get('sale_price')]
+
+# Product search
+@app.route('/shop/search')
+@login_required
+def shop_search():
+    query = request.args.get('q', '').strip()
+    category = request.args.get('category', '').strip() or None
+    band = request.args.get('price', '').strip() or None
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = 24
     try:
-        response = supabase.table('products').select('*').execute()
-        products = response.data if response.data else []
+        ids, total, facets = product_search.search(query, category=category, band=band,
+                                                   limit=per_page, offset=(page - 1) * per_page)
     except Exception:
-        products = []
-    
-    categories = {}
-    for product in products:
-        category = product.get('category', 'Other')
-        if category not in categories:
-            categories[category] = []
-        categories[category].append(product)
-    
-    return render_template('shop.html', categories=categories)
+        ids, total, facets = [], 0, {'category': [], 'price': []}
+
+    # Results are shown from the catalog snapshot, in ranked order
+    snapshot = catalog_snapshot()
+    products = [snapshot.get(pid) for pid in ids if snapshot and snapshot.get(pid)]
+
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'query': query,
+            'total': total,
+            'page': page,
+            'results': [{k: p.get(k) for k in ('id', 'name', 'price', 'sale_price', 'image', 'category')} for p in products],
+            'facets': facets
+        })
+    return render_template('shop_search.html', query=query, products=[product_row(p) for p in products],
+                           total=total, facets=facets, category=category, band=band, page=page,
+                           has_next=page * per_page < total)
 
 # Product detail page
 @app.route('/product/<int:product_id>')
+@conditional(catalog_version)
 def product_detail(product_id):
-    try:
-        response = supabase.table('products').select('*').eq('id', product_id).execute()
-        product = response.data[0] if response.data else None
-    except Exception:
-        product = None
-    
+    snapshot = catalog_snapshot()
+    product = snapshot.get(product_id) if snapshot else None
     if product:
         return render_template('product_detail.html', product=product)
     else:
@@ -359,21 +568,17 @@ def product_detail(product_id):
 # Add to cart functionality
 @app.route('/add_to_cart/<int:product_id>')
 def add_to_cart(product_id):
-    try:
-        response = supabase.table('products').select('name').eq('id', product_id).execute()
-        if response.data:
-            product = response.data[0]
-            return redirect(f"https://blinkit.com/s/?q={quote(product['name'])}")
-    except Exception:
-        pass
-    
+    snapshot = catalog_snapshot()
+    product = snapshot.get(product_id) if snapshot else None
+    if product:
+        return redirect(f"https://blinkit.com/s/?q={quote(product['name'])}")
     return redirect(url_for('shop'))
 
 @app.route('/remove_from_cart/<int:product_id>')
 def remove_from_cart(product_id):
     if 'session_id' in session:
         try:
-            supabase.table('cart').delete().eq('product_id', product_id).eq('session_id', session['session_id']).execute()
+            get_supabase().table('cart').delete().eq('product_id', product_id).eq('session_id', session['session_id']).execute()
             flash('Item removed from cart', 'info')
         except Exception:
             pass
@@ -384,8 +589,13 @@ def remove_from_cart(product_id):
 def checkout():
     if 'session_id' in session:
         try:
-            supabase.table('cart').delete().eq('session_id', session['session_id']).execute()
-            flash('Order placed successfully! Thank you for shopping.', 'success')
+            cart_items, total = get_cart(session['session_id'])
+            get_supabase().table('cart').delete().eq('session_id', session['session_id']).execute()
+            g.pop('cart_rows', None)
+            if cart_items:
+                flash(f"Order placed successfully! {len(cart_items)} item(s), total {format_inr(total)}. Thank you for shopping.", 'success')
+            else:
+                flash('Order placed successfully! Thank you for shopping.', 'success')
         except Exception:
             pass
     return redirect(url_for('shop'))
@@ -397,23 +607,7 @@ def cart():
         return render_template('cart.html', cart_items=[], total=0)
     
     try:
-        response = supabase.table('cart').select('product_id, quantity').eq('session_id', session['session_id']).execute()
-        cart_data = response.data if response.data else []
-        
-        cart_items = []
-        total = 0
-        for item in cart_data:
-            prod_resp = supabase.table('products').select('*').eq('id', item['product_id']).execute()
-            if prod_resp.data:
-                product = prod_resp.data[0]
-                cart_items.append({
-                    'id': product['id'],
-                    'name': product['name'],
-                    'price': product['price'],
-                    'image': product['image'],
-                    'quantity': item['quantity']
-                })
-                total += product['price'] * item['quantity']
+        cart_items, total = get_cart(session['session_id'])
     except Exception:
         cart_items = []
         total = 0
@@ -434,7 +628,7 @@ def contact():
         date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         try:
-            supabase.table('contacts').insert({
+            get_supabase().table('contacts').insert({
                 'name': name,
                 'email': email,
                 'message': message,
@@ -443,11 +637,12 @@ def contact():
         except Exception:
             flash('Error submitting contact form', 'danger')
             return redirect(url_for('contact'))
+        notify_admin_event('contact_message', f"{name} <{email}>: {message[:80]}", f"{request.url_root}admin/contacts")
         
         return redirect(url_for('contact_success'))
 
     try:
-        response = supabase.table('doctors').select('*').execute()
+        response = get_supabase().table('doctors').select('*').execute()
         doctors = response.data if response.data else []
     except Exception:
         doctors = []
@@ -462,7 +657,7 @@ def book_appointment():
     appt_type = request.form.get('type')
     
     try:
-        supabase.table('appointments').insert({
+        get_supabase().table('appointments').insert({
             'user_id': session['user_id'],
             'doctor_id': int(doctor_id),
             'appointment_time': appt_time,
@@ -488,11 +683,11 @@ def subscribe_newsletter():
         return redirect(request.referrer or url_for('home'))
 
     try:
-        response = supabase.table('newsletter_subscribers').select('email').eq('email', email).execute()
+        response = get_supabase().table('newsletter_subscribers').select('email').eq('email', email).execute()
         if response.data:
             flash('You are already subscribed to our newsletter!', 'info')
         else:
-            supabase.table('newsletter_subscribers').insert({
+            get_supabase().table('newsletter_subscribers').insert({
                 'email': email,
                 'subscribed_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }).execute()
@@ -506,7 +701,7 @@ def subscribe_newsletter():
 @admin_required
 def admin_contacts():
     try:
-        response = supabase.table('contacts').select('*').order('date', desc=True).execute()
+        response = get_supabase().table('contacts').select('*').order('date', desc=True).execute()
         contacts = response.data if response.data else []
     except Exception:
         contacts = []
@@ -524,7 +719,7 @@ def admin_reply_contact(contact_id):
     try:
         replied_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         admin_user = session.get('admin_user') or session.get('user_id') or 'admin'
-        supabase.table('contacts').update({
+        get_supabase().table('contacts').update({
             'admin_reply': reply,
             'replied_at': replied_at,
             'replied_by': admin_user
@@ -539,7 +734,7 @@ def admin_reply_contact(contact_id):
 @admin_required
 def admin_doctors():
     try:
-        response = supabase.table('doctors').select('*').execute()
+        response = get_supabase().table('doctors').select('*').execute()
         doctors = response.data if response.data else []
     except Exception:
         doctors = []
@@ -550,7 +745,7 @@ def admin_doctors():
 @admin_required
 def admin_add_doctor():
     try:
-        supabase.table('doctors').insert({
+        get_supabase().table('doctors').insert({
             'name': request.form.get('name'),
             'specialization': request.form.get('specialization'),
             'email': request.form.get('email'),
@@ -568,7 +763,7 @@ def admin_add_doctor():
 @admin_required
 def admin_delete_doctor(doctor_id):
     try:
-        supabase.table('doctors').delete().eq('id', doctor_id).execute()
+        get_supabase().table('doctors').delete().eq('id', doctor_id).execute()
     except Exception:
         flash('Error deleting doctor', 'danger')
     
@@ -579,7 +774,7 @@ def admin_delete_doctor(doctor_id):
 def admin_appointments():
     status_filter = request.args.get('status')
     try:
-        response = supabase.table('appointments').select('*').execute()
+        response = get_supabase().table('appointments').select('*').execute()
         appointments = response.data if response.data else []
         
         if status_filter and status_filter != 'All':
@@ -587,14 +782,18 @@ def admin_appointments():
     except Exception:
         appointments = []
     
-    return render_template('admin_appointments.html', appointments=appointments, current_status=status_filter)
+    stats = admin_stats.get()
+    return render_template('admin_appointments.html', appointments=appointments, current_status=status_filter,
+                           status_counts=stats.get('appointments_by_status', {}),
+                           total_appointments=stats.get('total_appointments'),
+                           stats_refreshed_at=stats.get('refreshed_at'))
 
 @app.route('/admin/appointment/status/<int:appt_id>', methods=['POST'])
 @admin_required
 def admin_update_appointment_status(appt_id):
     status = request.form.get('status')
     try:
-        supabase.table('appointments').update({'status': status}).eq('id', appt_id).execute()
+        get_supabase().table('appointments').update({'status': status}).eq('id', appt_id).execute()
         flash(f'Appointment status updated to {status}', 'success')
     except Exception:
         flash('Error updating appointment', 'danger')
@@ -610,7 +809,7 @@ def doctor_login():
         email = request.form.get('email')
         password = request.form.get('password')
         try:
-            response = supabase.table('doctors').select('*').eq('email', email).eq('password', password).execute()
+            response = get_supabase().table('doctors').select('*').eq('email', email).eq('password', password).execute()
             if response.data and len(response.data) > 0:
                 doctor = response.data[0]
                 session['doctor_id'] = doctor['id']
@@ -627,10 +826,10 @@ def doctor_login():
 @doctor_required
 def doctor_dashboard():
     try:
-        doctor_response = supabase.table('doctors').select('name, specialization').eq('id', session['doctor_id']).execute()
+        doctor_response = get_supabase().table('doctors').select('name, specialization').eq('id', session['doctor_id']).execute()
         doctor_details = doctor_response.data[0] if doctor_response.data else None
 
-        appt_response = supabase.table('appointments').select('*').eq('doctor_id', session['doctor_id']).execute()
+        appt_response = get_supabase().table('appointments').select('*').eq('doctor_id', session['doctor_id']).execute()
         appointments = appt_response.data if appt_response.data else []
         appointments = [a for a in appointments if a.get('status') in ['Confirmed', 'Pending']]
     except Exception:
@@ -661,7 +860,7 @@ def doctor_update_appointment_status(appt_id):
         update_data = {'status': status}
         if notes:
             update_data['notes'] = notes
-        supabase.table('appointments').update(update_data).eq('id', appt_id).eq('doctor_id', session['doctor_id']).execute()
+        get_supabase().table('appointments').update(update_data).eq('id', appt_id).eq('doctor_id', session['doctor_id']).execute()
         flash(f'Appointment marked as {status}', 'success')
     except Exception:
         flash('Error updating appointment', 'danger')
@@ -719,11 +918,11 @@ def register():
             baby_age = "Unknown"
         
         try:
-            response = supabase.table('users').select('email').eq('email', email).execute()
+            response = get_supabase().table('users').select('email').eq('email', email).execute()
             if response.data:
                 return render_template('register.html', error="Email already registered")
             
-            supabase.table('users').insert({
+            get_supabase().table('users').insert({
                 'email': email,
                 'password': password,
                 'parent_name': parent_name,
@@ -756,7 +955,7 @@ def login():
         password = request.form.get('password')
         
         try:
-            response = supabase.table('users').select('*').eq('email', email).eq('password', password).execute()
+            response = get_supabase().table('users').select('*').eq('email', email).eq('password', password).execute()
             if response.data and len(response.data) > 0:
                 user = response.data[0]
                 session['user_id'] = email
@@ -779,16 +978,16 @@ def login():
 @login_required
 def user_dashboard():
     try:
-        user_response = supabase.table('users').select('*').eq('email', session['user_id']).execute()
+        user_response = get_supabase().table('users').select('*').eq('email', session['user_id']).execute()
         user = user_response.data[0] if user_response.data else None
 
-        tracker_response = supabase.table('baby_tracker').select('*').eq('user_id', session['user_id']).order('created_at', desc=True).limit(10).execute()
+        tracker_response = get_supabase().table('baby_tracker').select('*').eq('user_id', session['user_id']).order('created_at', desc=True).limit(10).execute()
         tracking_data = tracker_response.data if tracker_response.data else []
 
-        contacts_response = supabase.table('contacts').select('*').eq('email', session['user_id']).order('date', desc=True).execute()
+        contacts_response = get_supabase().table('contacts').select('*').eq('email', session['user_id']).order('date', desc=True).execute()
         user_contacts = contacts_response.data if contacts_response.data else []
 
-        appt_response = supabase.table('appointments').select('*').eq('user_id', session['user_id']).order('appointment_time', desc=True).execute()
+        appt_response = get_supabase().table('appointments').select('*').eq('user_id', session['user_id']).order('appointment_time', desc=True).execute()
         appointments = appt_response.data if appt_response.data else []
     except Exception:
         user = None
@@ -822,7 +1021,7 @@ def add_tracker():
         return jsonify({'error': 'Activity type is required'}), 400
     
     try:
-        supabase.table('baby_tracker').insert({
+        get_supabase().table('baby_tracker').insert({
             'user_id': session['user_id'],
             'activity_type': activity_type,
             'start_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
@@ -837,11 +1036,11 @@ def add_tracker():
 @login_required
 def end_tracker(tracker_id):
     try:
-        response = supabase.table('baby_tracker').select('*').eq('id', tracker_id).eq('user_id', session['user_id']).execute()
+        response = get_supabase().table('baby_tracker').select('*').eq('id', tracker_id).eq('user_id', session['user_id']).execute()
         if not response.data:
             return jsonify({'error': 'Tracker not found'}), 404
         
-        supabase.table('baby_tracker').update({'end_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")}).eq('id', tracker_id).execute()
+        get_supabase().table('baby_tracker').update({'end_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")}).eq('id', tracker_id).execute()
         return jsonify({'success': True, 'message': f'{response.data[0].get("activity_type")} ended!'}), 200
     except Exception:
         return jsonify({'error': 'Error ending tracker'}), 500
@@ -850,11 +1049,11 @@ def end_tracker(tracker_id):
 @login_required
 def delete_tracker(tracker_id):
     try:
-        response = supabase.table('baby_tracker').select('*').eq('id', tracker_id).eq('user_id', session['user_id']).execute()
+        response = get_supabase().table('baby_tracker').select('*').eq('id', tracker_id).eq('user_id', session['user_id']).execute()
         if not response.data:
             return jsonify({'error': 'Tracker not found'}), 404
         
-        supabase.table('baby_tracker').delete().eq('id', tracker_id).execute()
+        get_supabase().table('baby_tracker').delete().eq('id', tracker_id).execute()
         return jsonify({'success': True, 'message': 'Entry deleted!'}), 200
     except Exception:
         return jsonify({'error': 'Error deleting tracker'}), 500
@@ -869,13 +1068,24 @@ def add_reminder():
     if not message or not remind_time:
         return jsonify({'error': 'Message and time are required'}), 400
 
+    now = datetime.now().replace(microsecond=0)
     try:
-        supabase.table('reminders').insert({
+        due = due_at_for(remind_time, now)
+    except ValueError:
+        return jsonify({'error': 'Invalid reminder time'}), 400
+
+    try:
+        response = get_supabase().table('reminders').insert({
             'user_id': session['user_id'],
             'message': message,
             'remind_time': remind_time,
-            'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            'created_at': now.strftime("%Y-%m-%d %H:%M:%S"),
+            'due_at': due.strftime("%Y-%m-%d %H:%M:%S")
         }).execute()
+        if response.data:
+            reminder_id = response.data[0]['id']
+            reminder_scheduler.add(f'reminder:{reminder_id}', due,
+                                   {'id': reminder_id, 'user_id': session['user_id'], 'message': message, 'due_at': due})
         return jsonify({'success': True, 'message': 'Reminder set!'})
     except Exception:
         return jsonify({'error': 'Error adding reminder'}), 500
@@ -884,11 +1094,44 @@ def add_reminder():
 @login_required
 def delete_reminder(reminder_id):
     try:
-        supabase.table('reminders').delete().eq('id', reminder_id).eq('user_id', session['user_id']).execute()
+        response = get_supabase().table('reminders').delete().eq('id', reminder_id).eq('user_id', session['user_id']).execute()
+        if response.data:
+            reminder_scheduler.cancel(f'reminder:{reminder_id}')
         return jsonify({'success': True, 'message': 'Reminder deleted!'})
     except Exception:
         return jsonify({'error': 'Error deleting reminder'}), 500
 
+@app.route('/tracker/reminder/rule/add', methods=['POST'])
+@login_required
+def add_reminder_rule():
+    message = request.form.get('message')
+    if not message:
+        return jsonify({'error': 'Message is required'}), 400
+
+    now = datetime.now().replace(microsecond=0)
+    try:
+        rule = rule_from_form(request.form, now)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        rule_id = reminder_rules.add_rule(session['user_id'], message, rule, now)
+        if rule_id is not None:
+            reminder_scheduler.add_rule(rule_id, rule, {'user_id': session['user_id'], 'message': message}, now)
+        return jsonify({'success': True, 'message': f'Repeating reminder set: {rule.describe()}'})
+    except Exception:
+        return jsonify({'error': 'Error adding reminder'}), 500
+
+@app.route('/tracker/reminder/rule/delete/<int:rule_id>', methods=['POST'])
+@login_required
+def delete_reminder_rule(rule_id):
+    try:
+        if reminder_rules.delete_rule(rule_id, session['user_id']):
+            reminder_scheduler.cancel_rule(rule_id)
+        return jsonify({'success': True, 'message': 'Repeating reminder deleted!'})
+    except Exception:
+        return jsonify({'error': 'Error deleting reminder'}), 500
+
 # Tracker page
 @app.route('/tracker')
 @login_required
@@ -896,17 +1139,20 @@ def tracker_page():
     try:
         date_filter = request.args.get('date')
         if date_filter:
-            response = supabase.table('baby_tracker').select('*').eq('user_id', session['user_id']).like('start_time', f"{date_filter}%").order('created_at', desc=True).execute()
+            response = get_supabase().table('baby_tracker').select('*').eq('user_id', session['user_id']).like('start_time', f"{date_filter}%").order('created_at', desc=True).execute()
         else:
-            response = supabase.table('baby_tracker').select('*').eq('user_id', session['user_id']).order('created_at', desc=True).execute()
+            response = get_supabase().table('baby_tracker').select('*').eq('user_id', session['user_id']).order('created_at', desc=True).execute()
         
         raw_data = response.data if response.data else []
 
-        reminders_response = supabase.table('reminders').select('*').eq('user_id', session['user_id']).order('remind_time').execute()
+        reminders_response = get_supabase().table('reminders').select('*').eq('user_id', session['user_id']).order('remind_time').execute()
         reminders = reminders_response.data if reminders_response.data else []
+        # Repeating reminders: only their next few occurrences are computed
+        recurring = rule_summaries(reminder_rules.rules_for(session['user_id']), datetime.now())
     except Exception:
         raw_data = []
         reminders = []
+        recurring = []
     
     today_str = datetime.now().strftime("%Y-%m-%d")
     display_date = request.args.get('date') if request.args.get('date') else today_str
@@ -968,7 +1214,8 @@ def tracker_page():
                          activities=formatted_activities, 
                          stats=stats,
                          current_date=display_date,
-                         reminders=reminders)
+                         reminders=reminders,
+                         recurring=recurring)
 
 def analyze_activities_for_health(activities, stats):
     """Simple health analysis based on activities"""
@@ -1022,10 +1269,10 @@ def tracker_analyze():
     date_filter = request.args.get('date')
     try:
         if date_filter:
-            response = supabase.table('baby_tracker').select('*').eq('user_id', session['user_id']).like('start_time', f"{date_filter}%").order('created_at', desc=True).execute()
+            response = get_supabase().table('baby_tracker').select('*').eq('user_id', session['user_id']).like('start_time', f"{date_filter}%").order('created_at', desc=True).execute()
         else:
             today = datetime.now().strftime('%Y-%m-%d')
-            response = supabase.table('baby_tracker').select('*').eq('user_id', session['user_id']).like('start_time', f"{today}%").order('created_at', desc=True).execute()
+            response = get_supabase().table('baby_tracker').select('*').eq('user_id', session['user_id']).like('start_time', f"{today}%").order('created_at', desc=True).execute()
         rows = response.data if response.data else []
     except Exception:
         rows = []
@@ -1050,7 +1297,7 @@ def tracker_analyze():
 
 def _user_is_subscribed(user_email):
     try:
-        response = supabase.table('users').select('is_subscribed').eq('email', user_email).execute()
+        response = get_supabase().table('users').select('is_subscribed').eq('email', user_email).execute()
         if response.data and len(response.data) > 0:
             return bool(response.data[0].get('is_subscribed'))
     except Exception:
@@ -1164,7 +1411,7 @@ def ai_clear():
 @login_required
 def subscription_status():
     try:
-        response = supabase.table('users').select('is_subscribed, subscription_pending').eq('email', session['user_id']).execute()
+        response = get_supabase().table('users').select('is_subscribed, subscription_pending').eq('email', session['user_id']).execute()
         if response.data:
             user = response.data[0]
             is_subscribed = 1 if user.get('is_subscribed') else 0
@@ -1188,7 +1435,7 @@ def protected_video(filename):
         return abort(404)
 
     try:
-        response = supabase.table('users').select('is_subscribed').eq('email', session['user_id']).execute()
+        response = get_supabase().table('users').select('is_subscribed').eq('email', session['user_id']).execute()
         if not response.data or not response.data[0].get('is_subscribed'):
             flash('You must be subscribed to access this content.', 'warning')
             return redirect(url_for('subscribe'))
@@ -1203,60 +1450,71 @@ def protected_video(filename):
 def subscribe():
     if request.method == 'POST':
         try:
-            supabase.table('users').update({'subscription_pending': 1}).eq('email', session['user_id']).execute()
+            get_supabase().table('users').update({'subscription_pending': 1}).eq('email', session['user_id']).execute()
             session['subscription_pending'] = 1
         except Exception:
             pass
 
-        try:
-            subject = f"Subscription request: {session.get('user_id')}"
-            body = f"User {session.get('user_id')} has requested subscription access. Please verify payment and approve in the admin panel."
-            send_admin_notification(subject, body)
-        except Exception:
-            pass
+        notify_admin_event('subscription_request',
+                           f"User {session.get('user_id')} has requested subscription access",
+                           f"{request.url_root}admin/manage_subscriptions")
 
         return redirect(url_for('user_dashboard'))
 
     return render_template('subscribe.html', price=99)
 
+# Columns the admin user tables may be sorted by
+ADMIN_USER_SORTS = ('created_at', 'parent_name', 'email', 'baby_name')
+
 @app.route('/admin/dashboard')
 @admin_required
 def admin_dashboard():
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 10, type=int), 1), 100)
+    # PostgREST or_() filters are comma/paren separated, so keep those out of the pattern
+    search = ''.join(ch for ch in request.args.get('q', '').strip() if ch not in ',()')
+    sort = request.args.get('sort', 'created_at')
+    if sort not in ADMIN_USER_SORTS:
+        sort = 'created_at'
+    desc = request.args.get('dir') != 'asc'
+    offset = (page - 1) * per_page
+
+    def users_page():
+        query = get_supabase().table('users').select('id, email, parent_name, baby_name, baby_dob, baby_age, phone, address, created_at, is_subscribed, subscription_pending')
+        if search:
+            query = query.or_(f"email.ilike.%{search}%,parent_name.ilike.%{search}%,baby_name.ilike.%{search}%")
+        # range() is inclusive, so this asks for one extra row to detect a next page
+        return query.order(sort, desc=desc).order('id', desc=desc).range(offset, offset + per_page).execute().data or []
+
+    def recent_contacts_query():
+        return get_supabase().table('contacts').select('*').limit(5).order('date', desc=True).execute().data or []
+
+    # The two row queries run concurrently; counters come from the in-memory admin_stats snapshot
+    users_job = supabase_pool.submit(users_page)
+    contacts_job = supabase_pool.submit(recent_contacts_query)
+    stats = dict(admin_stats.get())
     try:
-        users_response = supabase.table('users').select('*').order('created_at', desc=True).execute()
-        users = users_response.data if users_response.data else []
-
-        contacts_response = supabase.table('contacts').select('*').limit(5).order('date', desc=True).execute()
-        recent_contacts = contacts_response.data if contacts_response.data else []
-
-        total_users = len(users)
-        total_contacts = len(supabase.table('contacts').select('id').execute().data or [])
-        total_products = len(supabase.table('products').select('id').execute().data or [])
-        total_orders = len(supabase.table('cart').select('id').execute().data or [])
+        users = users_job.result()
     except Exception:
         users = []
+    try:
+        recent_contacts = contacts_job.result()
+    except Exception:
         recent_contacts = []
-        total_users = total_contacts = total_products = total_orders = 0
-    
-    pending_count = len([u for u in users if u.get('subscription_pending')])
-    subscribed_count = len([u for u in users if u.get('is_subscribed')])
-    
-    stats = {
-        'total_users': total_users,
-        'total_contacts': total_contacts,
-        'total_products': total_products,
-        'total_orders': total_orders,
-        'pending_requests': pending_count,
-        'subscribed_users': subscribed_count
-    }
 
-    return render_template('admin_dashboard.html', users=users, stats=stats, recent_contacts=recent_contacts)
+    has_next = len(users) > per_page
+    users = users[:per_page]
+
+    pagination = {'page': page, 'per_page': per_page, 'has_next': has_next,
+                  'q': search, 'sort': sort, 'dir': 'desc' if desc else 'asc'}
+    return render_template('admin_dashboard.html', users=users, stats=stats, recent_contacts=recent_contacts,
+                           pagination=pagination)
 
 @app.route('/admin/users')
 @admin_required
 def admin_manage_users():
     try:
-        response = supabase.table('users').select('*').order('created_at', desc=True).execute()
+        response = get_supabase().table('users').select('*').order('created_at', desc=True).execute()
         users = response.data if response.data else []
     except Exception:
         users = []
@@ -1267,7 +1525,7 @@ def admin_manage_users():
 @admin_required
 def admin_promote_user(user_id):
     try:
-        supabase.table('users').update({'is_admin': 1}).eq('id', user_id).execute()
+        get_supabase().table('users').update({'is_admin': 1}).eq('id', user_id).execute()
     except Exception:
         flash('Error promoting user', 'danger')
     
@@ -1277,7 +1535,7 @@ def admin_promote_user(user_id):
 @admin_required
 def admin_demote_user(user_id):
     try:
-        supabase.table('users').update({'is_admin': 0}).eq('id', user_id).execute()
+        get_supabase().table('users').update({'is_admin': 0}).eq('id', user_id).execute()
     except Exception:
         flash('Error demoting user', 'danger')
     
@@ -1287,7 +1545,7 @@ def admin_demote_user(user_id):
 @admin_required
 def admin_subscriptions():
     try:
-        response = supabase.table('users').select('id, email, parent_name, created_at').eq('subscription_pending', 1).execute()
+        response = get_supabase().table('users').select('id, email, parent_name, created_at').eq('subscription_pending', 1).execute()
         requests = response.data if response.data else []
     except Exception:
         requests = []
@@ -1298,10 +1556,10 @@ def admin_subscriptions():
 @admin_required
 def admin_approve_subscription(user_id):
     try:
-        response = supabase.table('users').select('email, is_subscribed, subscription_pending').eq('id', user_id).execute()
+        response = get_supabase().table('users').select('email, is_subscribed, subscription_pending').eq('id', user_id).execute()
         if response.data:
             user = response.data[0]
-            supabase.table('users').update({'is_subscribed': 1, 'subscription_pending': 0}).eq('id', user_id).execute()
+            get_supabase().table('users').update({'is_subscribed': 1, 'subscription_pending': 0}).eq('id', user_id).execute()
             flash(f"Approved subscription for {user.get('email')}", 'success')
     except Exception:
         flash('Error approving subscription', 'danger')
@@ -1312,42 +1570,76 @@ def admin_approve_subscription(user_id):
 @admin_required
 def admin_reject_subscription(user_id):
     try:
-        response = supabase.table('users').select('email').eq('id', user_id).execute()
+        response = get_supabase().table('users').select('email').eq('id', user_id).execute()
         if response.data:
             user = response.data[0]
-            supabase.table('users').update({'subscription_pending': 0, 'is_subscribed': 0}).eq('id', user_id).execute()
+            get_supabase().table('users').update({'subscription_pending': 0, 'is_subscribed': 0}).eq('id', user_id).execute()
             flash(f"Rejected subscription request for {user.get('email')}", 'warning')
     except Exception:
         flash('Error rejecting subscription', 'danger')
     
     return redirect(request.referrer or url_for('admin_manage_subscriptions'))
 
+SUBSCRIPTION_TABS = {
+    'pending': {'subscription_pending': 1},
+    'subscribed': {'is_subscribed': 1},
+    'all': {},
+}
+
 @app.route('/admin/manage_subscriptions')
 @admin_required
 def admin_manage_subscriptions():
+    """Admin page to manage all user subscriptions: grant, revoke, approve pending requests.
+
+    Only the selected tab is queried, one keyset page at a time (newest first).
+    """
+    tab = request.args.get('tab', 'pending')
+    if tab not in SUBSCRIPTION_TABS:
+        tab = 'pending'
+    search = request.args.get('q', '').strip()
+    cursor = request.args.get('after', '')
+    per_page = 50
+
     try:
-        users_response = supabase.table('users').select('id, email, parent_name, baby_name, is_subscribed, subscription_pending').order('created_at', desc=True).execute()
-        all_users = users_response.data if users_response.data else []
-        
-        pending_requests = [u for u in all_users if u.get('subscription_pending')]
-        subscribed_users = [u for u in all_users if u.get('is_subscribed')]
+        query = get_supabase().table('users').select('id, email, parent_name, baby_name, created_at, is_subscribed, subscription_pending')
+        for column, value in SUBSCRIPTION_TABS[tab].items():
+            query = query.eq(column, value)
+        if search:
+            term = search.replace(',', ' ').replace('(', ' ').replace(')', ' ')
+            query = query.or_(f"email.ilike.%{term}%,parent_name.ilike.%{term}%")
+        if '|' in cursor:
+            # Keyset pagination: continue strictly after the last (created_at, id) shown
+            after_created, after_id = cursor.rsplit('|', 1)
+            after_id = int(after_id) if after_id.isdigit() else 0
+            query = query.or_(f'created_at.lt."{after_created}",and(created_at.eq."{after_created}",id.lt.{after_id})')
+        users_response = query.order('created_at', desc=True).order('id', desc=True).limit(per_page + 1).execute()
+        rows = users_response.data if users_response.data else []
     except Exception:
-        all_users = []
-        pending_requests = []
-        subscribed_users = []
-    
+        rows = []
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = f"{rows[-1].get('created_at')}|{rows[-1].get('id')}"
+
+    stats = admin_stats.get()
     return render_template('admin_manage_subscriptions.html',
-                          pending_requests=pending_requests,
-                          subscribed_users=subscribed_users,
-                          all_users=all_users,
-                          pending_count=len(pending_requests),
-                          subscribed_count=len(subscribed_users))
+                          tab=tab,
+                          search=search,
+                          cursor=cursor,
+                          next_cursor=next_cursor,
+                          pending_requests=rows if tab == 'pending' else [],
+                          subscribed_users=rows if tab == 'subscribed' else [],
+                          all_users=rows if tab == 'all' else [],
+                          pending_count=stats.get('pending_requests', 0),
+                          subscribed_count=stats.get('subscribed_users', 0),
+                          stats_refreshed_at=stats.get('refreshed_at'))
 
 @app.route('/admin/grant_subscription/<int:user_id>', methods=['POST'])
 @admin_required
 def admin_grant_subscription(user_id):
     try:
-        supabase.table('users').update({'is_subscribed': 1, 'subscription_pending': 0}).eq('id', user_id).execute()
+        get_supabase().table('users').update({'is_subscribed': 1, 'subscription_pending': 0}).eq('id', user_id).execute()
         flash('Subscription granted', 'success')
     except Exception:
         flash('Error granting subscription', 'danger')
@@ -1358,40 +1650,112 @@ def admin_grant_subscription(user_id):
 @admin_required
 def admin_revoke_subscription(user_id):
     try:
-        supabase.table('users').update({'is_subscribed': 0, 'subscription_pending': 0}).eq('id', user_id).execute()
+        get_supabase().table('users').update({'is_subscribed': 0, 'subscription_pending': 0}).eq('id', user_id).execute()
         flash('Subscription revoked', 'warning')
     except Exception:
         flash('Error revoking subscription', 'danger')
     
     return redirect(url_for('admin_manage_subscriptions'))
 
+# Bulk action -> (new is_subscribed, new subscription_pending), same as the single-user routes
+SUBSCRIPTION_ACTIONS = {
+    'approve': (1, 0),
+    'reject': (0, 0),
+    'grant': (1, 0),
+    'revoke': (0, 0)
+}
+
+@app.route('/admin/bulk_subscriptions', methods=['POST'])
+@admin_required
+def admin_bulk_subscriptions():
+    """Approve, reject, grant or revoke subscriptions for all selected users at once.
+
+    The selected users are changed by one ``in_()`` update and logged as one
+    entry, so the whole batch can be undone together.
+    """
+    action = request.form.get('action', '')
+    user_ids = sorted({int(u) for u in request.form.getlist('user_ids') if u.isdigit()})
+    back = request.referrer or url_for('admin_manage_subscriptions')
+    if action not in SUBSCRIPTION_ACTIONS or not user_ids:
+        flash('Select at least one user and an action.', 'info')
+        return redirect(back)
+
+    new_is_sub, new_pending = SUBSCRIPTION_ACTIONS[action]
+    try:
+        before = get_supabase().table('users').select('id, email, is_subscribed, subscription_pending').in_('id', user_ids).execute()
+        get_supabase().table('users').update({'is_subscribed': new_is_sub, 'subscription_pending': new_pending}).in_('id', user_ids).execute()
+    except Exception:
+        flash(f"Failed to {action} the selected subscriptions.", 'danger')
+        return redirect(back)
+
+    changes = [{
+        'user_id': u.get('id'),
+        'user_email': u.get('email'),
+        'prev_is_subscribed': int(u.get('is_subscribed') or 0),
+        'prev_subscription_pending': int(u.get('subscription_pending') or 0),
+        'new_is_subscribed': new_is_sub,
+        'new_subscription_pending': new_pending
+    } for u in (before.data or [])]
+    if changes:
+        log_admin_bulk_action(action, changes)
+    flash(f"Applied {action} to {len(changes)} user(s).", 'success' if new_is_sub else 'warning')
+    return redirect(back)
+
 @app.route('/admin/action_log')
 @admin_required
 def admin_action_log():
-    all_actions = read_all_admin_actions()
-    all_actions.reverse()
-    return render_template('admin_action_log.html', actions=all_actions, total_actions=len(all_actions))
+    """Display one page of admin actions (newest first) with per-action undo buttons."""
+    page = request.args.get('page', 1, type=int)
+    filters = {
+        'admin': request.args.get('admin', '').strip() or None,
+        'user': request.args.get('user', '').strip() or None,
+        'action': request.args.get('action', '').strip() or None,
+        'since': request.args.get('since', '').strip() or None,
+        'until': request.args.get('until', '').strip() or None
+    }
+    try:
+        actions, has_next = action_log.query(page=page, per_page=50, **filters)
+        total_actions = action_log.count()
+    except Exception:
+        actions, has_next, total_actions = [], False, 0
+    return render_template('admin_action_log.html', actions=actions, total_actions=total_actions,
+                           page=max(page, 1), has_next=has_next, filters=filters)
 
-@app.route('/admin/undo_action/<int:log_index>', methods=['POST'])
+@app.route('/admin/undo_action/<int:action_id>', methods=['POST'])
 @admin_required
-def admin_undo_action(log_index):
-    all_actions = read_all_admin_actions()
-    if log_index < 0 or log_index >= len(all_actions):
+def admin_undo_action(action_id):
+    """Undo a specific admin action by its log ID."""
+    try:
+        target = action_log.get(action_id)
+    except Exception:
+        target = None
+    if not target:
         flash('Action not found in log.', 'danger')
         return redirect(url_for('admin_action_log'))
 
-    target = all_actions[log_index]
-    user_id = target.get('user_id')
-    prev_is_sub = int(target.get('prev_is_subscribed', 0))
-    prev_pending = int(target.get('prev_subscription_pending', 0))
+    # Users that shared a previous state are restored with one in_() update
+    groups = {}
+    for ch in target.get('changes') or [target]:
+        state = (int(ch.get('prev_is_subscribed', 0)), int(ch.get('prev_subscription_pending', 0)))
+        groups.setdefault(state, []).append(ch.get('user_id'))
 
     try:
-        supabase.table('users').update({'is_subscribed': prev_is_sub, 'subscription_pending': prev_pending}).eq('id', user_id).execute()
-        flash(f"Reverted action on user ID {user_id}", 'success')
+        for (prev_is_sub, prev_pending), user_ids in groups.items():
+            get_supabase().table('users').update({'is_subscribed': prev_is_sub, 'subscription_pending': prev_pending}).in_('id', user_ids).execute()
+        if target.get('changes'):
+            flash(f"Reverted bulk {target.get('action')} on {len(target['changes'])} users", 'success')
+        else:
+            flash(f"Reverted action on user ID {target.get('user_id')}", 'success')
     except Exception:
         flash('Failed to undo action.', 'danger')
 
-    return redirect(url_for('admin_action_log'))
+    return redirect(request.referrer or url_for('admin_action_log'))
+
+@app.route('/admin/template_timings')
+@admin_required
+def admin_template_timings():
+    """Per-template compile/cache-load and render timings for this worker."""
+    return jsonify(template_stats.report())
 
 if __name__ == '__main__':
     init_db()
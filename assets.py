@@ -0,0 +1,231 @@
+"""Static asset build step: inline data URIs out, fingerprinted and precompressed files in.
+
+Run before deploying::
+
+    python assets.py                       # fingerprint + precompress static/
+    python assets.py --extract-inline      # also move data: URIs out of the templates first
+
+``--extract-inline`` writes every base64 ``data:`` URI found in the templates
+to ``static/images/inline/<hash>.<ext>`` and rewrites the template to point at
+it with ``url_for('static', ...)``, so the image is fetched (and cached) once
+instead of being resent inside every page.
+
+The build then copies each file under ``static/`` (except videos, which are
+served by /protected_video) to ``static/dist/<name>.<hash>.<ext>``, writes a
+``.gz`` (and ``.br`` when the ``brotli`` package is installed) next to it,
+and records the mapping in ``static/dist/manifest.json``. ``install(app)``
+makes ``url_for('static', filename=...)`` return the fingerprinted URL and
+serves those files with one-year immutable caching, picking the precompressed
+variant the browser accepts. Without a manifest (local development) URLs and
+responses are unchanged.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import sys
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+SKIP_DIRS = {DIST_DIR, 'videos'}
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.map', '.ico'}
+IMMUTABLE_MAX_AGE = 31536000
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+DATA_URI = re.compile(r"""(['"])data:(image/[\w.+-]+);base64,([A-Za-z0-9+/=\s]+)\1""")
+
+
+def content_hash(data, length=10):
+    return hashlib.sha1(data).hexdigest()[:length]
+
+
+# Helper: is position `pos` of a template inside a {% ... %} or {{ ... }} tag?
+def _inside_jinja_tag(text, pos):
+    head = text[:pos]
+    opened = max(head.rfind('{%'), head.rfind('{{'))
+    closed = max(head.rfind('%}'), head.rfind('}}'))
+    return opened > closed
+
+
+def default_template_dir(root):
+    """``templates/`` as Flask expects, or ``root`` itself when the templates sit next to app.py."""
+    folder = os.path.join(root, 'templates')
+    if not os.path.isdir(folder) and any(n.endswith('.html') for n in os.listdir(root)):
+        return root
+    return folder
+
+
+def extract_inline_images(template_dir, static_dir, subdir='images/inline'):
+    """Move base64 data: URIs out of ``template_dir``; return [(template, static filename)]."""
+    out_dir = os.path.join(static_dir, subdir)
+    extracted = []
+    for name in sorted(os.listdir(template_dir)):
+        if not name.endswith('.html'):
+            continue
+        path = os.path.join(template_dir, name)
+        with open(path, encoding='utf-8', newline='') as f:
+            text = f.read()
+
+        def replace(match):
+            quote, mimetype, payload = match.group(1), match.group(2), match.group(3)
+            data = base64.b64decode(re.sub(r'\s+', '', payload))
+            ext = mimetypes.guess_extension(mimetype) or '.bin'
+            if ext == '.jpe':
+                ext = '.jpg'
+            filename = f"{subdir}/{content_hash(data, 12)}{ext}"
+            os.makedirs(out_dir, exist_ok=True)
+            with open(os.path.join(static_dir, filename), 'wb') as f:
+                f.write(data)
+            extracted.append((name, filename))
+            url = f"url_for('static', filename='{filename}')"
+            if _inside_jinja_tag(match.string, match.start()):
+                return url
+            return f"{quote}{{{{ {url} }}}}{quote}"
+
+        rewritten = DATA_URI.sub(replace, text)
+        if rewritten != text:
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.write(rewritten)
+    return extracted
+
+
+def fingerprinted_name(filename, data):
+    root, ext = os.path.splitext(filename)
+    return f"{root}.{content_hash(data)}{ext}"
+
+
+# Helper: point url(...) references in a stylesheet at the fingerprinted copies
+def _rewrite_css_urls(css, filename, manifest):
+    folder = posixpath.dirname(filename)
+
+    def replace(match):
+        ref = match.group(2)
+        if ref.startswith(('data:', 'http:', 'https:', '//', '#', '/')):
+            return match.group(0)
+        path, sep, suffix = ref, '', ''
+        split = re.search(r'[?#]', ref)
+        if split:
+            path, sep, suffix = ref[:split.start()], ref[split.start()], ref[split.start() + 1:]
+        target = manifest.get(posixpath.normpath(posixpath.join(folder, path)))
+        if target is None:
+            return match.group(0)
+        # The dist/ tree mirrors static/, so the relative path keeps working
+        relative = posixpath.relpath(target[len(DIST_DIR) + 1:], folder)
+        return f"url({match.group(1)}{relative}{sep}{suffix}{match.group(1)})"
+
+    return CSS_URL.sub(replace, css)
+
+
+def build(static_dir):
+    """Fingerprint and precompress everything under ``static_dir``; return the manifest."""
+    dist = os.path.join(static_dir, DIST_DIR)
+    if os.path.isdir(dist):
+        shutil.rmtree(dist)
+    sources = []
+    for root, dirs, files in os.walk(static_dir):
+        if root == static_dir:
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            sources.append((os.path.relpath(source, static_dir).replace(os.sep, '/'), source))
+    # Stylesheets last, so the fonts and images they reference are already in the manifest
+    sources.sort(key=lambda item: item[0].endswith('.css'))
+
+    manifest = {}
+    for filename, source in sources:
+        with open(source, 'rb') as f:
+            data = f.read()
+        if filename.endswith('.css'):
+            data = _rewrite_css_urls(data.decode('utf-8'), filename, manifest).encode('utf-8')
+        hashed = fingerprinted_name(filename, data)
+        target = os.path.join(dist, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        if os.path.splitext(filename)[1].lower() in COMPRESSIBLE:
+            with open(target + '.gz', 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(target + '.br', 'wb') as f:
+                    f.write(brotli.compress(data, quality=11))
+        manifest[filename] = f"{DIST_DIR}/{hashed}"
+    os.makedirs(dist, exist_ok=True)
+    with open(os.path.join(dist, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_dir):
+    try:
+        with open(os.path.join(static_dir, DIST_DIR, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def install(app):
+    """Serve ``app``'s static files through the manifest; return it (empty when not built)."""
+    manifest = load_manifest(app.static_folder)
+    if not manifest:
+        return manifest
+    hashed_files = set(manifest.values())
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    plain_static = app.view_functions['static']
+
+    def static(filename):
+        if filename not in hashed_files:
+            return plain_static(filename=filename)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        accepted = request.accept_encodings
+        encoding = None
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if accepted[candidate] and os.path.isfile(os.path.join(app.static_folder, filename + suffix)):
+                encoding = candidate
+                filename += suffix
+                break
+        response = send_from_directory(app.static_folder, filename, mimetype=mimetype,
+                                       max_age=IMMUTABLE_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        response.vary.add('Accept-Encoding')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    app.view_functions['static'] = static
+    return manifest
+
+
+if __name__ == '__main__':
+    here = os.path.dirname(os.path.abspath(__file__))
+    static_dir = os.environ.get('STATIC_DIR') or os.path.join(here, 'static')
+    template_dir = os.environ.get('TEMPLATE_DIR') or default_template_dir(here)
+    if '--extract-inline' in sys.argv:
+        if not os.path.isdir(template_dir):
+            print('ERROR: template directory not found:', template_dir, '(set TEMPLATE_DIR)')
+            sys.exit(1)
+        for template, filename in extract_inline_images(template_dir, static_dir):
+            print(f"{template}: data URI -> static/{filename}")
+    if not os.path.isdir(static_dir):
+        print('ERROR: static directory not found:', static_dir)
+        sys.exit(1)
+    manifest = build(static_dir)
+    print(f"Fingerprinted {len(manifest)} files into static/{DIST_DIR}/"
+          + ('' if brotli else ' (gzip only: install brotli for .br variants)'))
@@ -0,0 +1,380 @@
+"""Append-only admin action log with offset indexes and segment rotation.
+
+Layout next to ``path`` (default ``admin_actions.log``)::
+
+    admin_actions.log                     active segment, JSON lines
+    admin_actions.log.idx                 8-byte file offset per entry
+    admin_actions.log.lock                cross-process write lock
+    admin_actions.log.000000000001[.gz]   sealed segments, named by first ID
+    admin_actions.log.000000000001.idx    their indexes (uncompressed offsets)
+
+Entry IDs start at 1 and never change, so entry N is found with a bisect over
+segment names and two seeks instead of parsing the whole log. Lines written
+before the index existed are indexed on first use and get their position as ID.
+Writers from several gunicorn workers serialise on the lock file; readers span
+all segments transparently.
+"""
+import gzip
+import io
+import json
+import os
+import shutil
+import struct
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_OFFSET = struct.Struct('<Q')
+
+
+class _FileLock:
+    """Exclusive lock on a file, shared by every process and thread using it."""
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fh = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            self._fh = open(self.path, 'a+b')
+            if fcntl:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+            else:
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_LOCK, 1)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                if fcntl:
+                    fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+                else:
+                    self._fh.seek(0)
+                    msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+            finally:
+                self._fh.close()
+                self._fh = None
+        self._thread_lock.release()
+
+
+class _Segment:
+
+    def __init__(self, log_path, index_path, first_id, compressed=False):
+        self.log_path = log_path
+        self.index_path = index_path
+        self.first_id = first_id
+        self.compressed = compressed
+
+    def count(self):
+        try:
+            return os.path.getsize(self.index_path) // _OFFSET.size
+        except OSError:
+            return 0
+
+
+class AdminActionLog:
+    """Admin audit log.
+
+    ``max_bytes``/``max_age`` (seconds) control when the active segment is
+    sealed; ``compress`` gzips sealed segments; ``fsync`` flushes every
+    append to disk before the lock is released.
+    """
+
+    def __init__(self, path='admin_actions.log', max_bytes=5 * 1024 * 1024, max_age=None,
+                 compress=True, fsync=True):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compress = compress
+        self.fsync = fsync
+        self._lock = _FileLock(path + '.lock')
+        self._dir = os.path.dirname(os.path.abspath(path))
+        self._sealed_cache = (None, [])
+        self._unpacked = OrderedDict()
+
+    # --- segments ---
+    def _sealed(self):
+        """Sealed segments ordered by first ID (cached until the directory changes)."""
+        try:
+            mtime = os.stat(self._dir).st_mtime_ns
+        except OSError:
+            return []
+        if self._sealed_cache[0] == mtime:
+            return self._sealed_cache[1]
+        prefix = os.path.basename(self.path) + '.'
+        found = {}
+        for name in os.listdir(self._dir):
+            if not name.startswith(prefix):
+                continue
+            rest = name[len(prefix):]
+            base, _, ext = rest.partition('.')
+            if not base.isdigit() or ext not in ('', 'gz'):
+                continue
+            full = os.path.join(self._dir, name)
+            # Prefer the compressed copy once compaction has finished
+            if ext == 'gz' or int(base) not in found:
+                found[int(base)] = _Segment(full, os.path.join(self._dir, prefix + base + '.idx'),
+                                            int(base), compressed=(ext == 'gz'))
+        segments = [found[k] for k in sorted(found)]
+        self._sealed_cache = (mtime, segments)
+        return segments
+
+    def _active_first_id(self, sealed=None):
+        sealed = self._sealed() if sealed is None else sealed
+        if not sealed:
+            return 1
+        return sealed[-1].first_id + sealed[-1].count()
+
+    def _segments(self):
+        sealed = self._sealed()
+        active = _Segment(self.path, self.index_path, self._active_first_id(sealed))
+        return sealed + [active]
+
+    # --- index maintenance ---
+    def _read_offset(self, idx, position):
+        idx.seek(position * _OFFSET.size)
+        raw = idx.read(_OFFSET.size)
+        return _OFFSET.unpack(raw)[0] if len(raw) == _OFFSET.size else None
+
+    def _sync_index(self):
+        """Index active-segment lines missing from the sidecar; return its entry count.
+
+        Must be called with the write lock held.
+        """
+        if not os.path.exists(self.path):
+            return 0
+        log_size = os.path.getsize(self.path)
+        with open(self.index_path, 'ab+') as idx, open(self.path, 'rb') as log:
+            idx.seek(0, os.SEEK_END)
+            count = idx.tell() // _OFFSET.size
+            start = 0
+            if count:
+                last = self._read_offset(idx, count - 1)
+                if last is None or last >= log_size:
+                    # Log was replaced or truncated behind our back: rebuild
+                    idx.truncate(0)
+                    count = 0
+                else:
+                    log.seek(last)
+                    log.readline()
+                    start = log.tell()
+            if start >= log_size:
+                return count
+            log.seek(start)
+            idx.seek(0, os.SEEK_END)
+            while True:
+                offset = log.tell()
+                line = log.readline()
+                if not line:
+                    break
+                if line.strip():
+                    idx.write(_OFFSET.pack(offset))
+                    count += 1
+            return count
+
+    def count(self):
+        try:
+            with self._lock:
+                return self._active_first_id() - 1 + self._sync_index()
+        except OSError:
+            return 0
+
+    # --- writing ---
+    def append(self, entry):
+        """Append ``entry``, store its new stable ID in ``entry['id']`` and return it."""
+        with self._lock:
+            first_id = self._active_first_id()
+            active_count = self._sync_index()
+            entry['id'] = first_id + active_count
+            with open(self.path, 'ab') as log:
+                offset = log.seek(0, os.SEEK_END)
+                log.write((json.dumps(entry) + "\n").encode('utf-8'))
+                log.flush()
+                if self.fsync:
+                    os.fsync(log.fileno())
+            with open(self.index_path, 'ab') as idx:
+                idx.write(_OFFSET.pack(offset))
+                idx.flush()
+                if self.fsync:
+                    os.fsync(idx.fileno())
+            if self._should_rotate(offset):
+                self._rotate(first_id)
+            return entry['id']
+
+    def _should_rotate(self, last_offset):
+        size = os.path.getsize(self.path)
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        if self.max_age and last_offset > 0:
+            with open(self.path, 'rb') as log:
+                try:
+                    started = datetime.fromisoformat(json.loads(log.readline().decode('utf-8'))['timestamp'])
+                except Exception:
+                    return False
+            return (datetime.now() - started).total_seconds() >= self.max_age
+        return False
+
+    def _rotate(self, first_id):
+        """Seal the active segment under its first ID (write lock held)."""
+        base = f"{self.path}.{first_id:012d}"
+        os.replace(self.index_path, base + '.idx')
+        os.replace(self.path, base)
+        self._sealed_cache = (None, [])
+        if self.compress:
+            self._compress(base)
+
+    def _compress(self, seg_path):
+        tmp = seg_path + '.gz.tmp'
+        with open(seg_path, 'rb') as src, gzip.open(tmp, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp, seg_path + '.gz')
+        os.remove(seg_path)
+        self._sealed_cache = (None, [])
+
+    def compact(self):
+        """Gzip every sealed segment that is still stored uncompressed; return how many."""
+        done = 0
+        with self._lock:
+            for seg in self._sealed():
+                if not seg.compressed:
+                    self._compress(seg.log_path)
+                    done += 1
+        return done
+
+    # --- reading ---
+    def _open_segment(self, seg):
+        if not seg.compressed:
+            return open(seg.log_path, 'rb')
+        # Random access into gzip means re-inflating from the start on every
+        # backwards seek, so keep a couple of inflated segments in memory
+        data = self._unpacked.get(seg.log_path)
+        if data is None:
+            with gzip.open(seg.log_path, 'rb') as fh:
+                data = fh.read()
+            self._unpacked[seg.log_path] = data
+            while len(self._unpacked) > 2:
+                self._unpacked.popitem(last=False)
+        else:
+            self._unpacked.move_to_end(seg.log_path)
+        return io.BytesIO(data)
+
+    def _reader(self):
+        return _LogReader(self, self._segments())
+
+    def get(self, action_id):
+        """Return the entry with ``action_id`` or None."""
+        count = self.count()
+        if action_id < 1 or action_id > count:
+            return None
+        with self._reader() as reader:
+            return reader.load(action_id)
+
+    def last(self):
+        return self.get(self.count())
+
+    def _bisect(self, reader, lo, hi, before):
+        """First ID in [lo, hi] whose entry is not ``before`` (timestamps grow with IDs)."""
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            entry = reader.load(mid)
+            if entry is not None and before(entry.get('timestamp') or ''):
+                lo = mid + 1
+            else:
+                hi = mid - 1
+        return lo
+
+    def query(self, page=1, per_page=50, admin=None, user=None, action=None, since=None, until=None):
+        """Return (entries, has_next) for one page of matching entries, newest first.
+
+        ``since``/``until`` are ISO date or datetime prefixes and are resolved
+        by binary search over the index; the other filters are checked while
+        walking backwards, stopping as soon as the page is full. Bulk entries
+        (those with a ``changes`` list) match ``user`` if any of their users does.
+        """
+        count = self.count()
+        if not count:
+            return [], False
+        page = max(int(page), 1)
+        skip = (page - 1) * per_page
+        entries = []
+        with self._reader() as reader:
+            first, newest = 1, count
+            if since:
+                first = self._bisect(reader, 1, count, lambda ts: ts[:len(since)] < since)
+            if until:
+                newest = self._bisect(reader, first, count, lambda ts: ts[:len(until)] <= until) - 1
+            for action_id in range(newest, first - 1, -1):
+                entry = reader.load(action_id)
+                if entry is None:
+                    continue
+                if admin and entry.get('admin') != admin:
+                    continue
+                if action and entry.get('action') != action:
+                    continue
+                if user and not any(user in (str(e.get('user_id')), e.get('user_email'))
+                                    for e in entry.get('changes') or [entry]):
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                if len(entries) == per_page:
+                    return entries, True
+                entries.append(entry)
+        return entries, False
+
+
+class _LogReader:
+    """Keeps segment handles open while one request reads several entries."""
+
+    def __init__(self, log, segments):
+        self.log = log
+        self.segments = segments
+        self.first_ids = [s.first_id for s in segments]
+        self._handles = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for idx, fh in self._handles.values():
+            idx.close()
+            fh.close()
+        self._handles = {}
+
+    def load(self, action_id):
+        pos = bisect_right(self.first_ids, action_id) - 1
+        if pos < 0:
+            return None
+        seg = self.segments[pos]
+        handles = self._handles.get(pos)
+        if handles is None:
+            try:
+                handles = (open(seg.index_path, 'rb'), self.log._open_segment(seg))
+            except OSError:
+                return None
+            self._handles[pos] = handles
+        idx, fh = handles
+        offset = self.log._read_offset(idx, action_id - seg.first_id)
+        if offset is None:
+            return None
+        fh.seek(offset)
+        try:
+            entry = json.loads(fh.readline().decode('utf-8'))
+        except Exception:
+            return None
+        entry['id'] = action_id
+        return entry
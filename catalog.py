@@ -0,0 +1,116 @@
+"""In-memory product catalog for the shop pages.
+
+Products are loaded once into an immutable ``CatalogSnapshot`` that already has
+image URLs resolved, products grouped by category and an ID index. Readers
+just take ``catalog.snapshot()``; when the products table changes a new
+snapshot is built and swapped in with a single assignment, so a request never
+sees a half-built catalog.
+
+Changes are detected with a cheap version probe, checked at most every
+``check_interval`` seconds. ``SQLiteCatalogVersion`` keeps a counter that
+triggers on ``products`` bump on every insert/update/delete (including writes
+from scripts outside the app). Without a probe the snapshot is simply rebuilt
+every ``check_interval`` seconds.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class CatalogSnapshot:
+
+    def __init__(self, version, products, id_of, category_of):
+        self.version = version
+        self.products = tuple(products)
+        self.by_id = {id_of(p): p for p in self.products}
+        categories = {}
+        for product in self.products:
+            categories.setdefault(category_of(product), []).append(product)
+        self.categories = categories
+        self.loaded_at = time.time()
+        # Content hash: identical in every worker that loaded the same products
+        self.digest = hashlib.sha1(json.dumps(self.products, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def get(self, product_id):
+        return self.by_id.get(product_id)
+
+
+class ProductCatalog:
+    """Serves the current ``CatalogSnapshot`` and rebuilds it when products change.
+
+    ``loader()`` returns the products in display order, already shaped for the
+    templates. ``id_of``/``category_of`` pick the ID and category out of one
+    product. Snapshots are shared between requests and must not be mutated.
+    """
+
+    def __init__(self, loader, id_of, category_of, probe=None, check_interval=30):
+        self.loader = loader
+        self.id_of = id_of
+        self.category_of = category_of
+        self.probe = probe
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        current = self._snapshot
+        if current is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return current
+        if not self._lock.acquire(blocking=current is None):
+            # Someone else is already checking; keep serving the old snapshot meanwhile
+            return current
+        try:
+            current = self._snapshot
+            if current is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return current
+            version = self.probe() if self.probe else (current.version + 1 if current else 1)
+            if current is None or version != current.version:
+                current = CatalogSnapshot(version, self.loader(), self.id_of, self.category_of)
+                self._snapshot = current
+            self._checked_at = time.monotonic()
+            return current
+        finally:
+            self._lock.release()
+
+    def get(self, product_id):
+        return self.snapshot().get(product_id)
+
+    def invalidate(self):
+        """Re-check the version probe on the next access."""
+        self._checked_at = 0
+
+
+class SQLiteCatalogVersion:
+    """Version probe for a SQLite ``products`` table, maintained by triggers."""
+
+    def __init__(self, db_path, table='products'):
+        self.db_path = db_path
+        self.table = table
+        self._ready = False
+
+    def _install(self, conn):
+        conn.execute('''CREATE TABLE IF NOT EXISTS catalog_version
+                        (id INTEGER PRIMARY KEY CHECK (id = 1),
+                         version INTEGER NOT NULL)''')
+        conn.execute("INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 1)")
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {self.table}_catalog_{event.lower()}
+                             AFTER {event} ON {self.table}
+                             BEGIN
+                                 UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+                             END''')
+        conn.commit()
+        self._ready = True
+
+    def __call__(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            if not self._ready:
+                self._install(conn)
+            row = conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
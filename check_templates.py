@@ -1,6 +1,16 @@
-oimport sys
+"""Build step: check every template and precompile it into the Jinja bytecode cache.
+
+Run before deploying (with the same Python version as production):
+
+    python check_templates.py            # compile missing/stale entries
+    python check_templates.py --rebuild  # clear jinja_cache/ first
+
+Exits non-zero if any template has a syntax error, so it can gate a build.
+The jinja_cache/ directory it writes must ship with the deployment.
+"""
+import sys
+import time
 from jinja2 import TemplateSyntaxError
-import os
 
 # Import the Flask app so we use the same Jinja environment and registered filters
 try:
@@ -9,27 +19,46 @@ except Exception as e:
     print('ERROR importing app:', e)
     sys.exit(1)
 
+env = app.jinja_env
+cache = env.bytecode_cache
+if cache is None:
+    print('ERROR: the app has no Jinja bytecode cache configured (see template_cache.py)')
+    sys.exit(1)
+if '--rebuild' in sys.argv:
+    cache.clear()
+
 try:
-    names = app.jinja_env.list_templates()
+    names = env.list_templates()
 except Exception as e:
     print('ERROR listing templates from Flask app:', e)
     sys.exit(1)
 
 print('Found templates:', len(names))
-problem = None
+print('Bytecode cache:', cache.directory)
+problems = []
+started = time.perf_counter()
 for name in names:
     try:
-        print('Checking', name)
-        app.jinja_env.get_template(name)
+        # Load through the bytecode cache (compiling missing or stale entries), not the in-memory cache
+        if env.cache is not None:
+            env.cache.clear()
+        env.get_template(name)
     except TemplateSyntaxError as e:
         print('TemplateSyntaxError in', name)
         print(e)
-        problem = (name, str(e))
-        break
+        problems.append((name, str(e)))
     except Exception as e:
         print('Other error loading', name, e)
+        problems.append((name, str(e)))
+
+print()
+print(f"{'template':<40} {'load':<16} {'ms':>8}")
+for row in cache.stats.report():
+    print(f"{row['template']:<40} {row['load'] or '-':<16} {row['load_ms']:>8.2f}")
+print(f"Total: {(time.perf_counter() - started) * 1000:.1f} ms")
 
-if not problem:
+if not problems:
     print('No template syntax errors detected.')
 else:
-    print('Problematic template:', problem)
+    print('Problematic templates:', [name for name, _ in problems])
+    sys.exit(1)
@@ -0,0 +1,164 @@
+"""On-the-fly gzip/brotli compression for HTML and JSON responses.
+
+``CompressionMiddleware`` wraps the WSGI app. For each response it looks only
+at the status and headers to decide; the body is then compressed chunk by
+chunk as the app yields it, so streamed responses are never buffered. A
+response is compressed when:
+
+- the client accepts ``br`` (with the optional ``brotli`` package installed)
+  or ``gzip``;
+- it has a body (not 204/206/304, not HEAD) and no Content-Encoding yet
+  (precompressed files from assets.py already carry one);
+- its Content-Type is in ``mimetypes`` and its Content-Length, when known, is
+  at least ``min_size`` bytes;
+- its path does not start with one of ``exclude_paths`` (protected videos
+  are large, already compressed and served with Range support).
+
+The encoded representation gets its own ETag (``"<etag>-gzip"``); the suffix
+is stripped from If-None-Match on the way in, so conditional GETs
+(http_cache.py) still answer 304.
+"""
+import re
+import zlib
+
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = frozenset({
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/xml', 'text/javascript',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml'
+})
+
+_ETAG_SUFFIX = re.compile(r'-(?:gzip|br)"')
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._z.compress(data)
+
+    def flush(self):
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, quality):
+        self._c = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._c.process(data)
+
+    def flush(self):
+        return self._c.flush()
+
+    def finish(self):
+        return self._c.finish()
+
+
+class CompressionMiddleware:
+
+    def __init__(self, app, min_size=512, mimetypes=COMPRESSIBLE_TYPES, exclude_paths=('/protected_video/',),
+                 gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.min_size = min_size
+        self.mimetypes = mimetypes
+        self.exclude_paths = tuple(exclude_paths)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def negotiate(self, environ):
+        """'br', 'gzip' or None for this request."""
+        if environ.get('REQUEST_METHOD') == 'HEAD' or environ.get('HTTP_RANGE'):
+            return None
+        if environ.get('PATH_INFO', '').startswith(self.exclude_paths):
+            return None
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def compressible(self, status, headers):
+        code = int(status.split(' ', 1)[0])
+        if code < 200 or code in (204, 206, 304):
+            return False
+        found = {name.lower(): value for name, value in headers}
+        if 'content-encoding' in found or 'no-transform' in found.get('cache-control', ''):
+            return False
+        mimetype = found.get('content-type', '').split(';', 1)[0].strip().lower()
+        if mimetype not in self.mimetypes:
+            return False
+        length = found.get('content-length')
+        return length is None or int(length) >= self.min_size
+
+    def __call__(self, environ, start_response):
+        encoding = self.negotiate(environ)
+        if encoding is None:
+            return self.app(environ, start_response)
+
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            environ['HTTP_IF_NONE_MATCH'] = _ETAG_SUFFIX.sub('"', if_none_match)
+
+        state = {}
+
+        def compressing_start_response(status, headers, exc_info=None):
+            headers = list(headers)
+            if status.startswith('304'):
+                # Revalidated the encoded copy: echo the ETag it was sent with
+                headers = [(n, _tag_etag(v, encoding)) if n.lower() == 'etag' else (n, v) for n, v in headers]
+            elif self.compressible(status, headers):
+                state['streamed'] = not any(n.lower() == 'content-length' for n, _ in headers)
+                headers = [(n, _tag_etag(v, encoding)) if n.lower() == 'etag' else (n, v)
+                           for n, v in headers if n.lower() != 'content-length']
+                headers.append(('Content-Encoding', encoding))
+                _add_vary(headers)
+                state['compressor'] = _Brotli(self.brotli_quality) if encoding == 'br' else _Gzip(self.gzip_level)
+            return start_response(status, headers, exc_info)
+
+        app_iter = self.app(environ, compressing_start_response)
+        if 'compressor' not in state:
+            return app_iter
+        return self._compress(app_iter, state['compressor'], state['streamed'])
+
+    def _compress(self, app_iter, compressor, streamed):
+        try:
+            for chunk in app_iter:
+                data = compressor.compress(chunk)
+                if streamed:
+                    # Push each chunk to the client now instead of when the zlib window fills
+                    data += compressor.flush()
+                if data:
+                    yield data
+            yield compressor.finish()
+        finally:
+            close = getattr(app_iter, 'close', None)
+            if close is not None:
+                close()
+
+
+# Helper: distinct strong ETag per encoding ("abc" -> "abc-gzip")
+def _tag_etag(value, encoding):
+    if not value.endswith('"') or value.endswith(f'-{encoding}"'):
+        return value
+    return f'{value[:-1]}-{encoding}"'
+
+
+# Helper: add Accept-Encoding to Vary without duplicating it
+def _add_vary(headers):
+    for i, (name, value) in enumerate(headers):
+        if name.lower() == 'vary':
+            if 'accept-encoding' not in value.lower():
+                headers[i] = (name, f'{value}, Accept-Encoding')
+            return
+    headers.append(('Vary', 'Accept-Encoding'))
@@ -0,0 +1,200 @@
+"""Self-hosted Font Awesome cut down to the icons the app actually uses.
+
+Build (needs ``fonttools``; ``brotli`` too for woff2 output) from an unpacked
+Font Awesome Free "web" release, e.g. fontawesome-free-6.5.0-web.zip::
+
+    python fontawesome.py --source ~/Downloads/fontawesome-free-6.5.0-web
+    python assets.py                 # then fingerprint + precompress as usual
+
+It collects every ``fa-*`` class named in the templates and Python sources
+(e.g. the tracker ``icons`` map and the about-page feature list), keeps only
+those glyph rules in ``all.css`` (utility classes like fa-lg, fa-spin and the
+style classes are kept as-is), subsets each webfont to the matching
+codepoints and writes the result to ``static/vendor/fontawesome/``.
+
+Templates link the stylesheet through ``{{ fontawesome_css() }}``: the local
+subset when it has been built, the cdnjs copy otherwise.
+"""
+import os
+import re
+import sys
+
+from flask import url_for
+
+CDN_CSS = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.5.0/css/all.min.css'
+LOCAL_DIR = 'vendor/fontawesome'
+LOCAL_CSS = f'{LOCAL_DIR}/css/icons.css'
+
+ICON_CLASS = re.compile(r'\bfa-[a-z0-9]+(?:-[a-z0-9]+)*\b')
+_GLYPH_SELECTOR = re.compile(r'^\.(fa-[a-z0-9-]+)(?:::?(?:before|after))?$')
+_GLYPH_BODY = re.compile(r'^\s*(?:content|--fa)\s*:\s*"(\\[0-9a-fA-F]+|\\?.)"\s*;?\s*$', re.S)
+_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_FONT_URL = re.compile(r'url\(\s*["\']?([^"\')]+\.woff2)["\']?\s*\)\s*format\(\s*["\']?woff2["\']?\s*\)')
+
+
+def scan_icon_names(paths):
+    """Every ``fa-*`` class name mentioned in the given files."""
+    names = set()
+    for path in paths:
+        try:
+            with open(path, encoding='utf-8') as f:
+                names.update(ICON_CLASS.findall(f.read()))
+        except (OSError, UnicodeDecodeError):
+            pass
+    return names
+
+
+# Helper: split CSS into top-level (prelude, body) rules, keeping nested blocks intact
+def css_rules(css):
+    depth, start, prelude_end, quote = 0, 0, None, None
+    i = 0
+    while i < len(css):
+        ch = css[i]
+        if quote:
+            if ch == '\\':
+                i += 1
+            elif ch == quote:
+                quote = None
+        elif ch in '"\'':
+            quote = ch
+        elif ch == '/' and css.startswith('/*', i):
+            i = css.find('*/', i + 2)
+            i = len(css) if i < 0 else i + 1
+        elif ch == '{':
+            if depth == 0:
+                prelude_end = i
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                yield _COMMENT.sub('', css[start:prelude_end]).strip(), css[prelude_end + 1:i]
+                start = i + 1
+        elif ch == ';' and depth == 0:
+            # @charset / @import statements
+            yield _COMMENT.sub('', css[start:i + 1]).strip(), None
+            start = i + 1
+        i += 1
+
+
+def _codepoint(escaped):
+    if escaped.startswith('\\') and len(escaped) > 2:
+        return int(escaped[1:], 16)
+    return ord(escaped[-1])
+
+
+def subset_css(css, used):
+    """Drop glyph rules for icons not in ``used``; return (css, codepoints kept)."""
+    out, codepoints = [], set()
+    for prelude, body in css_rules(css):
+        if body is None:
+            out.append(prelude)
+            continue
+        selectors = [s.strip() for s in prelude.split(',')]
+        glyph = _GLYPH_BODY.match(body)
+        matches = [_GLYPH_SELECTOR.match(s) for s in selectors]
+        if glyph and all(matches):
+            kept = [s for s, m in zip(selectors, matches) if m.group(1) in used]
+            if not kept:
+                continue
+            codepoints.add(_codepoint(glyph.group(1)))
+            prelude = ','.join(kept)
+        out.append(f'{prelude}{{{body}}}')
+    return '\n'.join(out) + '\n', codepoints
+
+
+def subset_font(source, target, codepoints):
+    """Write ``source`` cut down to ``codepoints``; return the output path, or None if none are in it."""
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+    try:
+        import brotli  # noqa: F401  (fontTools needs it for woff2)
+        flavor = 'woff2'
+    except ImportError:
+        flavor = 'woff'
+    font = TTFont(source)
+    keep = codepoints & set(font.getBestCmap() or {})
+    if not keep:
+        return None
+    options = subset.Options()
+    options.flavor = flavor
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=keep)
+    subsetter.subset(font)
+    target = os.path.splitext(target)[0] + '.' + flavor
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    font.save(target)
+    return target
+
+
+def build(source_dir, static_dir, scan_paths):
+    """Subset the release in ``source_dir`` into ``static_dir``/vendor/fontawesome; return a summary."""
+    used = scan_icon_names(scan_paths)
+    with open(os.path.join(source_dir, 'css', 'all.css'), encoding='utf-8') as f:
+        css, codepoints = subset_css(f.read(), used)
+
+    out_dir = os.path.join(static_dir, LOCAL_DIR)
+    fonts = {}
+    for match in set(_FONT_URL.findall(css)):
+        name = os.path.splitext(os.path.basename(match))[0]
+        # Prefer the .ttf of the release: reading woff2 also requires brotli
+        source = os.path.join(source_dir, 'webfonts', name + '.ttf')
+        if not os.path.isfile(source):
+            source = os.path.join(source_dir, 'webfonts', name + '.woff2')
+        written = subset_font(source, os.path.join(out_dir, 'webfonts', name), codepoints)
+        fonts[match] = written
+
+    def font_face(body):
+        url = _FONT_URL.search(body)
+        if not url or not fonts.get(url.group(1)):
+            return None
+        written = fonts[url.group(1)]
+        flavor = os.path.splitext(written)[1][1:]
+        src = f'url(../webfonts/{os.path.basename(written)}) format("{flavor}")'
+        return re.sub(r'src\s*:[^;}]*', f'src:{src}', body)
+
+    out = []
+    for prelude, body in css_rules(css):
+        if body is None:
+            out.append(prelude)
+        elif prelude.startswith('@font-face'):
+            body = font_face(body)
+            if body:
+                out.append(f'{prelude}{{{body}}}')
+        else:
+            out.append(f'{prelude}{{{body}}}')
+
+    target = os.path.join(static_dir, LOCAL_CSS)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(out) + '\n')
+    return {'icons': len(used), 'glyphs': len(codepoints),
+            'fonts': sorted(os.path.basename(p) for p in fonts.values() if p)}
+
+
+def install(app):
+    """Register the ``fontawesome_css()`` template global for ``app``."""
+    local = os.path.isfile(os.path.join(app.static_folder, LOCAL_CSS))
+
+    def fontawesome_css():
+        return url_for('static', filename=LOCAL_CSS) if local else CDN_CSS
+
+    app.jinja_env.globals['fontawesome_css'] = fontawesome_css
+    return local
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if '--source' not in args:
+        print(__doc__)
+        sys.exit(1)
+    source_dir = args[args.index('--source') + 1]
+    here = os.path.dirname(os.path.abspath(__file__))
+    static_dir = os.environ.get('STATIC_DIR') or os.path.join(here, 'static')
+    template_dir = os.environ.get('TEMPLATE_DIR') or os.path.join(here, 'templates')
+    scan_paths = []
+    for folder in (template_dir, here):
+        if os.path.isdir(folder):
+            scan_paths += [os.path.join(folder, n) for n in os.listdir(folder) if n.endswith(('.html', '.py'))]
+    summary = build(source_dir, static_dir, scan_paths)
+    print(f"{summary['icons']} fa-* classes in use, {summary['glyphs']} glyphs kept; fonts: {', '.join(summary['fonts'])}")
+    print(f"Wrote static/{LOCAL_CSS}")
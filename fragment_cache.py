@@ -0,0 +1,83 @@
+"""Rendered-fragment cache for Jinja templates.
+
+Wrap an expensive, mostly static part of a template in a ``cache`` block::
+
+    {% cache 'tips-text-guides', lang, translations_version(lang) %}
+        ...
+    {% endcache %}
+
+The first render stores the block's HTML under (fragment name, *key parts)
+in a bounded LRU; later renders with the same key reuse it. Put everything
+the block depends on in the key (language, content versions, flags), so a
+change produces a new key instead of stale HTML. ``FragmentCache.clear()``
+drops everything, e.g. after editing content that has no version of its own.
+"""
+import json
+import threading
+from collections import OrderedDict
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+class FragmentCache:
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            html = self._items.get(key)
+            if html is not None:
+                self._items.move_to_end(key)
+            return html
+
+    def set(self, key, html):
+        with self._lock:
+            self._items[key] = html
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class FragmentCacheExtension(Extension):
+    """Adds ``{% cache name, key... %}...{% endcache %}``.
+
+    Uses the ``FragmentCache`` stored on ``environment.fragment_cache``; with
+    none configured the block is simply rendered every time.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render_cached', [nodes.List(parts)]),
+                               [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        key = json.dumps(parts, sort_keys=True, default=str)
+        html = cache.get(key)
+        if html is None:
+            html = caller()
+            cache.set(key, html)
+        return html
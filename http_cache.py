@@ -0,0 +1,114 @@
+"""Conditional GET for pages that rarely change.
+
+``ConditionalGet`` builds a view decorator that computes an ETag from cheap
+content versions (catalog version, translations, video folders, ...) plus the
+parts of the viewer's state the page shows (login, language, cart badge). When
+the browser's ``If-None-Match`` already holds that ETag the view body is
+skipped entirely and a 304 goes back. Otherwise the page is rendered as usual
+and tagged.
+
+Pages are per-user, so responses are marked ``private, no-cache``: browsers
+keep a copy but revalidate it on every visit, and shared caches never store
+it. ``Vary: Cookie`` covers the language and login state carried in the
+session cookie.
+"""
+import glob
+import hashlib
+import json
+import os
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+
+def make_etag(*parts):
+    """Stable hash of JSON-serialisable ``parts``."""
+    raw = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def build_id_for(app):
+    """Deploy identifier for ETags: same on every worker and after restarts, new on each deploy.
+
+    ``BUILD_ID`` or ``VERCEL_GIT_COMMIT_SHA`` when set, otherwise a hash of
+    the Python sources, templates and static asset manifest.
+    """
+    build_id = os.environ.get('BUILD_ID') or os.environ.get('VERCEL_GIT_COMMIT_SHA')
+    if build_id:
+        return build_id
+    folders = {app.root_path}
+    if app.template_folder:
+        folders.add(os.path.join(app.root_path, app.template_folder))
+    paths = set()
+    for folder in folders:
+        paths.update(glob.glob(os.path.join(folder, '*.py')) + glob.glob(os.path.join(folder, '*.html')))
+    if app.static_folder:
+        paths.add(os.path.join(app.static_folder, 'dist', 'manifest.json'))
+    digest = hashlib.sha1()
+    for path in sorted(paths):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            continue
+        digest.update(os.path.relpath(path, app.root_path).encode('utf-8') + b'\0' + data)
+    return digest.hexdigest()[:16]
+
+
+class ConditionalGet:
+    """Decorator factory: ``@conditional(version, ...)`` on a view.
+
+    ``viewer`` returns the request-specific parts every page depends on, or
+    None when the response must not be validated (e.g. flashed messages are
+    waiting to be shown). Each ``version`` is a constant or a zero-argument
+    callable; a callable returning None also disables validation for that
+    request. The view's URL arguments are always part of the ETag.
+    """
+
+    def __init__(self, viewer, cache_control='private, no-cache', vary=('Cookie',), build_id=''):
+        self.viewer = viewer
+        self.cache_control = cache_control
+        self.vary = vary
+        self.build_id = build_id
+
+    def etag_for(self, view_name, versions, kwargs):
+        viewer = self.viewer()
+        if viewer is None:
+            return None
+        parts = [self.build_id, view_name, sorted(kwargs.items()), viewer]
+        for version in versions:
+            value = version() if callable(version) else version
+            if value is None:
+                return None
+            parts.append(value)
+        return make_etag(*parts)
+
+    def _decorate(self, response, etag):
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = self.cache_control
+        for header in self.vary:
+            response.vary.add(header)
+        return response
+
+    def __call__(self, *versions):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return view(*args, **kwargs)
+                try:
+                    etag = self.etag_for(view.__name__, versions, kwargs)
+                except Exception:
+                    etag = None
+                if etag is None:
+                    return view(*args, **kwargs)
+
+                if etag in request.if_none_match:
+                    return self._decorate(current_app.response_class(status=304), etag)
+
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                return self._decorate(response, etag)
+            return wrapper
+        return decorator
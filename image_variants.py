@@ -0,0 +1,246 @@
+"""Resized and WebP variants of local product photos, with srcset and placeholders.
+
+Product pictures under ``static/images/`` are full-size files, while the shop
+grid shows them as small thumbnails. ``install(app)`` adds:
+
+- ``/img/<width>/<path under static>?fm=webp&v=<digest>``: the picture scaled
+  down to one of ``WIDTHS`` (never up), as WebP or in its own format. It is
+  generated with Pillow on first request and kept in a content-addressed
+  cache (``image_cache/<digest>/<width>.<ext>``), so edited files get new
+  URLs and every URL can be cached as immutable.
+- ``responsive_image(src, alt, class, style, sizes)``: a ``<picture>`` with a
+  WebP ``srcset``, the original-format fallback, ``sizes``, intrinsic
+  width/height, and (for JPEGs) a blurred 16px placeholder as background
+  until it loads.
+  ``product_image()`` (svg_sprite.py) uses it for raster files; SVGs and
+  remote URLs are left to it.
+- ``remote_srcset(src)``: ``srcset``/``sizes`` attributes for remote photos
+  on an image CDN that resizes through the query string (the Unsplash URLs
+  of the Supabase seed data). ``product_image()`` adds them to its ``<img>``.
+  The widths never go past the ``w=`` already in the URL, and ``auto=format``
+  lets the CDN pick WebP/AVIF.
+
+The SQLite seed data only has SVG icons, so on that app the ``<picture>``
+path is used only once local photos are added under ``static/``.
+
+Pillow is optional and only imported when a picture is first measured or
+resized: without it, or for files it cannot read, pictures are linked as
+before. ``python image_variants.py`` pre-generates every variant (run it
+before deploying to read-only hosts and ship ``image_cache/``).
+"""
+import base64
+import hashlib
+import io
+import os
+import sys
+import threading
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+from flask import abort, request, send_file, url_for
+from markupsafe import Markup
+from werkzeug.security import safe_join
+
+WIDTHS = (160, 320, 480, 640, 960, 1280)
+RASTER_TYPES = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.png': 'PNG', '.webp': 'WEBP'}
+MIMETYPES = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp'}
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+SAVE_OPTIONS = {'JPEG': {'quality': 82, 'optimize': True, 'progressive': True},
+                'PNG': {'optimize': True},
+                'WEBP': {'quality': 80, 'method': 4}}
+PLACEHOLDER_WIDTH = 16
+DEFAULT_SIZES = '(max-width: 576px) 100vw, (max-width: 992px) 50vw, 25vw'
+IMMUTABLE_MAX_AGE = 31536000
+# Image CDNs that resize on request through imgix-style w= / auto=format parameters
+RESIZING_HOSTS = ('images.unsplash.com',)
+
+
+# Helper: Pillow's Image module, imported on first use rather than at app import (None without Pillow)
+def _pillow():
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+class ImageVariants:
+
+    def __init__(self, static_folder, cache_dir):
+        self.static_folder = static_folder
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._info = {}
+
+    def info(self, filename):
+        """(digest, width, height, format) of a static raster file, or None; cached per mtime."""
+        if os.path.splitext(filename)[1].lower() not in RASTER_TYPES:
+            return None
+        Image = _pillow()
+        if Image is None:
+            return None
+        path = safe_join(self.static_folder, filename)
+        try:
+            stat = os.stat(path)
+        except (TypeError, OSError):
+            return None
+        key = (filename, stat.st_mtime_ns, stat.st_size)
+        cached = self._info.get(filename)
+        if cached and cached[0] == key:
+            return cached[1]
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            with Image.open(io.BytesIO(data)) as img:
+                width, height, fmt = img.width, img.height, img.format
+        except Exception:
+            return None
+        info = (hashlib.sha1(data).hexdigest()[:16], width, height, fmt)
+        self._info[filename] = (key, info)
+        return info
+
+    def widths(self, source_width):
+        """Variant widths for a source, capped at its own width."""
+        return [w for w in WIDTHS if w < source_width] + [source_width]
+
+    def variant_path(self, filename, width, fmt):
+        """Cached variant file for ``filename`` at ``width`` in ``fmt``, generated if missing."""
+        info = self.info(filename)
+        if info is None:
+            return None
+        digest, source_width, source_height, source_fmt = info
+        width = min(width, source_width)
+        target = os.path.join(self.cache_dir, digest, f'{width}.{EXTENSIONS[fmt]}')
+        if os.path.isfile(target):
+            return target
+        Image = _pillow()
+        with self._lock:
+            if os.path.isfile(target):
+                return target
+            with Image.open(safe_join(self.static_folder, filename)) as img:
+                img = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') and fmt != 'JPEG' else 'RGB')
+                if width < source_width:
+                    img = img.resize((width, max(1, round(source_height * width / source_width))), Image.LANCZOS)
+                buffer = io.BytesIO()
+                img.save(buffer, fmt, **SAVE_OPTIONS[fmt])
+            try:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                partial = f'{target}.{os.getpid()}.tmp'
+                with open(partial, 'wb') as f:
+                    f.write(buffer.getvalue())
+                os.replace(partial, target)
+            except OSError:
+                # Read-only disk: serve from memory this time
+                return io.BytesIO(buffer.getvalue())
+        return target
+
+    def placeholder(self, filename):
+        """Tiny blurred data: URI standing in for the picture while it loads."""
+        info = self.info(filename)
+        if info is None:
+            return None
+        with _pillow().open(safe_join(self.static_folder, filename)) as img:
+            img = img.convert('RGB')
+            img.thumbnail((PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH))
+            buffer = io.BytesIO()
+            img.save(buffer, 'WEBP', quality=30)
+        return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+    def warm(self):
+        """Generate every variant of every raster image under static/images; return how many."""
+        count = 0
+        for root, dirs, files in os.walk(os.path.join(self.static_folder, 'images')):
+            for name in files:
+                filename = os.path.relpath(os.path.join(root, name), self.static_folder).replace(os.sep, '/')
+                info = self.info(filename)
+                if info is None:
+                    continue
+                for width in self.widths(info[1]):
+                    for fmt in ('WEBP', info[3]):
+                        self.variant_path(filename, width, fmt)
+                        count += 1
+        return count
+
+
+def remote_srcset(src, sizes=DEFAULT_SIZES):
+    """`` srcset="..." sizes="..."`` for a photo on a resizing CDN, or None for other URLs."""
+    url = urlparse(src or '')
+    if url.netloc not in RESIZING_HOSTS:
+        return None
+    params = dict(parse_qsl(url.query))
+    try:
+        largest = int(params.get('w') or WIDTHS[-1])
+    except ValueError:
+        return None
+    widths = [w for w in WIDTHS if w < largest] + [largest]
+    if len(widths) < 2:
+        return None
+    params['auto'] = 'format'
+    srcset = ', '.join(f"{url._replace(query=urlencode(dict(params, w=w))).geturl()} {w}w" for w in widths)
+    return Markup(' srcset="{}" sizes="{}"').format(srcset, sizes)
+
+
+def install(app, cache_dir=None):
+    """Add the /img route and ``responsive_image()`` template global; return (ImageVariants, helper)."""
+    cache_dir = cache_dir or os.environ.get('IMAGE_CACHE_DIR') or os.path.join(app.root_path, 'image_cache')
+    variants = ImageVariants(app.static_folder, cache_dir)
+    placeholders = {}
+    static_prefix = app.static_url_path.rstrip('/') + '/'
+
+    def image_variant(width, filename):
+        info = variants.info(filename)
+        if info is None or width not in WIDTHS and width != info[1]:
+            abort(404)
+        fmt = 'WEBP' if request.args.get('fm') == 'webp' else info[3]
+        path = variants.variant_path(filename, width, fmt)
+        response = send_file(path, mimetype=MIMETYPES[fmt], max_age=IMMUTABLE_MAX_AGE)
+        if request.args.get('v') == info[0]:
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.max_age = 300
+        return response
+
+    app.add_url_rule('/img/<int:width>/<path:filename>', 'image_variant', image_variant)
+
+    def responsive_image(src, alt='', css_class='', style='', sizes=DEFAULT_SIZES):
+        """``<picture>`` markup for a local raster ``src``, or None if it cannot be resized."""
+        if not src or not src.startswith(static_prefix):
+            return None
+        filename = src[len(static_prefix):].split('?', 1)[0]
+        info = variants.info(filename)
+        if info is None:
+            return None
+        digest, width, height, fmt = info
+
+        def srcset(fm):
+            return ', '.join(f"{url_for('image_variant', width=w, filename=filename, fm=fm, v=digest)} {w}w"
+                             for w in variants.widths(width))
+
+        # Only JPEGs get a placeholder: it would show through transparent PNG/WebP pixels for good
+        if fmt == 'JPEG' and digest not in placeholders:
+            try:
+                placeholders[digest] = variants.placeholder(filename)
+            except Exception:
+                placeholders[digest] = None
+        background = f"background:url('{placeholders[digest]}') center/cover;" if placeholders.get(digest) else ''
+        fallback = url_for('image_variant', width=min(640, width), filename=filename, v=digest)
+        return Markup(
+            '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+            '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" class="{}" style="{}{}" alt="{}" '
+            'loading="lazy" decoding="async"></picture>'
+        ).format(srcset('webp'), sizes, fallback, srcset(None), sizes, width, height, css_class,
+                 Markup(background), style, alt)
+
+    app.jinja_env.globals['responsive_image'] = responsive_image
+    return variants, responsive_image
+
+
+if __name__ == '__main__':
+    if _pillow() is None:
+        print('ERROR: Pillow is not installed (pip install Pillow)')
+        sys.exit(1)
+    here = os.path.dirname(os.path.abspath(__file__))
+    static_dir = os.environ.get('STATIC_DIR') or os.path.join(here, 'static')
+    cache_dir = os.environ.get('IMAGE_CACHE_DIR') or os.path.join(here, 'image_cache')
+    count = ImageVariants(static_dir, cache_dir).warm()
+    print(f"{count} image variants ready in {cache_dir}")
@@ -0,0 +1,112 @@
+"""Deferred imports for cold-start sensitive code, plus an import-time profiler.
+
+``LazyMapping('translations', 'translations')`` behaves like the dict it
+stands for but only imports the module the first time it is read, so requests
+that never render a page (static files, JSON endpoints, videos) do not pay for
+it. ``lazy_client(factory)`` returns an accessor that builds a client once, on
+first call.
+
+Profile what the apps import at startup (wraps ``python -X importtime``)::
+
+    python lazy_imports.py app            # 25 slowest imports, cumulative
+    python lazy_imports.py app_supabase --top 40
+"""
+import importlib
+import re
+import subprocess
+import sys
+import threading
+from collections.abc import Mapping
+
+
+class LazyMapping(Mapping):
+    """Read-only stand-in for ``module.attr`` (a mapping) that imports on first use."""
+
+    def __init__(self, module, attr):
+        self._module = module
+        self._attr = attr
+        self._target = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = getattr(importlib.import_module(self._module), self._attr)
+        return self._target
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __contains__(self, key):
+        return key in self._load()
+
+    def get(self, key, default=None):
+        return self._load().get(key, default)
+
+
+def lazy_client(factory):
+    """Return an accessor that calls ``factory()`` once, on first use, and caches the result."""
+    lock = threading.Lock()
+    holder = []
+
+    def accessor():
+        if not holder:
+            with lock:
+                if not holder:
+                    holder.append(factory())
+        return holder[0]
+    return accessor
+
+
+_IMPORTTIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def profile_imports(module='app', top=25):
+    """Import ``module`` in a fresh interpreter with -X importtime; return (rows, total_us).
+
+    Each row is (cumulative_us, self_us, depth, name), slowest cumulative first.
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          capture_output=True, text=True)
+    rows = []
+    total = 0
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+        depth = (len(indent) - 1) // 2
+        rows.append((cumulative_us, self_us, depth, name))
+        if name == module:
+            total = cumulative_us
+    if proc.returncode != 0:
+        errors = [l for l in proc.stderr.splitlines() if not l.startswith('import time:')]
+        raise RuntimeError(f"importing {module} failed:\n" + '\n'.join(errors[-5:]))
+    rows.sort(reverse=True)
+    return rows[:top], total
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    top = 25
+    if '--top' in args:
+        i = args.index('--top')
+        top = int(args[i + 1])
+        del args[i:i + 2]
+    target = args[0] if args else 'app'
+    try:
+        rows, total = profile_imports(target, top)
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+    print(f"Importing {target} took {total / 1000:.1f} ms")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, depth, name in rows:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {'  ' * depth}{name}")
@@ -0,0 +1,288 @@
+"""Persistent email outbox with a background SMTP sender.
+
+Request handlers only insert a row into ``email_outbox``; a daemon thread
+drains due rows in batches over a single SMTP connection and retries failures
+with exponential backoff. SMTP settings are read from the Flask config at send
+time (SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASS, SMTP_USE_TLS,
+ADMIN_NOTIFICATION_EMAIL).
+
+For local testing run a debugging server such as
+``python -m aiosmtpd -n -l localhost:1025`` and set SMTP_HOST='localhost',
+SMTP_PORT=1025, SMTP_USE_TLS=False. ``python mail_outbox.py [app|app_supabase]``
+drains the outbox once (e.g. from cron on hosts where background threads do
+not live past the response).
+
+``MailOutbox`` keeps the queue in SQLite; the Supabase app uses
+``SupabaseMailOutbox``, the same queue in a Supabase ``email_outbox`` table,
+so it works on hosts without a writable or shared disk and every instance
+drains one queue.
+"""
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+TIME_FMT = "%Y-%m-%d %H:%M:%S"
+
+
+def subject_line(text, limit=150):
+    """``text`` as a one-line Subject header (headers cannot contain CR/LF); keep the raw text for the body."""
+    text = ' '.join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + '...'
+
+
+class MailOutbox:
+
+    def __init__(self, db_path, config, batch_size=50, poll_interval=30,
+                 max_attempts=6, backoff_base=30, backoff_max=3600):
+        self.db_path = db_path
+        self.config = config
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._wake = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._ready = False
+        self._producers = []
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._ready:
+            conn.execute('''CREATE TABLE IF NOT EXISTS email_outbox
+                            (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                             recipient TEXT NOT NULL,
+                             subject TEXT NOT NULL,
+                             body TEXT NOT NULL,
+                             status TEXT NOT NULL DEFAULT 'pending',
+                             attempts INTEGER NOT NULL DEFAULT 0,
+                             next_attempt_at TEXT NOT NULL,
+                             last_error TEXT,
+                             created_at TEXT NOT NULL,
+                             sent_at TEXT)''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox(status, next_attempt_at)")
+            conn.commit()
+            self._ready = True
+        return conn
+
+    def is_configured(self):
+        return bool(self.config.get('SMTP_HOST') and self.config.get('ADMIN_NOTIFICATION_EMAIL'))
+
+    def add_producer(self, func):
+        """Run ``func()`` on every sender wake-up, before due mail is sent (used for digests)."""
+        self._producers.append(func)
+
+    # --- request side ---
+    def enqueue(self, subject, body, to=None, conn=None):
+        """Queue a message (to the admin address by default); return its outbox ID or None.
+
+        Pass ``conn`` to insert inside the caller's open transaction on the same database.
+        """
+        if not self.is_configured():
+            return None
+        recipient = to or self.config.get('ADMIN_NOTIFICATION_EMAIL')
+        now = datetime.now().strftime(TIME_FMT)
+        outbox_id = self._insert(recipient, subject, body, now, conn)
+        self.start()
+        self._wake.set()
+        return outbox_id
+
+    def _insert(self, recipient, subject, body, now, conn=None):
+        own_conn = conn is None
+        if own_conn:
+            conn = self._connect()
+        try:
+            cur = conn.execute("INSERT INTO email_outbox (recipient, subject, body, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                               (recipient, subject, body, now, now))
+            if own_conn:
+                conn.commit()
+            return cur.lastrowid
+        finally:
+            if own_conn:
+                conn.close()
+
+    # --- sender side ---
+    def start(self):
+        """Start the background sender thread once per process."""
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='mail-outbox', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                self.drain()
+            except Exception:
+                pass
+
+    def drain(self):
+        """Run producers, then send batches until nothing is due; return messages processed."""
+        for func in self._producers:
+            try:
+                func()
+            except Exception:
+                pass
+        total = 0
+        while True:
+            sent = self.send_pending()
+            if not sent:
+                return total
+            total += sent
+
+    def _claim(self):
+        """Mark a batch of due messages as 'sending' and return them."""
+        now = datetime.now()
+        # Rows left in 'sending' by a worker that died are picked up again
+        stale = (now - timedelta(minutes=10)).strftime(TIME_FMT)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("""SELECT id, recipient, subject, body, attempts FROM email_outbox
+                                   WHERE (status = 'pending' AND next_attempt_at <= ?)
+                                      OR (status = 'sending' AND next_attempt_at <= ?)
+                                   ORDER BY id LIMIT ?""",
+                                (now.strftime(TIME_FMT), stale, self.batch_size)).fetchall()
+            if rows:
+                conn.executemany("UPDATE email_outbox SET status = 'sending', next_attempt_at = ? WHERE id = ?",
+                                 [(now.strftime(TIME_FMT), r[0]) for r in rows])
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+
+    def _open_smtp(self):
+        host = self.config.get('SMTP_HOST')
+        port = self.config.get('SMTP_PORT', 587)
+        user = self.config.get('SMTP_USER')
+        passwd = self.config.get('SMTP_PASS')
+        import smtplib  # only hosts that actually send mail pay for importing it
+        server = smtplib.SMTP(host, port, timeout=10)
+        if self.config.get('SMTP_USE_TLS', True):
+            server.starttls()
+        if user and passwd:
+            server.login(user, passwd)
+        return server
+
+    def _build(self, recipient, subject, body):
+        from email.message import EmailMessage
+        msg = EmailMessage()
+        msg['Subject'] = subject
+        msg['From'] = self.config.get('SMTP_USER') or self.config.get('ADMIN_NOTIFICATION_EMAIL')
+        msg['To'] = recipient
+        msg.set_content(body)
+        return msg
+
+    def _retry_delay(self, attempts):
+        return min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+
+    def _update(self, outbox_id, fields):
+        conn = self._connect()
+        try:
+            conn.execute(f"UPDATE email_outbox SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                         (*fields.values(), outbox_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _mark_sent(self, row):
+        self._update(row[0], {'status': 'sent', 'attempts': row[4] + 1,
+                              'sent_at': datetime.now().strftime(TIME_FMT), 'last_error': None})
+
+    def _mark_failed(self, row, error):
+        outbox_id, attempts = row[0], row[4] + 1
+        if attempts >= self.max_attempts:
+            self._update(outbox_id, {'status': 'failed', 'attempts': attempts, 'last_error': error[:500]})
+        else:
+            retry_at = (datetime.now() + timedelta(seconds=self._retry_delay(attempts))).strftime(TIME_FMT)
+            self._update(outbox_id, {'status': 'pending', 'attempts': attempts, 'next_attempt_at': retry_at,
+                                     'last_error': error[:500]})
+
+    def send_pending(self):
+        """Send one batch of due messages over a single SMTP connection; return how many were claimed."""
+        if not self.is_configured():
+            return 0
+        rows = self._claim()
+        if not rows:
+            return 0
+        import smtplib
+        try:
+            server = self._open_smtp()
+        except Exception as e:
+            for row in rows:
+                self._mark_failed(row, f"connect: {e}")
+            return 0
+        try:
+            for i, row in enumerate(rows):
+                try:
+                    server.send_message(self._build(row[1], row[2], row[3]))
+                except (smtplib.SMTPServerDisconnected, OSError) as e:
+                    # Connection is gone: reschedule this and the rest of the batch
+                    for rest in rows[i:]:
+                        self._mark_failed(rest, str(e))
+                    break
+                except Exception as e:
+                    self._mark_failed(row, str(e))
+                else:
+                    self._mark_sent(row)
+        finally:
+            try:
+                server.quit()
+            except Exception:
+                pass
+        return len(rows)
+
+
+class SupabaseMailOutbox(MailOutbox):
+    """The same outbox in the Supabase ``email_outbox`` table; batches are claimed with conditional updates."""
+
+    def __init__(self, client, config, **kwargs):
+        super().__init__(None, config, **kwargs)
+        self._client = client
+
+    @property
+    def client(self):
+        return self._client() if callable(self._client) else self._client
+
+    def _connect(self):
+        raise NotImplementedError('SupabaseMailOutbox has no local database')
+
+    def _insert(self, recipient, subject, body, now, conn=None):
+        row = {'recipient': recipient, 'subject': subject, 'body': body, 'status': 'pending', 'attempts': 0,
+               'next_attempt_at': now, 'created_at': now}
+        return self.client.table('email_outbox').insert(row).execute().data[0]['id']
+
+    def _claim(self):
+        now = datetime.now()
+        stale = (now - timedelta(minutes=10)).strftime(TIME_FMT)
+        now = now.strftime(TIME_FMT)
+        rows = (self.client.table('email_outbox').select('id, status')
+                .or_(f'and(status.eq.pending,next_attempt_at.lte."{now}"),'
+                     f'and(status.eq.sending,next_attempt_at.lte."{stale}")')
+                .order('id').limit(self.batch_size).execute().data or [])
+        claimed = []
+        # The update repeats the due condition, so of two instances racing for a row only one gets it back
+        for status, before in (('pending', now), ('sending', stale)):
+            ids = [r['id'] for r in rows if r['status'] == status]
+            if ids:
+                claimed += (self.client.table('email_outbox').update({'status': 'sending', 'next_attempt_at': now})
+                            .in_('id', ids).eq('status', status).lte('next_attempt_at', before).execute().data or [])
+        return [(r['id'], r['recipient'], r['subject'], r['body'], r['attempts'])
+                for r in sorted(claimed, key=lambda r: r['id'])]
+
+    def _update(self, outbox_id, fields):
+        self.client.table('email_outbox').update(fields).eq('id', outbox_id).execute()
+
+
+if __name__ == '__main__':
+    # Drain the outbox once using the app's SMTP configuration:
+    # python mail_outbox.py [app|app_supabase]
+    import importlib
+    import sys
+    mail_outbox = importlib.import_module(sys.argv[1] if len(sys.argv) > 1 else 'app').mail_outbox
+    total = mail_outbox.drain()
+    print(f"Processed {total} queued message(s).")
@@ -0,0 +1,209 @@
+"""Full-text product search with price/category facets.
+
+``SQLiteProductSearch`` keeps an FTS5 index (``products_fts``) over the name,
+description and category of ``products``. It is an external-content table, so
+the text is not stored twice, and triggers keep it in sync with every insert,
+update and delete. Queries use prefix matching ("dia new" finds "Diapers -
+Newborn Size"), BM25 ranking weighted towards the product name, and compute
+the category and price-band facet counts in SQL.
+
+``SupabaseProductSearch`` does the same against Postgres: a generated ``fts``
+tsvector column with a GIN index, queried through the ``search_products`` and
+``product_search_facets`` functions in CREATE_MISSING_TABLES.sql.
+
+Both return ``(product_ids, total, facets)``; the caller maps the IDs onto the
+catalog snapshot for display.
+"""
+import re
+import sqlite3
+
+# (key, label, low, high) with low inclusive and high exclusive; None means open-ended.
+# Bands are contiguous, so they are fully described by their inner edges.
+PRICE_BANDS = (
+    ('under-10', 'Under ₹10', None, 10),
+    ('10-20', '₹10 - ₹20', 10, 20),
+    ('20-50', '₹20 - ₹50', 20, 50),
+    ('50-plus', '₹50 and above', 50, None),
+)
+
+# The Supabase seed catalog is priced ₹150 - ₹999
+SUPABASE_PRICE_BANDS = (
+    ('under-250', 'Under ₹250', None, 250),
+    ('250-500', '₹250 - ₹500', 250, 500),
+    ('500-750', '₹500 - ₹750', 500, 750),
+    ('750-plus', '₹750 and above', 750, None),
+)
+
+# Price a shopper actually pays (sale price when it undercuts the list price)
+EFFECTIVE_PRICE = "(CASE WHEN p.sale_price IS NOT NULL AND p.sale_price < p.price THEN p.sale_price ELSE p.price END)"
+
+
+def search_terms(query):
+    """Split free text into lowercase word tokens (punctuation and FTS syntax dropped)."""
+    return re.findall(r'\w+', (query or '').lower())
+
+
+def price_band(key, bands=PRICE_BANDS):
+    for band in bands:
+        if band[0] == key:
+            return band
+    return None
+
+
+class SQLiteProductSearch:
+
+    def __init__(self, db_path, table='products', price_bands=PRICE_BANDS):
+        self.db_path = db_path
+        self.table = table
+        self.price_bands = price_bands
+        self._ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        if not self._ready:
+            self._install(conn)
+        return conn
+
+    def _install(self, conn):
+        t = self.table
+        conn.execute(f'''CREATE VIRTUAL TABLE IF NOT EXISTS {t}_fts USING fts5
+                         (name, description, category,
+                          content='{t}', content_rowid='id',
+                          tokenize='unicode61 remove_diacritics 2',
+                          prefix='2 3')''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {t}_fts_insert AFTER INSERT ON {t} BEGIN
+                             INSERT INTO {t}_fts (rowid, name, description, category)
+                             VALUES (new.id, new.name, new.description, new.category);
+                         END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {t}_fts_delete AFTER DELETE ON {t} BEGIN
+                             INSERT INTO {t}_fts ({t}_fts, rowid, name, description, category)
+                             VALUES ('delete', old.id, old.name, old.description, old.category);
+                         END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {t}_fts_update AFTER UPDATE ON {t} BEGIN
+                             INSERT INTO {t}_fts ({t}_fts, rowid, name, description, category)
+                             VALUES ('delete', old.id, old.name, old.description, old.category);
+                             INSERT INTO {t}_fts (rowid, name, description, category)
+                             VALUES (new.id, new.name, new.description, new.category);
+                         END''')
+        # Index rows that existed before the triggers did
+        indexed = conn.execute(f"SELECT COUNT(*) FROM {t}_fts_docsize").fetchone()[0]
+        total = conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+        if indexed != total:
+            conn.execute(f"INSERT INTO {t}_fts ({t}_fts) VALUES ('rebuild')")
+        conn.commit()
+        self._ready = True
+
+    def match_expression(self, query):
+        """FTS5 MATCH string: every term must match, each as a prefix."""
+        return ' '.join(f'"{term}"*' for term in search_terms(query))
+
+    def search(self, query='', category=None, band=None, limit=24, offset=0):
+        """Return (product_ids, total, facets) for one page of results, best match first.
+
+        Each facet is counted with the other facet's filter applied, so the
+        counts show what picking that option would return.
+        """
+        match = self.match_expression(query)
+        band = price_band(band, self.price_bands) if band else None
+
+        base = f"FROM {self.table} p"
+        params = []
+        where = []
+        if match:
+            base += f" JOIN {self.table}_fts ON {self.table}_fts.rowid = p.id"
+            where.append(f"{self.table}_fts MATCH ?")
+            params.append(match)
+
+        def filtered(with_category=True, with_band=True):
+            clauses, args = list(where), list(params)
+            if with_category and category:
+                clauses.append("p.category = ?")
+                args.append(category)
+            if with_band and band:
+                if band[2] is not None:
+                    clauses.append(f"{EFFECTIVE_PRICE} >= ?")
+                    args.append(band[2])
+                if band[3] is not None:
+                    clauses.append(f"{EFFECTIVE_PRICE} < ?")
+                    args.append(band[3])
+            return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+        order = f"bm25({self.table}_fts, 10.0, 1.0, 3.0), p.id" if match else "p.category, p.name, p.id"
+        conn = self._connect()
+        try:
+            clause, args = filtered()
+            ids = [r[0] for r in conn.execute(f"SELECT p.id {base}{clause} ORDER BY {order} LIMIT ? OFFSET ?",
+                                              args + [limit, offset])]
+            total = conn.execute(f"SELECT COUNT(*) {base}{clause}", args).fetchone()[0]
+
+            clause, args = filtered(with_category=False)
+            categories = conn.execute(f"SELECT p.category, COUNT(*) {base}{clause} GROUP BY p.category ORDER BY p.category",
+                                      args).fetchall()
+
+            clause, args = filtered(with_band=False)
+            band_sums = []
+            band_args = []
+            for _, _, low, high in self.price_bands:
+                cond = []
+                if low is not None:
+                    cond.append(f"{EFFECTIVE_PRICE} >= ?")
+                    band_args.append(low)
+                if high is not None:
+                    cond.append(f"{EFFECTIVE_PRICE} < ?")
+                    band_args.append(high)
+                band_sums.append(f"COALESCE(SUM(CASE WHEN {' AND '.join(cond)} THEN 1 ELSE 0 END), 0)")
+            counts = conn.execute(f"SELECT {', '.join(band_sums)} {base}{clause}", band_args + args).fetchone()
+        finally:
+            conn.close()
+
+        facets = {
+            'category': [{'value': c, 'count': n} for c, n in categories],
+            'price': [{'value': key, 'label': label, 'count': n}
+                      for (key, label, _, _), n in zip(self.price_bands, counts) if n]
+        }
+        return ids, total, facets
+
+
+class SupabaseProductSearch:
+    """Same interface backed by Postgres full-text search (tsvector) through Supabase RPCs.
+
+    ``client`` is a Supabase client or a zero-argument accessor returning one,
+    so the client can be built on the first search instead of at import.
+    """
+
+    def __init__(self, client, price_bands=SUPABASE_PRICE_BANDS):
+        self._client = client
+        self.price_bands = price_bands
+
+    @property
+    def client(self):
+        return self._client() if callable(self._client) else self._client
+
+    def tsquery(self, query):
+        """to_tsquery string: every term must match, each as a prefix."""
+        return ' & '.join(f"{term}:*" for term in search_terms(query))
+
+    def search(self, query='', category=None, band=None, limit=24, offset=0):
+        band = price_band(band, self.price_bands) if band else None
+        args = {
+            'q': self.tsquery(query) or None,
+            'selected_category': category,
+            'min_price': band[2] if band else None,
+            'max_price': band[3] if band else None
+        }
+        rows = self.client.rpc('search_products', dict(args, lim=limit, off=offset)).execute().data or []
+        ids = [row['id'] for row in rows]
+        total = rows[0]['total'] if rows else 0
+
+        # Price facets come back per band index (width_bucket over the inner band edges)
+        edges = [low for _, _, low, _ in self.price_bands if low is not None]
+        facet_rows = self.client.rpc('product_search_facets', dict(args, band_edges=edges)).execute().data or []
+        keys = [key for key, _, _, _ in self.price_bands]
+        band_counts = {keys[int(r['value'])]: r['count'] for r in facet_rows if r['facet'] == 'price'}
+        facets = {
+            'category': sorted(({'value': r['value'], 'count': r['count']} for r in facet_rows if r['facet'] == 'category'),
+                               key=lambda f: f['value']),
+            'price': [{'value': key, 'label': label, 'count': band_counts[key]}
+                      for key, label, _, _ in self.price_bands if band_counts.get(key)]
+        }
+        return ids, total, facets
@@ -0,0 +1,158 @@
+"""Recurring reminder rules ("every 3 hours", "daily at 09:00", "Mon/Wed at 18:30").
+
+A rule is stored once (see ``reminder_rules``) and its occurrences are never
+written out: ``RecurrenceRule.occurrences(after, until)`` is a generator that
+computes them on demand, starting at the period that contains ``after``
+instead of walking from the rule's start, so asking for next week's
+occurrences of a year-old hourly rule costs the same as for a new one.
+
+The fields follow RRULE (RFC 5545) loosely: ``freq`` (hourly, daily, weekly),
+``interval``, ``times`` (BYHOUR/BYMINUTE for daily and weekly rules),
+``weekdays`` (BYDAY, 0 = Monday), and an optional end, ``until`` or ``count``
+(stored as the columns every, by_time, by_day, until_at and max_count).
+"""
+from datetime import datetime, time, timedelta
+
+FREQUENCIES = ('hourly', 'daily', 'weekly')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+WEEKDAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+TIME_FMT = "%Y-%m-%d %H:%M:%S"
+MAX_COUNT = 10000
+
+
+class RecurrenceRule:
+
+    def __init__(self, freq, start, interval=1, times=(), weekdays=(), until=None, count=None):
+        if freq not in FREQUENCIES:
+            raise ValueError('Repeat must be hourly, daily or weekly')
+        if interval < 1:
+            raise ValueError('Interval must be at least 1')
+        if count is not None and not 1 <= count <= MAX_COUNT:
+            raise ValueError(f'Count must be between 1 and {MAX_COUNT}')
+        self.freq = freq
+        self.start = start.replace(microsecond=0)
+        self.interval = interval
+        self.times = sorted(set(times)) or [self.start.time().replace(second=0)]
+        self.weekdays = sorted(set(weekdays)) or [self.start.weekday()]
+        self.until = until
+        self.count = count
+
+    # Helper: first day of the week (Monday) the rule started in
+    def _week0(self):
+        return self.start.date() - timedelta(days=self.start.weekday())
+
+    def _period_index(self, after):
+        """Index of the period that contains ``after`` (0 = the period of ``start``)."""
+        if after <= self.start:
+            return 0
+        if self.freq == 'hourly':
+            return int((after - self.start) // timedelta(hours=self.interval))
+        if self.freq == 'daily':
+            return (after.date() - self.start.date()).days // self.interval
+        return (after.date() - self._week0()).days // 7 // self.interval
+
+    def _candidates(self, k):
+        """Occurrence times of period ``k``, earliest first (may precede ``start``)."""
+        if self.freq == 'hourly':
+            return [self.start + timedelta(hours=k * self.interval)]
+        if self.freq == 'daily':
+            day = self.start.date() + timedelta(days=k * self.interval)
+            return [datetime.combine(day, t) for t in self.times]
+        week = self._week0() + timedelta(days=7 * k * self.interval)
+        return [datetime.combine(week + timedelta(days=d), t) for d in self.weekdays for t in self.times]
+
+    def occurrences(self, after=None, until=None):
+        """Yield occurrences in (``after``, ``until``], earliest first; endless if the rule has no end."""
+        # With a count the numbering starts at the first occurrence, so walk from there
+        k = 0 if self.count or after is None else self._period_index(after)
+        seen = 0
+        while True:
+            for when in self._candidates(k):
+                if when < self.start:
+                    continue
+                if self.until and when > self.until:
+                    return
+                seen += 1
+                if self.count and seen > self.count:
+                    return
+                if until and when > until:
+                    return
+                if after is None or when > after:
+                    yield when
+            k += 1
+
+    def next_after(self, after):
+        return next(self.occurrences(after=after), None)
+
+    def describe(self):
+        """Short human summary, e.g. 'Every 3 hours' or 'Daily at 09:00, until Nov 01'."""
+        times = ', '.join(t.strftime('%H:%M') for t in self.times)
+        if self.freq == 'hourly':
+            text = 'Every hour' if self.interval == 1 else f'Every {self.interval} hours'
+        elif self.freq == 'daily':
+            text = ('Daily' if self.interval == 1 else f'Every {self.interval} days') + f' at {times}'
+        else:
+            days = ', '.join(WEEKDAY_NAMES[d] for d in self.weekdays)
+            text = ('Weekly' if self.interval == 1 else f'Every {self.interval} weeks') + f' on {days} at {times}'
+        if self.until:
+            text += f", until {self.until.strftime('%b %d')}"
+        elif self.count:
+            text += f', {self.count} times'
+        return text
+
+    # --- storage ---
+    def to_row(self):
+        return {
+            'freq': self.freq,
+            'every': self.interval,
+            'by_time': ','.join(t.strftime('%H:%M') for t in self.times),
+            'by_day': ','.join(WEEKDAYS[d] for d in self.weekdays),
+            'starts_at': self.start.strftime(TIME_FMT),
+            'until_at': self.until.strftime(TIME_FMT) if self.until else None,
+            'max_count': self.count
+        }
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row['freq'], _parse_datetime(row['starts_at']), interval=int(row['every']),
+                   times=[_parse_time(t) for t in (row.get('by_time') or '').split(',') if t],
+                   weekdays=[WEEKDAYS.index(d) for d in (row.get('by_day') or '').split(',') if d],
+                   until=_parse_datetime(row['until_at']) if row.get('until_at') else None,
+                   count=int(row['max_count']) if row.get('max_count') else None)
+
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(str(value)[:19].replace('T', ' '))
+
+
+def _parse_time(value):
+    return datetime.strptime(value.strip()[:5], '%H:%M').time()
+
+
+def rule_from_form(form, now):
+    """Build a rule from the tracker's recurring-reminder form; raises ValueError with a user message."""
+    freq = (form.get('freq') or '').lower()
+    try:
+        interval = int(form.get('interval') or 1)
+        count = int(form['count']) if form.get('count') else None
+        times = [_parse_time(t) for t in (form.get('times') or '').split(',') if t.strip()]
+        until = datetime.combine(datetime.strptime(form['until'], '%Y-%m-%d').date(), time(23, 59, 59)) \
+            if form.get('until') else None
+    except (TypeError, ValueError):
+        raise ValueError('Invalid interval, times, end date or count')
+    weekdays = [WEEKDAYS.index(d) for d in form.getlist('days') if d in WEEKDAYS] if hasattr(form, 'getlist') else []
+    if freq in ('daily', 'weekly') and not times:
+        raise ValueError('Pick at least one time of day')
+    # Hourly rules run from the first time given (or from now); a counted rule whose time
+    # has already passed today starts tomorrow, since its count runs from the start
+    start = now
+    if freq == 'hourly' and times:
+        start = datetime.combine(now.date(), times[0])
+        if count and start < now:
+            start += timedelta(days=1)
+    if until and until < now:
+        raise ValueError('End date is in the past')
+    rule = RecurrenceRule(freq, start, interval=interval, times=times, weekdays=weekdays, until=until, count=count)
+    if rule.next_after(now) is None:
+        raise ValueError('This reminder would never go off; check the end date')
+    return rule
@@ -0,0 +1,668 @@
+"""Reminder dispatch: a min-heap of upcoming reminders fired by a background thread.
+
+Only reminders due within the next ``horizon`` (default 30 minutes) are kept
+in memory. Each wake-up extends that window with an indexed range scan over
+the slice that just came into view (``due_at > loaded_until AND due_at <=
+now + horizon``), so the cost does not grow with the number of pending
+reminders in the table. ``add()`` / ``cancel()`` update the heap in place
+when a reminder is created or deleted inside the loaded window; later ones
+are picked up by the scan when their time comes.
+
+``remind_time`` holds whatever the tracker form sent (a bare ``HH:MM`` from
+the time picker, or a full date-time), so sources store a normalised
+``due_at`` next to it: the first occurrence of that time after the reminder
+was created.
+
+Due reminders go to every sink (``OutboxSink`` emails the parent through the
+mail outbox, ``LogSink`` logs them; any callable taking the reminder dict
+works). A ``reminder_deliveries`` row is claimed before sinks run, so a
+reminder fires once even with several processes or after a restart inside
+the ``grace`` period. Deleting a reminder tombstones its key there, and the
+source is asked again before sinks run, so a reminder another process had
+already loaded is not sent once deleted. If a sink fails the claim is released
+and the reminder is tried again every ``retry_after`` while it is inside the
+grace period. The Supabase app keeps these claims
+in Supabase (``SupabaseDeliveryLog``) so every instance shares them. On hosts
+without long-lived threads run ``python reminders.py [app|app_supabase]`` from
+cron to dispatch whatever is due.
+
+Recurring reminders are one ``reminder_rules`` row each (see recurrence.py),
+never a row per occurrence. The rule sources keep ``next_due``, the rule's
+next unfired occurrence, on an index: a scan only expands the rules with
+``next_due <= now + horizon``, and only within the window being loaded.
+``next_due`` moves on when an occurrence fires.
+"""
+import heapq
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from itertools import islice
+
+from mail_outbox import subject_line
+from recurrence import RecurrenceRule
+
+TIME_FMT = "%Y-%m-%d %H:%M:%S"
+# A rule whose next_due is this far behind a scan was missed (nothing ran), not pending
+STALE_AFTER = timedelta(hours=1)
+
+log = logging.getLogger('reminders')
+
+
+def due_at_for(remind_time, created_at):
+    """Absolute due time of a reminder: ``remind_time`` itself, or its next HH:MM after ``created_at``."""
+    remind_time = (remind_time or '').strip()
+    try:
+        return datetime.fromisoformat(remind_time).replace(tzinfo=None, microsecond=0)
+    except ValueError:
+        pass
+    created = datetime.fromisoformat(created_at) if isinstance(created_at, str) else created_at
+    clock = datetime.strptime(remind_time[:5], '%H:%M').time()
+    due = datetime.combine(created.date(), clock)
+    return due if due > created else due + timedelta(days=1)
+
+
+class SQLiteReminderSource:
+    """One-off reminders from the ``reminders`` table, range-scanned on an index over ``due_at``."""
+
+    def __init__(self, db_path, page_size=500):
+        self.db_path = db_path
+        self.page_size = page_size
+        self._ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._ready:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(reminders)")]
+            if 'due_at' not in columns:
+                conn.execute("ALTER TABLE reminders ADD COLUMN due_at TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_reminders_due ON reminders(due_at, id)")
+            # Rows written before due_at existed
+            rows = conn.execute("SELECT id, remind_time, created_at FROM reminders WHERE due_at IS NULL").fetchall()
+            updates = []
+            for reminder_id, remind_time, created_at in rows:
+                try:
+                    updates.append((due_at_for(remind_time, created_at).strftime(TIME_FMT), reminder_id))
+                except (TypeError, ValueError):
+                    continue
+            conn.executemany("UPDATE reminders SET due_at = ? WHERE id = ?", updates)
+            conn.commit()
+            self._ready = True
+        return conn
+
+    def prepare(self):
+        self._connect().close()
+
+    def scan(self, after, until):
+        """Yield (due, key, reminder) with ``after < due <= until``, in keyset-paged batches."""
+        lo, hi = after.strftime(TIME_FMT), until.strftime(TIME_FMT)
+        last_id = 0
+        conn = self._connect()
+        try:
+            while True:
+                rows = conn.execute("""SELECT id, user_id, message, due_at FROM reminders
+                                       WHERE (due_at > ? OR (due_at = ? AND id > ?)) AND due_at <= ?
+                                       ORDER BY due_at, id LIMIT ?""",
+                                    (lo, lo, last_id, hi, self.page_size)).fetchall()
+                for reminder_id, user_id, message, due_at in rows:
+                    due = datetime.strptime(due_at, TIME_FMT)
+                    yield due, f'reminder:{reminder_id}', {'id': reminder_id, 'user_id': user_id,
+                                                           'message': message, 'due_at': due}
+                if len(rows) < self.page_size:
+                    return
+                lo, last_id = rows[-1][3], rows[-1][0]
+        finally:
+            conn.close()
+
+    def exists(self, key, reminder):
+        """Whether a loaded reminder is still in the table (None for keys of other sources)."""
+        if not key.startswith('reminder:'):
+            return None
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT 1 FROM reminders WHERE id = ?", (reminder['id'],)).fetchone() is not None
+        finally:
+            conn.close()
+
+
+class SupabaseReminderSource:
+    """Same interface over the Supabase ``reminders`` table (needs the due_at column and index)."""
+
+    def __init__(self, client, page_size=500):
+        self._client = client
+        self.page_size = page_size
+
+    @property
+    def client(self):
+        return self._client() if callable(self._client) else self._client
+
+    def prepare(self):
+        """Fill in due_at for rows written before the column existed (the SQL migration only adds it)."""
+        last_id = 0
+        while True:
+            rows = (self.client.table('reminders').select('id, remind_time, created_at').is_('due_at', 'null')
+                    .gt('id', last_id).order('id').limit(self.page_size).execute().data or [])
+            for row in rows:
+                try:
+                    due = due_at_for(row['remind_time'], str(row['created_at'])[:19].replace('T', ' '))
+                except (TypeError, ValueError):
+                    continue
+                self.client.table('reminders').update({'due_at': due.strftime(TIME_FMT)}).eq('id', row['id']).execute()
+            if len(rows) < self.page_size:
+                return
+            last_id = rows[-1]['id']
+
+    def scan(self, after, until):
+        lo, hi = after.strftime(TIME_FMT), until.strftime(TIME_FMT)
+        last_id = 0
+        while True:
+            rows = (self.client.table('reminders').select('id, user_id, message, due_at')
+                    .or_(f'due_at.gt."{lo}",and(due_at.eq."{lo}",id.gt.{last_id})').lte('due_at', hi)
+                    .order('due_at').order('id').limit(self.page_size).execute().data or [])
+            for row in rows:
+                due = datetime.strptime(row['due_at'][:19].replace('T', ' '), TIME_FMT)
+                yield due, f"reminder:{row['id']}", dict(row, due_at=due)
+            if len(rows) < self.page_size:
+                return
+            lo, last_id = rows[-1]['due_at'], rows[-1]['id']
+
+    def exists(self, key, reminder):
+        if not key.startswith('reminder:'):
+            return None
+        return bool(self.client.table('reminders').select('id').eq('id', reminder['id']).execute().data)
+
+
+def rule_key(rule_id, when):
+    """Delivery key of one occurrence of a recurring rule."""
+    return f"rule:{rule_id}:{when.strftime('%Y%m%d%H%M')}"
+
+
+def rule_summaries(rows, now, upcoming=5):
+    """Rule rows as dicts for the tracker page, each with its next ``upcoming`` occurrences."""
+    summaries = []
+    for row in rows:
+        try:
+            rule = RecurrenceRule.from_row(row)
+        except (KeyError, TypeError, ValueError):
+            continue
+        summaries.append({'id': row['id'], 'message': row['message'], 'summary': rule.describe(),
+                          'upcoming': [when.strftime('%a %b %d, %I:%M %p')
+                                       for when in islice(rule.occurrences(after=now), upcoming)]})
+    return summaries
+
+
+class SQLiteRuleSource:
+    """Recurring reminders from the ``reminder_rules`` table, expanded lazily per scan window."""
+
+    def __init__(self, db_path, page_size=500):
+        self.db_path = db_path
+        self.page_size = page_size
+        self._ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        if not self._ready:
+            conn.execute('''CREATE TABLE IF NOT EXISTS reminder_rules
+                            (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                             user_id TEXT NOT NULL,
+                             message TEXT NOT NULL,
+                             freq TEXT NOT NULL,
+                             every INTEGER NOT NULL DEFAULT 1,
+                             by_time TEXT,
+                             by_day TEXT,
+                             starts_at TEXT NOT NULL,
+                             until_at TEXT,
+                             max_count INTEGER,
+                             next_due TEXT,
+                             created_at TEXT)''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_reminder_rules_due ON reminder_rules(next_due, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_reminder_rules_user ON reminder_rules(user_id)")
+            conn.commit()
+            self._ready = True
+        return conn
+
+    def prepare(self):
+        self._connect().close()
+
+    # --- tracker side ---
+    def add_rule(self, user_id, message, rule, now):
+        """Store ``rule`` once; return its id."""
+        next_due = rule.next_after(now)
+        row = rule.to_row()
+        conn = self._connect()
+        try:
+            cur = conn.execute('''INSERT INTO reminder_rules (user_id, message, freq, every, by_time, by_day,
+                                  starts_at, until_at, max_count, next_due, created_at)
+                                  VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                               (user_id, message, row['freq'], row['every'], row['by_time'], row['by_day'],
+                                row['starts_at'], row['until_at'], row['max_count'],
+                                next_due.strftime(TIME_FMT) if next_due else None, now.strftime(TIME_FMT)))
+            conn.commit()
+            return cur.lastrowid
+        finally:
+            conn.close()
+
+    def rules_for(self, user_id):
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(
+                "SELECT * FROM reminder_rules WHERE user_id = ? ORDER BY id", (user_id,))]
+        finally:
+            conn.close()
+
+    def delete_rule(self, rule_id, user_id):
+        conn = self._connect()
+        try:
+            cur = conn.execute("DELETE FROM reminder_rules WHERE id = ? AND user_id = ?", (rule_id, user_id))
+            conn.commit()
+            return cur.rowcount > 0
+        finally:
+            conn.close()
+
+    # --- scheduler side ---
+    def scan(self, after, until):
+        """Yield (due, key, reminder) for rule occurrences with ``after < due <= until``."""
+        lo, hi = '', until.strftime(TIME_FMT)
+        stale = (after - STALE_AFTER).strftime(TIME_FMT)
+        last_id = 0
+        repairs = []
+        conn = self._connect()
+        try:
+            while True:
+                rows = conn.execute("""SELECT * FROM reminder_rules
+                                       WHERE (next_due > ? OR (next_due = ? AND id > ?)) AND next_due <= ?
+                                       ORDER BY next_due, id LIMIT ?""",
+                                    (lo, lo, last_id, hi, self.page_size)).fetchall()
+                for row in map(dict, rows):
+                    try:
+                        rule = RecurrenceRule.from_row(row)
+                    except (TypeError, ValueError):
+                        continue
+                    for due in rule.occurrences(after=after, until=until):
+                        yield due, rule_key(row['id'], due), {'id': row['id'], 'rule_id': row['id'],
+                                                              'user_id': row['user_id'],
+                                                              'message': row['message'], 'due_at': due}
+                    # Occurrences missed while nothing was running: move on rather than rescan forever
+                    if row['next_due'] < stale:
+                        next_due = rule.next_after(after)
+                        repairs.append((next_due.strftime(TIME_FMT) if next_due else None, row['id']))
+                if len(rows) < self.page_size:
+                    break
+                lo, last_id = rows[-1]['next_due'], rows[-1]['id']
+            # After paging, so a moved row cannot turn up again on a later page
+            if repairs:
+                conn.executemany("UPDATE reminder_rules SET next_due = ? WHERE id = ?", repairs)
+                conn.commit()
+        finally:
+            conn.close()
+
+    def exists(self, key, reminder):
+        """Whether the rule of a loaded occurrence still exists (None for keys of other sources)."""
+        if not key.startswith('rule:'):
+            return None
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT 1 FROM reminder_rules WHERE id = ?",
+                                (reminder['rule_id'],)).fetchone() is not None
+        finally:
+            conn.close()
+
+    def fired(self, key, reminder):
+        """Advance the rule's ``next_due`` past an occurrence that was just delivered."""
+        if not key.startswith('rule:'):
+            return
+        due = reminder['due_at']
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM reminder_rules WHERE id = ?", (reminder['rule_id'],)).fetchone()
+            if row is None:
+                return
+            next_due = RecurrenceRule.from_row(dict(row)).next_after(due)
+            conn.execute("UPDATE reminder_rules SET next_due = ? WHERE id = ? AND next_due <= ?",
+                         (next_due.strftime(TIME_FMT) if next_due else None, row['id'], due.strftime(TIME_FMT)))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class SupabaseRuleSource:
+    """Same interface over the Supabase ``reminder_rules`` table."""
+
+    def __init__(self, client, page_size=500):
+        self._client = client
+        self.page_size = page_size
+
+    @property
+    def client(self):
+        return self._client() if callable(self._client) else self._client
+
+    def prepare(self):
+        pass
+
+    def add_rule(self, user_id, message, rule, now):
+        next_due = rule.next_after(now)
+        response = self.client.table('reminder_rules').insert(dict(
+            rule.to_row(), user_id=user_id, message=message, created_at=now.strftime(TIME_FMT),
+            next_due=next_due.strftime(TIME_FMT) if next_due else None)).execute()
+        return response.data[0]['id'] if response.data else None
+
+    def rules_for(self, user_id):
+        return self.client.table('reminder_rules').select('*').eq('user_id', user_id).order('id').execute().data or []
+
+    def delete_rule(self, rule_id, user_id):
+        response = self.client.table('reminder_rules').delete().eq('id', rule_id).eq('user_id', user_id).execute()
+        return bool(response.data)
+
+    def scan(self, after, until):
+        lo, hi = '', until.strftime(TIME_FMT)
+        stale = (after - STALE_AFTER).strftime(TIME_FMT)
+        last_id = 0
+        repairs = []
+        while True:
+            query = self.client.table('reminder_rules').select('*').lte('next_due', hi)
+            if lo:
+                query = query.or_(f'next_due.gt."{lo}",and(next_due.eq."{lo}",id.gt.{last_id})')
+            rows = query.order('next_due').order('id').limit(self.page_size).execute().data or []
+            for row in rows:
+                try:
+                    rule = RecurrenceRule.from_row(row)
+                except (TypeError, ValueError):
+                    continue
+                for due in rule.occurrences(after=after, until=until):
+                    yield due, rule_key(row['id'], due), {'id': row['id'], 'rule_id': row['id'],
+                                                          'user_id': row['user_id'],
+                                                          'message': row['message'], 'due_at': due}
+                if row['next_due'][:19].replace('T', ' ') < stale:
+                    repairs.append((row['id'], rule.next_after(after)))
+            if len(rows) < self.page_size:
+                break
+            lo, last_id = rows[-1]['next_due'], rows[-1]['id']
+        for rule_id, next_due in repairs:
+            self.client.table('reminder_rules').update(
+                {'next_due': next_due.strftime(TIME_FMT) if next_due else None}).eq('id', rule_id).execute()
+
+    def exists(self, key, reminder):
+        if not key.startswith('rule:'):
+            return None
+        return bool(self.client.table('reminder_rules').select('id').eq('id', reminder['rule_id']).execute().data)
+
+    def fired(self, key, reminder):
+        if not key.startswith('rule:'):
+            return
+        due = reminder['due_at']
+        rows = self.client.table('reminder_rules').select('*').eq('id', reminder['rule_id']).execute().data
+        if not rows:
+            return
+        next_due = RecurrenceRule.from_row(rows[0]).next_after(due)
+        (self.client.table('reminder_rules').update({'next_due': next_due.strftime(TIME_FMT) if next_due else None})
+         .eq('id', rows[0]['id']).lte('next_due', due.strftime(TIME_FMT)).execute())
+
+
+class OutboxSink:
+    """Email the reminder to its user (user_id is the login email) through the mail outbox."""
+
+    def __init__(self, outbox):
+        self.outbox = outbox
+
+    def __call__(self, reminder):
+        when = reminder['due_at'].strftime('%I:%M %p')
+        self.outbox.enqueue(subject_line(f"Reminder: {reminder['message']}"),
+                            f"Hi,\n\nThis is your Dream Baby Care reminder for {when}:\n\n"
+                            f"{reminder['message']}\n",
+                            to=reminder['user_id'])
+
+
+class LogSink:
+
+    def __call__(self, reminder):
+        log.info('reminder %s for %s due %s: %s', reminder.get('id'), reminder['user_id'],
+                 reminder['due_at'], reminder['message'])
+
+
+class SQLiteDeliveryLog:
+    """Claimed reminder keys in the ``reminder_deliveries`` table; a claim succeeds once per key."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._ready:
+            conn.execute('''CREATE TABLE IF NOT EXISTS reminder_deliveries
+                            (reminder_key TEXT PRIMARY KEY,
+                             fired_at TEXT NOT NULL)''')
+            conn.commit()
+            self._ready = True
+        return conn
+
+    def prepare(self):
+        self._connect().close()
+
+    def claim(self, key):
+        conn = self._connect()
+        try:
+            cur = conn.execute("INSERT OR IGNORE INTO reminder_deliveries (reminder_key, fired_at) VALUES (?, ?)",
+                               (key, datetime.now().strftime(TIME_FMT)))
+            conn.commit()
+            return cur.rowcount == 1
+        finally:
+            conn.close()
+
+    def release(self, key):
+        """Drop a claim whose delivery failed, so the reminder can be tried again."""
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM reminder_deliveries WHERE reminder_key = ?", (key,))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class SupabaseDeliveryLog:
+    """Same claims in the Supabase ``reminder_deliveries`` table, shared by every instance."""
+
+    def __init__(self, client):
+        self._client = client
+
+    @property
+    def client(self):
+        return self._client() if callable(self._client) else self._client
+
+    def prepare(self):
+        pass
+
+    def claim(self, key):
+        # ON CONFLICT DO NOTHING returns no row when the key was already claimed
+        response = self.client.table('reminder_deliveries').upsert(
+            {'reminder_key': key, 'fired_at': datetime.now().strftime(TIME_FMT)},
+            on_conflict='reminder_key', ignore_duplicates=True).execute()
+        return bool(response.data)
+
+    def release(self, key):
+        self.client.table('reminder_deliveries').delete().eq('reminder_key', key).execute()
+
+
+class ReminderScheduler:
+    """``deliveries`` is a delivery log (or an SQLite path for ``SQLiteDeliveryLog``)."""
+
+    def __init__(self, deliveries, sources, sinks, horizon=timedelta(minutes=30),
+                 grace=timedelta(minutes=10), retry_after=timedelta(minutes=1), max_sleep=60):
+        self.deliveries = SQLiteDeliveryLog(deliveries) if isinstance(deliveries, str) else deliveries
+        self.sources = list(sources)
+        self.sinks = list(sinks)
+        self.horizon = horizon
+        self.grace = grace
+        self.retry_after = retry_after
+        self.max_sleep = max_sleep
+        self._heap = []
+        self._live = {}
+        self._loaded_until = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._ready = False
+
+    def prepare(self):
+        """Create the delivery table and the sources' tables, columns and indexes."""
+        if not self._ready:
+            self.deliveries.prepare()
+            for source in self.sources:
+                source.prepare()
+            self._ready = True
+
+    # --- request side ---
+    def add(self, key, due, reminder):
+        """Schedule ``reminder`` (a dict with user_id, message) under ``key`` at ``due``."""
+        with self._lock:
+            if self._loaded_until is None or due > self._loaded_until:
+                # Outside the loaded window: the range scan will pick it up in time
+                return
+            self._live[key] = (due, reminder)
+            heapq.heappush(self._heap, (due, key))
+            is_next = self._heap[0][1] == key
+        if is_next:
+            self._wake.set()
+
+    def cancel(self, key):
+        """Forget a scheduled reminder and tombstone its key so no other process fires it either."""
+        with self._lock:
+            self._live.pop(key, None)
+        self.prepare()
+        self.deliveries.claim(key)
+
+    def add_rule(self, rule_id, rule, reminder, now=None):
+        """Schedule the occurrences of a new recurring rule that fall inside the loaded window."""
+        with self._lock:
+            until = self._loaded_until
+        if until is None:
+            return
+        for when in rule.occurrences(after=now or datetime.now(), until=until):
+            self.add(rule_key(rule_id, when), when, dict(reminder, id=rule_id, rule_id=rule_id, due_at=when))
+
+    def cancel_rule(self, rule_id):
+        """Forget every loaded occurrence of a deleted rule (other processes re-check the rule before firing)."""
+        prefix = f'rule:{rule_id}:'
+        with self._lock:
+            for key in [k for k in self._live if k.startswith(prefix)]:
+                del self._live[key]
+
+    def pending(self):
+        """Number of reminders currently held in memory (those due within the horizon)."""
+        with self._lock:
+            return len(self._live)
+
+    # --- dispatch side ---
+    def start(self):
+        """Start the background dispatch thread once per process."""
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='reminders', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.dispatch_due()
+            except Exception:
+                log.exception('reminder dispatch failed')
+            self._wake.wait(self._sleep_seconds())
+            self._wake.clear()
+
+    def _sleep_seconds(self):
+        with self._lock:
+            while self._heap and self._live.get(self._heap[0][1], (None,))[0] != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                return self.max_sleep
+            return max(0.0, min(self.max_sleep, (self._heap[0][0] - datetime.now()).total_seconds()))
+
+    def _load(self, now):
+        """Extend the in-memory window to ``now + horizon`` with one range scan per source."""
+        until = now + self.horizon
+        # A fresh process (restart, cron run) starts one grace period back so reminders that fell
+        # due while nothing was running still fire; never reach back further than that
+        start = self._loaded_until if self._loaded_until is not None else now - self.grace
+        after = max(start, now - self.grace)
+        if until <= after:
+            return
+        entries = []
+        for source in self.sources:
+            entries.extend(source.scan(after, until))
+        with self._lock:
+            for due, key, reminder in entries:
+                self._live[key] = (due, reminder)
+                heapq.heappush(self._heap, (due, key))
+            self._loaded_until = until
+
+    def _still_exists(self, key, reminder):
+        for source in self.sources:
+            exists = getattr(source, 'exists', None)
+            if exists is not None and exists(key, reminder) is False:
+                return False
+        return True
+
+    def _retry(self, key, reminder, now):
+        """Release the claim of a failed delivery and queue it again while it is inside the grace period."""
+        try:
+            self.deliveries.release(key)
+        except Exception:
+            log.exception('could not release %s; it will not be retried', key)
+            return
+        retry_at = now + self.retry_after
+        if retry_at - reminder['due_at'] > self.grace:
+            log.error('giving up on %s, due %s', key, reminder['due_at'])
+            return
+        with self._lock:
+            self._live[key] = (retry_at, reminder)
+            heapq.heappush(self._heap, (retry_at, key))
+
+    def dispatch_due(self, now=None):
+        """Load the next slice, then fire everything due; return how many reminders were sent."""
+        now = now or datetime.now()
+        self.prepare()
+        self._load(now)
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                when, key = heapq.heappop(self._heap)
+                entry = self._live.get(key)
+                if entry and entry[0] == when:
+                    del self._live[key]
+                    due.append((key, entry[1]))
+        sent = 0
+        for key, reminder in due:
+            # Deleted since it was loaded, possibly by another process
+            if not self._still_exists(key, reminder) or not self.deliveries.claim(key):
+                continue
+            failed = False
+            for sink in self.sinks:
+                try:
+                    sink(reminder)
+                except Exception:
+                    log.exception('reminder sink %r failed for %s', sink, key)
+                    failed = True
+            if failed:
+                self._retry(key, reminder, now)
+                continue
+            for source in self.sources:
+                fired = getattr(source, 'fired', None)
+                if fired is not None:
+                    try:
+                        fired(key, reminder)
+                    except Exception:
+                        log.exception('could not advance %s', key)
+            sent += 1
+        return sent
+
+
+if __name__ == '__main__':
+    # Fire whatever is due once (for cron on hosts without background threads):
+    # python reminders.py [app|app_supabase]
+    import importlib
+    import sys
+    app_module = importlib.import_module(sys.argv[1] if len(sys.argv) > 1 else 'app')
+    print(f"Dispatched {app_module.reminder_scheduler.dispatch_due()} reminder(s).")
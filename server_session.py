@@ -0,0 +1,284 @@
+"""Server-side sessions for Dream Baby Care.
+
+The browser cookie only carries an opaque random session ID. The session data
+(language, subscription flags, admin/doctor identity, AI history, ...) lives in
+a pluggable store: ``SQLiteSessionStore`` persists it in babycare.db and
+``CachedSessionStore`` puts a small in-memory LRU in front of any store.
+Expired sessions are removed lazily when they are next read.
+
+Call ``session.regenerate()`` whenever a request logs someone in, so an ID
+planted before login (session fixation) is never the authenticated one.
+"""
+import logging
+import secrets
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+log = logging.getLogger('sessions')
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its ID and whether it was changed."""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.replaced_sid = None
+
+    def regenerate(self):
+        """Move the data to a fresh ID; the old row is deleted when the response is saved."""
+        if not self.new and self.replaced_sid is None:
+            self.replaced_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+
+
+class SQLiteSessionStore:
+    """Keeps sessions in a ``sessions`` table of the app's SQLite database."""
+
+    def __init__(self, db_path='babycare.db'):
+        self.db_path = db_path
+        self.serializer = TaggedJSONSerializer()
+        self._ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        if not self._ready:
+            conn.execute('''CREATE TABLE IF NOT EXISTS sessions
+                            (sid TEXT PRIMARY KEY,
+                             user_id TEXT,
+                             data TEXT NOT NULL,
+                             expires_at TEXT NOT NULL)''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id)")
+            conn.commit()
+            self._ready = True
+        return conn
+
+    def get(self, sid):
+        """Return (data, expires_at) for a live session, or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT data, expires_at FROM sessions WHERE sid = ?", (sid,)).fetchone()
+            if not row:
+                return None
+            expires_at = datetime.fromisoformat(row[1])
+            if expires_at <= datetime.now():
+                # Lazy expiry: drop the row the first time someone asks for it
+                conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+                conn.commit()
+                return None
+            return self.serializer.loads(row[0]), expires_at
+        finally:
+            conn.close()
+
+    def save(self, sid, data, expires_at):
+        conn = self._connect()
+        try:
+            conn.execute("INSERT OR REPLACE INTO sessions (sid, user_id, data, expires_at) VALUES (?, ?, ?, ?)",
+                         (sid, data.get('user_id'), self.serializer.dumps(dict(data)), expires_at.isoformat()))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def delete(self, sid):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def update_user(self, user_id, changes):
+        """Apply ``changes`` to every stored session of ``user_id``; return their IDs."""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT sid, data FROM sessions WHERE user_id = ?", (user_id,)).fetchall()
+            for sid, raw in rows:
+                data = self.serializer.loads(raw)
+                data.update(changes)
+                conn.execute("UPDATE sessions SET data = ? WHERE sid = ?", (self.serializer.dumps(data), sid))
+            conn.commit()
+            return [r[0] for r in rows]
+        finally:
+            conn.close()
+
+    def delete_user(self, user_id):
+        """Remove every stored session of ``user_id``; return their IDs."""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT sid FROM sessions WHERE user_id = ?", (user_id,)).fetchall()
+            conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+            conn.commit()
+            return [r[0] for r in rows]
+        finally:
+            conn.close()
+
+    def purge_expired(self):
+        """Delete all expired rows (optional housekeeping; reads already expire lazily)."""
+        conn = self._connect()
+        try:
+            cur = conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (datetime.now().isoformat(),))
+            conn.commit()
+            return cur.rowcount
+        finally:
+            conn.close()
+
+
+class CachedSessionStore:
+    """In-memory LRU in front of another session store.
+
+    Each worker process has its own cache, so entries are only trusted for
+    ``ttl`` seconds before being re-read from the backing store. Changes made
+    through this object (including ``update_user``/``delete_user``) update the
+    local cache immediately.
+    """
+
+    def __init__(self, backend, maxsize=1024, ttl=5):
+        self.backend = backend
+        self.maxsize = maxsize
+        self.ttl = timedelta(seconds=ttl)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, sid, data, expires_at):
+        with self._lock:
+            self._cache[sid] = (dict(data), expires_at, datetime.now() + self.ttl)
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def _forget(self, sids):
+        with self._lock:
+            for sid in sids:
+                self._cache.pop(sid, None)
+
+    def get(self, sid):
+        now = datetime.now()
+        with self._lock:
+            hit = self._cache.get(sid)
+            if hit:
+                data, expires_at, fresh_until = hit
+                if expires_at > now and fresh_until > now:
+                    self._cache.move_to_end(sid)
+                    return dict(data), expires_at
+                del self._cache[sid]
+        found = self.backend.get(sid)
+        if found:
+            self._remember(sid, *found)
+        return found
+
+    def save(self, sid, data, expires_at):
+        self.backend.save(sid, data, expires_at)
+        self._remember(sid, data, expires_at)
+
+    def delete(self, sid):
+        self._forget([sid])
+        self.backend.delete(sid)
+
+    def update_user(self, user_id, changes):
+        sids = self.backend.update_user(user_id, changes)
+        self._forget(sids)
+        return sids
+
+    def delete_user(self, user_id):
+        sids = self.backend.delete_user(user_id)
+        self._forget(sids)
+        return sids
+
+    def purge_expired(self):
+        return self.backend.purge_expired()
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface that stores session data in ``store``.
+
+    Unmodified sessions are not written back unless more than
+    ``refresh_interval`` seconds of their lifetime have been used up, so most
+    requests cost a single (usually cached) read.
+    """
+
+    session_class = ServerSideSession
+
+    def __init__(self, store, refresh_interval=60):
+        self.store = store
+        self.refresh_interval = timedelta(seconds=refresh_interval)
+
+    def _new_sid(self):
+        return secrets.token_urlsafe(32)
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            try:
+                found = self.store.get(sid)
+            except Exception:
+                # Fail the request rather than silently logging the user out
+                log.exception('session store unavailable')
+                raise
+            if found:
+                data, expires_at = found
+                s = self.session_class(data, sid=sid)
+                s.expires_at = expires_at
+                return s
+        return self.session_class(sid=self._new_sid(), new=True)
+
+    def save_session(self, app, session, response):
+        if session is None:
+            # open_session failed; there is nothing to save
+            return
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.replaced_sid:
+            try:
+                self.store.delete(session.replaced_sid)
+            except Exception:
+                log.exception('could not delete replaced session')
+            session.replaced_sid = None
+
+        if not session:
+            if session.modified and not session.new:
+                try:
+                    self.store.delete(session.sid)
+                except Exception:
+                    log.exception('could not delete session')
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        lifetime = app.permanent_session_lifetime
+        expires_at = datetime.now() + lifetime
+        stale = getattr(session, 'expires_at', None)
+        needs_refresh = stale is None or (expires_at - stale) > self.refresh_interval
+        if not (session.modified or session.new or needs_refresh):
+            return
+
+        try:
+            self.store.save(session.sid, session, expires_at)
+        except Exception:
+            log.exception('could not save session')
+            return
+        session.expires_at = expires_at
+
+        if session.new or session.modified or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
@@ -0,0 +1,234 @@
+"""Purged, minified stylesheets and inline critical CSS.
+
+Build from a local copy of Bootstrap's dist CSS (the 5.3.2 release that
+base.html already uses)::
+
+    python stylesheets.py --bootstrap path/to/bootstrap-5.3.2/dist/css/bootstrap.css
+    python assets.py                 # then fingerprint + precompress as usual
+
+Every word in the templates and Python sources counts as a possible class
+name (so classes built in Python, e.g. status badges, or added from inline
+JS survive), ``prefix-{{ ... }}`` in a template keeps every class with that
+prefix, and ``SAFELIST`` covers the classes Bootstrap's own JS toggles at
+runtime. Rules whose selectors all need a class nobody uses are dropped;
+unused @keyframes go with them. Writes to ``static/css/``:
+
+- ``site.min.css``: Bootstrap + styles.css, for pages extending base.html;
+- ``bootstrap.min.css``: Bootstrap alone, for the standalone login pages;
+- ``critical.css``: the rules the header of base.html (navbar, flashes)
+  needs, inlined there so first paint does not wait for site.min.css, which
+  is then loaded without blocking rendering.
+
+Until the build has run, templates keep loading Bootstrap from jsDelivr.
+"""
+import os
+import re
+import sys
+
+from flask import url_for
+from markupsafe import Markup
+
+from assets import default_template_dir
+from fontawesome import css_rules
+
+BOOTSTRAP_CDN = 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css'
+SITE_CSS = 'css/site.min.css'
+BOOTSTRAP_CSS = 'css/bootstrap.min.css'
+CRITICAL_CSS = 'css/critical.css'
+
+# Added and removed by bootstrap.bundle.js, never written in a template
+SAFELIST = {
+    'active', 'disabled', 'show', 'showing', 'hiding', 'fade', 'collapse', 'collapsing', 'collapsed',
+    'modal-open', 'modal-backdrop', 'modal-static', 'offcanvas-backdrop', 'dropdown-menu-end',
+    'dropdown-menu-start', 'tooltip', 'tooltip-inner', 'tooltip-arrow', 'popover', 'popover-arrow',
+    'popover-header', 'popover-body', 'bs-tooltip-auto', 'bs-popover-auto', 'was-validated',
+    'is-valid', 'is-invalid', 'carousel-item-next', 'carousel-item-prev', 'carousel-item-start',
+    'carousel-item-end', 'toast'
+}
+
+_WORD = re.compile(r'[A-Za-z_][\w-]*')
+_DYNAMIC_PREFIX = re.compile(r'([A-Za-z_][\w-]*-)\{\{')
+_SELECTOR_CLASS = re.compile(r'\.((?:[\w-]|\\.)+)')
+_FUNCTIONAL_PSEUDO = re.compile(r':(?:not|is|where|has)\([^()]*\)')
+_KEYFRAMES = re.compile(r'@(?:-webkit-)?keyframes\s+([\w-]+)')
+_HEADER_END = '{% block content %}'
+
+
+def scan_tokens(paths):
+    """(words, dynamic class prefixes) used across ``paths``."""
+    words, prefixes = set(SAFELIST), set()
+    for path in paths:
+        try:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError):
+            continue
+        words.update(_WORD.findall(text))
+        prefixes.update(_DYNAMIC_PREFIX.findall(text))
+    return words, tuple(prefixes)
+
+
+# Helper: split a selector list on top-level commas (not those inside :is(...) etc.)
+def _split_selectors(prelude):
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(prelude):
+        if ch in '([':
+            depth += 1
+        elif ch in ')]':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            parts.append(prelude[start:i])
+            start = i + 1
+    parts.append(prelude[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _selector_used(selector, words, prefixes):
+    # Classes inside :not()/:is() never make a selector unmatchable on their own
+    stripped = selector
+    while True:
+        reduced = _FUNCTIONAL_PSEUDO.sub('', stripped)
+        if reduced == stripped:
+            break
+        stripped = reduced
+    for name in _SELECTOR_CLASS.findall(stripped):
+        name = name.replace('\\', '')
+        if name not in words and not name.startswith(prefixes):
+            return False
+    return True
+
+
+def _minify_prelude(prelude):
+    prelude = re.sub(r'\s+', ' ', prelude).strip()
+    return re.sub(r'\s*([,>~])\s*', r'\1', prelude)
+
+
+def _minify_body(body):
+    body = re.sub(r'/\*.*?\*/', '', body, flags=re.S)
+    body = re.sub(r'\s+', ' ', body).strip()
+    body = re.sub(r'\s*;\s*', ';', body)
+    body = re.sub(r'(^|;)([\w-]+)\s*:\s*', r'\1\2:', body)
+    return body.rstrip(';')
+
+
+def purge(css, words, prefixes):
+    """``css`` without the rules no page can match, minified."""
+    kept = []
+    keyframes = []
+    for prelude, body in css_rules(css):
+        if body is None:
+            kept.append(prelude)
+        elif prelude.startswith('@'):
+            match = _KEYFRAMES.match(prelude)
+            if match:
+                keyframes.append((match.group(1), prelude, body))
+            elif prelude.startswith(('@media', '@supports', '@container', '@layer')):
+                inner = purge(body, words, prefixes)
+                if inner:
+                    kept.append(f'{_minify_prelude(prelude)}{{{inner}}}')
+            else:
+                kept.append(f'{_minify_prelude(prelude)}{{{_minify_body(body)}}}')
+        else:
+            selectors = [s for s in _split_selectors(prelude) if _selector_used(s, words, prefixes)]
+            if selectors:
+                kept.append(f"{','.join(_minify_prelude(s) for s in selectors)}{{{_minify_body(body)}}}")
+    text = ''.join(kept)
+    for name, prelude, body in keyframes:
+        if re.search(rf'(?<![\w-]){re.escape(name)}(?![\w-])', text):
+            frames = ''.join(f'{_minify_prelude(p)}{{{_minify_body(b)}}}' for p, b in css_rules(body))
+            kept.append(f'{_minify_prelude(prelude)}{{{frames}}}')
+    return ''.join(kept)
+
+
+def header_markup(base_template):
+    """The part of base.html rendered above the page content (head, navbar, flashes)."""
+    with open(base_template, encoding='utf-8') as f:
+        text = f.read()
+    end = text.find(_HEADER_END)
+    return text if end < 0 else text[:end]
+
+
+def default_styles_path(root, static_dir):
+    """``static/css/styles.css``, or ``styles.css`` next to app.py where this tree keeps it."""
+    path = os.path.join(static_dir, 'css', 'styles.css')
+    if not os.path.isfile(path) and os.path.isfile(os.path.join(root, 'styles.css')):
+        return os.path.join(root, 'styles.css')
+    return path
+
+
+def build(bootstrap_path, static_dir, template_dir, scan_paths, styles_path=None):
+    """Write the purged bundles and critical CSS under ``static_dir``; return their sizes."""
+    words, prefixes = scan_tokens(scan_paths)
+    with open(bootstrap_path, encoding='utf-8') as f:
+        bootstrap = f.read()
+    styles_path = styles_path or os.path.join(static_dir, 'css', 'styles.css')
+    with open(styles_path, encoding='utf-8') as f:
+        styles = f.read()
+
+    bootstrap_min = purge(bootstrap, words, prefixes)
+    outputs = {
+        BOOTSTRAP_CSS: bootstrap_min,
+        SITE_CSS: bootstrap_min + purge(styles, words, prefixes)
+    }
+    # Critical CSS only needs what the header of base.html can match
+    header = header_markup(os.path.join(template_dir, 'base.html'))
+    header_words = set(_WORD.findall(header)) | SAFELIST
+    outputs[CRITICAL_CSS] = purge(outputs[SITE_CSS], header_words, tuple(set(_DYNAMIC_PREFIX.findall(header))))
+
+    sizes = {}
+    for filename, css in outputs.items():
+        path = os.path.join(static_dir, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(css)
+        sizes[filename] = len(css.encode('utf-8'))
+    sizes['source'] = len(bootstrap.encode('utf-8')) + len(styles.encode('utf-8'))
+    return sizes
+
+
+def install(app):
+    """Register ``bootstrap_css()``, ``site_css()`` and ``critical_css()`` template globals."""
+    def built(filename):
+        return os.path.isfile(os.path.join(app.static_folder, filename))
+
+    has_bootstrap, has_site = built(BOOTSTRAP_CSS), built(SITE_CSS) and built(CRITICAL_CSS)
+    critical = ''
+    if has_site:
+        with open(os.path.join(app.static_folder, CRITICAL_CSS), encoding='utf-8') as f:
+            critical = Markup(f.read().replace('</', '<\\/'))
+
+    def bootstrap_css():
+        return url_for('static', filename=BOOTSTRAP_CSS) if has_bootstrap else BOOTSTRAP_CDN
+
+    def site_css():
+        return url_for('static', filename=SITE_CSS) if has_site else None
+
+    app.jinja_env.globals.update(bootstrap_css=bootstrap_css, site_css=site_css,
+                                 critical_css=lambda: critical)
+    return has_site
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if '--bootstrap' not in args:
+        print(__doc__)
+        sys.exit(1)
+    bootstrap_path = args[args.index('--bootstrap') + 1]
+    here = os.path.dirname(os.path.abspath(__file__))
+    static_dir = os.environ.get('STATIC_DIR') or os.path.join(here, 'static')
+    template_dir = os.environ.get('TEMPLATE_DIR') or default_template_dir(here)
+    styles_path = os.environ.get('STYLES_CSS') or default_styles_path(here, static_dir)
+    if not os.path.isfile(os.path.join(template_dir, 'base.html')):
+        print('ERROR: base.html not found in', template_dir, '(set TEMPLATE_DIR)')
+        sys.exit(1)
+    if not os.path.isfile(styles_path):
+        print('ERROR: styles.css not found at', styles_path, '(set STYLES_CSS)')
+        sys.exit(1)
+    scan_paths = [os.path.join(template_dir, n) for n in os.listdir(template_dir) if n.endswith('.html')]
+    scan_paths += [os.path.join(here, n) for n in os.listdir(here) if n.endswith('.py')]
+    sizes = build(bootstrap_path, static_dir, template_dir, scan_paths, styles_path)
+    print(f"Source CSS: {sizes.pop('source') / 1024:.1f} KB")
+    for filename, size in sizes.items():
+        print(f"  static/{filename}: {size / 1024:.1f} KB")
+    if sizes[CRITICAL_CSS] > 14 * 1024:
+        print('WARNING: critical.css is over 14 KB and no longer fits the first round trip')
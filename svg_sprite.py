@@ -0,0 +1,174 @@
+"""One SVG sprite for the product icons instead of a request per icon.
+
+Build step (after adding or editing an icon in static/images/)::
+
+    python svg_sprite.py
+    python assets.py                 # then fingerprint + precompress as usual
+
+Every ``static/images/*.svg`` (or, where this tree keeps the icons, every
+``*.svg`` next to app.py; ``SVG_DIR`` overrides both) is minified (XML declaration, comments,
+metadata and inter-tag whitespace removed, coordinates rounded) and wrapped
+in a ``<symbol id="<file stem>">`` inside ``static/images/sprite/products.svg``.
+Internal ids are prefixed with the stem so gradients of different icons
+cannot collide.
+
+Templates render product pictures with ``{{ product_image(src, alt, class) }}``:
+
+- a sprite icon (``<svg><use href="...products.svg#diapers">``) when ``src``
+  is one of the sprited files, so a whole shop page costs one cached request;
+- for remote images (the Unsplash URLs of the Supabase seed data) an
+  ``<img>``, with a CDN ``srcset`` when ``remote_srcset`` gives one, that
+  swaps to the icon matching the product name if it fails;
+- a plain ``<img>`` otherwise, or for everything until the sprite is built.
+"""
+import os
+import posixpath
+import re
+import sys
+from urllib.parse import urlparse
+
+from flask import url_for
+from markupsafe import Markup
+
+SPRITE = 'images/sprite/products.svg'
+SOURCE_DIR = 'images'
+
+_SVG = re.compile(r'<svg\b([^>]*)>(.*)</svg>', re.S)
+_VIEWBOX = re.compile(r'\bviewBox="([^"]+)"')
+_SYMBOL = re.compile(r'<symbol id="([^"]+)" viewBox="([^"]+)"')
+_FINGERPRINT = re.compile(r'\.[0-9a-f]{10}(?=\.svg$)')
+_NUMBER = re.compile(r'(?<![\w#-])(-?\d+\.\d{3,})')
+
+
+def optimize_svg(text):
+    """Smaller, equivalent SVG markup."""
+    text = re.sub(r'<\?xml.*?\?>|<!DOCTYPE[^>]*>|<!--.*?-->', '', text, flags=re.S)
+    text = re.sub(r'<metadata\b.*?</metadata>|<sodipodi:[^>]*/>', '', text, flags=re.S)
+    text = re.sub(r'\s(?:inkscape|sodipodi):[\w-]+="[^"]*"', '', text)
+    text = re.sub(r'>\s+<', '><', text.strip())
+    text = re.sub(r'\s{2,}', ' ', text)
+    return _NUMBER.sub(lambda m: ('%.2f' % float(m.group(1))).rstrip('0').rstrip('.'), text)
+
+
+def to_symbol(stem, text):
+    """``<symbol>`` for one optimized SVG document, its ids namespaced by ``stem``."""
+    match = _SVG.search(text)
+    if not match:
+        raise ValueError(f'{stem}: not an <svg> document')
+    attrs, body = match.groups()
+    viewbox = _VIEWBOX.search(attrs)
+    if not viewbox:
+        width = re.search(r'\bwidth="([\d.]+)', attrs)
+        height = re.search(r'\bheight="([\d.]+)', attrs)
+        if not (width and height):
+            raise ValueError(f'{stem}: needs a viewBox or width/height')
+        box = f'0 0 {width.group(1)} {height.group(1)}'
+    else:
+        box = viewbox.group(1)
+    body = re.sub(r'\bid="([^"]+)"', rf'id="{stem}-\1"', body)
+    body = re.sub(r'url\(#([^)]+)\)', rf'url(#{stem}-\1)', body)
+    body = re.sub(r'((?:xlink:)?href)="#([^"]+)"', rf'\1="#{stem}-\2"', body)
+    return f'<symbol id="{stem}" viewBox="{box}">{body}</symbol>'
+
+
+def default_source_dir(root, static_dir):
+    """``static/images/``, or ``root`` itself when the product icons sit next to app.py."""
+    folder = os.path.join(static_dir, SOURCE_DIR)
+    if not _has_svg(folder) and _has_svg(root):
+        return root
+    return folder
+
+
+# Helper: whether ``folder`` holds any .svg file
+def _has_svg(folder):
+    return os.path.isdir(folder) and any(n.endswith('.svg') for n in os.listdir(folder))
+
+
+def build(static_dir, source_dir=None):
+    """Write the sprite from ``source_dir``/*.svg (default ``static_dir``/images); return (icons, size before, after)."""
+    folder = source_dir or os.path.join(static_dir, SOURCE_DIR)
+    symbols, before = [], 0
+    names = sorted(n for n in os.listdir(folder) if n.endswith('.svg'))
+    for name in names:
+        with open(os.path.join(folder, name), encoding='utf-8') as f:
+            text = f.read()
+        before += len(text.encode('utf-8'))
+        symbols.append(to_symbol(name[:-4], optimize_svg(text)))
+    sprite = '<svg xmlns="http://www.w3.org/2000/svg">' + ''.join(symbols) + '</svg>\n'
+    target = os.path.join(static_dir, SPRITE)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, 'w', encoding='utf-8') as f:
+        f.write(sprite)
+    return [n[:-4] for n in names], before, len(sprite.encode('utf-8'))
+
+
+# Helper: sprite symbol for a product image src ('diapers.svg', '/static/images/diapers.<hash>.svg', ...)
+def _symbol_for(src, symbols):
+    path = urlparse(src).path if src else ''
+    if not path.endswith('.svg') or urlparse(src).netloc:
+        return None
+    stem = _FINGERPRINT.sub('', posixpath.basename(path))[:-4]
+    return stem if stem in symbols else None
+
+
+# Helper: icon whose (singular) name appears in the product name, e.g. 'Baby Bottles Set' -> bottles
+def _symbol_for_name(name, symbols):
+    name = (name or '').lower()
+    for stem in symbols:
+        if stem.rstrip('s') in name:
+            return stem
+    return None
+
+
+def install(app, raster=None, remote_srcset=None):
+    """Register the ``product_image()`` template global; return the sprited icon names.
+
+    ``raster(src, alt, css_class, style)`` may return markup for local photos
+    (see image_variants.py), or None to fall back to a plain ``<img>``;
+    ``remote_srcset(src)`` may return extra ``<img>`` attributes for remote ones.
+    """
+    symbols = {}
+    try:
+        with open(os.path.join(app.static_folder, SPRITE), encoding='utf-8') as f:
+            symbols = dict(_SYMBOL.findall(f.read()))
+    except OSError:
+        pass
+
+    def icon(stem, alt, css_class, style_attr, hidden=False):
+        return Markup('<svg class="{}"{} viewBox="{}" role="img" aria-label="{}"{}><use href="{}#{}"></use></svg>').format(
+            css_class, style_attr, symbols[stem], alt, Markup(' hidden') if hidden else '',
+            url_for('static', filename=SPRITE), stem)
+
+    def product_image(src, alt='', css_class='', style=''):
+        alt = alt or ''
+        style_attr = Markup(' style="{}"').format(style) if style else ''
+        stem = _symbol_for(src, symbols)
+        if stem:
+            return icon(stem, alt, css_class, style_attr)
+        if raster is not None and src and not urlparse(src).netloc:
+            markup = raster(src, alt, css_class, style)
+            if markup is not None:
+                return markup
+        img = Markup('<img src="{}" class="{}"{} alt="{}" loading="lazy"').format(src, css_class, style_attr, alt)
+        if remote_srcset is not None and src and urlparse(src).netloc:
+            img += remote_srcset(src) or ''
+        fallback = _symbol_for_name(alt, symbols) if src and urlparse(src).netloc else None
+        if not fallback:
+            return img + Markup('>')
+        # Remote image: show the matching icon instead if it fails to load
+        return (img + Markup(' onerror="this.hidden=true;this.nextElementSibling.hidden=false">')
+                + icon(fallback, alt, css_class, style_attr, hidden=True))
+
+    app.jinja_env.globals['product_image'] = product_image
+    return sorted(symbols)
+
+
+if __name__ == '__main__':
+    here = os.path.dirname(os.path.abspath(__file__))
+    static_dir = os.environ.get('STATIC_DIR') or os.path.join(here, 'static')
+    source_dir = os.environ.get('SVG_DIR') or default_source_dir(here, static_dir)
+    if not _has_svg(source_dir):
+        print('ERROR: no .svg icons found in', source_dir, '(set SVG_DIR)')
+        sys.exit(1)
+    icons, before, after = build(static_dir, source_dir)
+    print(f"Sprited {len(icons)} icons ({before} -> {after} bytes) into static/{SPRITE}: {', '.join(icons)}")
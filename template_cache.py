@@ -0,0 +1,123 @@
+"""Precompiled Jinja templates and template timing stats.
+
+``python check_templates.py`` compiles every template once and writes the
+bytecode to ``jinja_cache/``. The apps load templates through
+``TemplateBytecodeCache``, so a cold start unmarshals that bytecode instead of
+compiling templates from source on first use. Each entry carries a checksum of
+its template source and the Python bytecode version, so entries left stale by
+a template edit or a different interpreter are recompiled, never served.
+Keys use the template name rather than its absolute path, so a cache built in
+CI or on a laptop still matches on the server. On a read-only filesystem
+(Vercel) new entries are simply not written back.
+
+``TemplateStats`` records how long each template took to compile (or to load
+from the cache) and to render; the apps expose it at /admin/template_timings.
+"""
+import os
+import threading
+import time
+from hashlib import sha1
+
+from flask import before_render_template, template_rendered
+from jinja2 import FileSystemBytecodeCache
+
+
+class TemplateStats:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {}
+
+    def _entry(self, name):
+        return self._stats.setdefault(name, {'load': None, 'load_ms': 0.0, 'renders': 0,
+                                             'render_ms_total': 0.0, 'render_ms_max': 0.0})
+
+    def record_load(self, name, how, seconds):
+        with self._lock:
+            entry = self._entry(name)
+            entry['load'] = how
+            entry['load_ms'] = round(seconds * 1000, 2)
+
+    def connect(self, app):
+        """Time every render_template() call of ``app`` via Flask's template signals."""
+        before_render_template.connect(self._before_render, app, weak=False)
+        template_rendered.connect(self._after_render, app, weak=False)
+
+    def _before_render(self, sender, template, context, **extra):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        stack = getattr(self._local, 'stack', None)
+        if not stack:
+            return
+        elapsed = (time.perf_counter() - stack.pop()) * 1000
+        with self._lock:
+            entry = self._entry(template.name)
+            entry['renders'] += 1
+            entry['render_ms_total'] += elapsed
+            entry['render_ms_max'] = max(entry['render_ms_max'], elapsed)
+
+    def report(self):
+        """Per-template stats, slowest first compile/load at the top."""
+        with self._lock:
+            rows = []
+            for name, entry in self._stats.items():
+                renders = entry['renders']
+                rows.append({
+                    'template': name,
+                    'load': entry['load'],
+                    'load_ms': entry['load_ms'],
+                    'renders': renders,
+                    'render_ms_avg': round(entry['render_ms_total'] / renders, 2) if renders else None,
+                    'render_ms_max': round(entry['render_ms_max'], 2) if renders else None
+                })
+        return sorted(rows, key=lambda r: r['load_ms'], reverse=True)
+
+
+class TemplateBytecodeCache(FileSystemBytecodeCache):
+    """Jinja bytecode cache keyed by template name, tolerant of read-only disks."""
+
+    def __init__(self, directory, stats=None):
+        super().__init__(directory, '%s.cache')
+        self.stats = stats
+
+    def get_cache_key(self, name, filename=None):
+        return sha1(name.encode('utf-8')).hexdigest()
+
+    def get_bucket(self, environment, name, filename, source):
+        started = time.perf_counter()
+        bucket = super().get_bucket(environment, name, filename, source)
+        if bucket.code is not None:
+            if self.stats:
+                self.stats.record_load(name, 'bytecode cache', time.perf_counter() - started)
+        else:
+            # Jinja compiles the source next and hands the bucket to set_bucket()
+            bucket.template_name = name
+            bucket.compile_started = started
+        return bucket
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            super().clear()
+
+    def set_bucket(self, bucket):
+        if self.stats and hasattr(bucket, 'compile_started'):
+            self.stats.record_load(bucket.template_name, 'compiled', time.perf_counter() - bucket.compile_started)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            super().set_bucket(bucket)
+        except OSError:
+            pass
+
+
+def install(app, directory=None):
+    """Route ``app``'s templates through the bytecode cache; return the TemplateStats."""
+    stats = TemplateStats()
+    directory = directory or os.environ.get('JINJA_CACHE_DIR') or os.path.join(app.root_path, 'jinja_cache')
+    app.jinja_env.bytecode_cache = TemplateBytecodeCache(directory, stats)
+    stats.connect(app)
+    return stats
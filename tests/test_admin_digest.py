@@ -0,0 +1,40 @@
+import pytest
+
+from admin_digest import AdminDigest
+from mail_outbox import MailOutbox
+
+
+class Outbox:
+
+    def __init__(self):
+        self.queued = []
+
+    def add_producer(self, func):
+        pass
+
+    def is_configured(self):
+        return True
+
+    def enqueue(self, subject, body, to=None, conn=None):
+        self.queued.append(subject)
+        return len(self.queued)
+
+
+@pytest.mark.parametrize('priority', ['contact_message', ' subscription_request, contact_message ',
+                                      ['contact_message'], ('contact_message',)])
+def test_priority_kinds_from_a_string_or_a_list(tmp_path, priority):
+    outbox = Outbox()
+    digest = AdminDigest(str(tmp_path / 'babycare.db'), {'ADMIN_DIGEST_PRIORITY': priority}, outbox)
+    digest.record('contact_message', 'Ann wrote\nagain')
+    assert outbox.queued == ['New contact message: Ann wrote again']
+
+
+def test_routine_events_wait_for_the_digest(tmp_path):
+    outbox = MailOutbox(str(tmp_path / 'babycare.db'), {'SMTP_HOST': 'localhost',
+                                                       'ADMIN_NOTIFICATION_EMAIL': 'admin@example.com'})
+    outbox.start = lambda: None
+    # 'contact' is not an event kind; it must not split into single characters that match nothing
+    digest = AdminDigest(outbox.db_path, dict(outbox.config, ADMIN_DIGEST_PRIORITY='contact'), outbox)
+    assert digest.priority_kinds() == {'contact'}
+    digest.record('contact_message', 'Ann wrote')
+    assert digest.flush_due() == 0
@@ -0,0 +1,15 @@
+from image_variants import remote_srcset
+
+
+def test_unsplash_photo_gets_smaller_cdn_copies():
+    attrs = str(remote_srcset('https://images.unsplash.com/photo-1?auto=format&fit=crop&w=500&q=80', sizes='25vw'))
+    widths = [part.rsplit(' ', 1)[1] for part in attrs.split('srcset="')[1].split('"')[0].split(', ')]
+    assert widths == ['160w', '320w', '480w', '500w']
+    assert 'fit=crop&amp;w=320&amp;q=80' in attrs
+    assert attrs.endswith(' sizes="25vw"')
+
+
+def test_other_urls_are_left_alone():
+    assert remote_srcset('https://example.com/photo.jpg?w=500') is None
+    assert remote_srcset('/static/images/diapers.svg') is None
+    assert remote_srcset('https://images.unsplash.com/photo-1?w=120') is None
@@ -0,0 +1,63 @@
+import smtplib
+import sqlite3
+
+import pytest
+
+from mail_outbox import MailOutbox
+
+CONFIG = {'SMTP_HOST': 'localhost', 'ADMIN_NOTIFICATION_EMAIL': 'admin@example.com'}
+
+
+class FakeSMTP:
+
+    def __init__(self, fail_on=()):
+        self.fail_on = set(fail_on)
+        self.sent = []
+
+    def send_message(self, msg):
+        if msg['Subject'] in self.fail_on:
+            raise smtplib.SMTPRecipientsRefused({})
+        self.sent.append(msg['Subject'])
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = MailOutbox(str(tmp_path / 'babycare.db'), CONFIG)
+    outbox.start = lambda: None
+    return outbox
+
+
+def statuses(outbox):
+    conn = sqlite3.connect(outbox.db_path)
+    try:
+        return dict(conn.execute("SELECT subject, status || ':' || attempts FROM email_outbox"))
+    finally:
+        conn.close()
+
+
+def test_sends_queued_mail_and_retries_failures(outbox):
+    server = FakeSMTP(fail_on={'Bounce'})
+    outbox._open_smtp = lambda: server
+    outbox.enqueue('Hello', 'Body')
+    outbox.enqueue('Bounce', 'Body')
+    assert outbox.drain() == 2
+    assert server.sent == ['Hello']
+    assert statuses(outbox) == {'Hello': 'sent:1', 'Bounce': 'pending:1'}
+    # The failed message waits for its backoff
+    assert outbox.drain() == 0
+
+
+def test_connect_failure_reschedules_the_batch(outbox):
+    def refuse():
+        raise OSError('connection refused')
+    outbox._open_smtp = refuse
+    outbox.enqueue('Hello', 'Body')
+    assert outbox.send_pending() == 0
+    assert statuses(outbox) == {'Hello': 'pending:1'}
+
+
+def test_nothing_is_queued_without_smtp_settings(tmp_path):
+    assert MailOutbox(str(tmp_path / 'babycare.db'), {}).enqueue('Hello', 'Body') is None
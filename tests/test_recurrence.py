@@ -0,0 +1,169 @@
+import sqlite3
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from recurrence import RecurrenceRule, rule_from_form
+from reminders import ReminderScheduler, SQLiteRuleSource, rule_key
+
+START = datetime(2026, 1, 5, 8, 0)  # a Monday
+
+
+def walk(rule, after, n):
+    """Reference expansion: every occurrence from the start, filtered afterwards."""
+    return [when for when in islice(rule.occurrences(), 20000) if when > after][:n]
+
+
+def test_hourly_interval():
+    rule = RecurrenceRule('hourly', START, interval=3)
+    assert list(islice(rule.occurrences(), 3)) == [START, START + timedelta(hours=3), START + timedelta(hours=6)]
+
+
+def test_daily_times_and_interval():
+    rule = RecurrenceRule('daily', START, interval=2, times=[time(21), time(9)])
+    assert list(islice(rule.occurrences(), 4)) == [
+        datetime(2026, 1, 5, 9), datetime(2026, 1, 5, 21), datetime(2026, 1, 7, 9), datetime(2026, 1, 7, 21)]
+
+
+def test_first_day_skips_times_before_start():
+    rule = RecurrenceRule('daily', datetime(2026, 1, 5, 12, 0), times=[time(9), time(18)])
+    assert list(islice(rule.occurrences(), 2)) == [datetime(2026, 1, 5, 18), datetime(2026, 1, 6, 9)]
+
+
+def test_weekly_days_across_week_boundary():
+    rule = RecurrenceRule('weekly', datetime(2026, 1, 7, 12, 0), times=[time(9)], weekdays=[0, 2, 4])
+    assert list(islice(rule.occurrences(), 4)) == [
+        datetime(2026, 1, 9, 9), datetime(2026, 1, 12, 9), datetime(2026, 1, 14, 9), datetime(2026, 1, 16, 9)]
+
+
+def test_every_other_week():
+    rule = RecurrenceRule('weekly', START, interval=2, times=[time(9)], weekdays=[0])
+    assert list(islice(rule.occurrences(), 3)) == [
+        datetime(2026, 1, 5, 9), datetime(2026, 1, 19, 9), datetime(2026, 2, 2, 9)]
+
+
+def test_count_ends_the_rule():
+    rule = RecurrenceRule('daily', START, times=[time(9)], count=3)
+    assert list(rule.occurrences()) == [datetime(2026, 1, d, 9) for d in (5, 6, 7)]
+    # Counted from the first occurrence, not from ``after``
+    assert list(rule.occurrences(after=datetime(2026, 1, 6, 12))) == [datetime(2026, 1, 7, 9)]
+    assert rule.next_after(datetime(2026, 1, 7, 9)) is None
+
+
+def test_until_is_inclusive():
+    rule = RecurrenceRule('daily', START, times=[time(9)], until=datetime(2026, 1, 7, 9))
+    assert list(rule.occurrences())[-1] == datetime(2026, 1, 7, 9)
+    assert rule.next_after(datetime(2026, 1, 7, 9)) is None
+
+
+def test_window_is_half_open():
+    rule = RecurrenceRule('hourly', START)
+    after, until = START + timedelta(hours=2), START + timedelta(hours=4)
+    assert list(rule.occurrences(after=after, until=until)) == [START + timedelta(hours=3), until]
+
+
+@pytest.mark.parametrize('rule', [
+    RecurrenceRule('hourly', START, interval=5),
+    RecurrenceRule('daily', START, interval=3, times=[time(6), time(14, 30), time(22)]),
+    RecurrenceRule('weekly', datetime(2026, 1, 8, 10), interval=2, times=[time(7), time(19)], weekdays=[1, 3, 6]),
+])
+def test_jumping_to_the_period_matches_walking_from_start(rule):
+    for hours in (0, 1, 37, 500, 4321):
+        after = rule.start + timedelta(hours=hours, minutes=7)
+        assert list(islice(rule.occurrences(after=after), 10)) == walk(rule, after, 10)
+
+
+def test_row_round_trip():
+    rule = RecurrenceRule('weekly', START, interval=2, times=[time(9), time(18, 30)], weekdays=[0, 4],
+                          until=datetime(2026, 3, 1, 23, 59, 59))
+    again = RecurrenceRule.from_row(rule.to_row())
+    assert again.to_row() == rule.to_row()
+    assert again.describe() == 'Every 2 weeks on Mon, Fri at 09:00, 18:30, until Mar 01'
+
+
+@pytest.mark.parametrize('form, message', [
+    ({'freq': 'daily'}, 'Pick at least one time of day'),
+    ({'freq': 'yearly', 'times': '09:00'}, 'Repeat must be hourly, daily or weekly'),
+    ({'freq': 'daily', 'times': 'soon'}, 'Invalid interval, times, end date or count'),
+    ({'freq': 'hourly', 'interval': '0'}, 'Interval must be at least 1'),
+    ({'freq': 'daily', 'times': '09:00', 'until': '2020-01-01'}, 'End date is in the past'),
+])
+def test_rule_from_form_rejects(form, message):
+    with pytest.raises(ValueError, match=message):
+        rule_from_form(MultiDict(form), START)
+
+
+def test_hourly_rule_from_a_time_already_past_starts_tomorrow():
+    now = datetime(2026, 10, 19, 14, 0)
+    rule = rule_from_form(MultiDict({'freq': 'hourly', 'times': '06:00', 'count': '3'}), now)
+    assert list(rule.occurrences(after=now)) == [datetime(2026, 10, 20, h) for h in (6, 7, 8)]
+    # Without a count the rule keeps today's start and carries on from now
+    rule = rule_from_form(MultiDict({'freq': 'hourly', 'interval': '4', 'times': '06:00'}), now)
+    assert rule.next_after(now) == datetime(2026, 10, 19, 18, 0)
+
+
+def test_rule_from_form_rejects_a_rule_that_never_fires():
+    with pytest.raises(ValueError, match='never go off'):
+        rule_from_form(MultiDict({'freq': 'daily', 'times': '09:00', 'until': '2026-10-19'}),
+                       datetime(2026, 10, 19, 14, 0))
+
+
+def test_rule_from_form_weekly():
+    form = MultiDict([('freq', 'weekly'), ('times', '09:00, 18:30'), ('days', 'MO'), ('days', 'FR')])
+    assert rule_from_form(form, START).describe() == 'Weekly on Mon, Fri at 09:00, 18:30'
+
+
+# --- rule source + scheduler ---
+
+@pytest.fixture
+def rules(tmp_path):
+    return SQLiteRuleSource(str(tmp_path / 'babycare.db'))
+
+
+def make_scheduler(rules, sent):
+    return ReminderScheduler(rules.db_path, [rules], [sent.append])
+
+
+def test_occurrences_fire_once_and_advance_next_due(rules):
+    rule = RecurrenceRule('hourly', START)
+    rule_id = rules.add_rule('parent@example.com', 'Feed', rule, START - timedelta(minutes=1))
+    sent = []
+    scheduler = make_scheduler(rules, sent)
+    assert scheduler.dispatch_due(START) == 1
+    assert scheduler.dispatch_due(START + timedelta(hours=1)) == 1
+    assert [r['due_at'] for r in sent] == [START, START + timedelta(hours=1)]
+    assert rules.rules_for('parent@example.com')[0]['next_due'] == '2026-01-05 10:00:00'
+    # A restarted process does not send them again
+    assert make_scheduler(rules, []).dispatch_due(START + timedelta(hours=1, minutes=1)) == 0
+    assert rule_key(rule_id, START) == f'rule:{rule_id}:202601050800'
+
+
+def test_rule_deleted_in_another_worker_stops_firing(rules):
+    rule_id = rules.add_rule('parent@example.com', 'Drops', RecurrenceRule('hourly', START),
+                             START - timedelta(minutes=1))
+    sent_1, sent_2 = [], []
+    worker_1, worker_2 = make_scheduler(rules, sent_1), make_scheduler(rules, sent_2)
+    worker_1.dispatch_due(START - timedelta(minutes=20))
+    worker_2.dispatch_due(START - timedelta(minutes=20))
+    assert worker_2.pending() == 1
+
+    assert rules.delete_rule(rule_id, 'parent@example.com')
+    worker_1.cancel_rule(rule_id)
+    assert worker_1.pending() == 0
+    assert worker_2.dispatch_due(START) == 0
+    assert sent_1 == sent_2 == []
+
+
+def test_stale_next_due_is_repaired_after_an_outage(rules):
+    rules.add_rule('parent@example.com', 'Vitamin D', RecurrenceRule('daily', START, times=[time(9)]), START)
+    sent = []
+    later = datetime(2026, 1, 20, 8, 50)
+    assert make_scheduler(rules, sent).dispatch_due(later) == 0
+    assert rules.rules_for('parent@example.com')[0]['next_due'] == '2026-01-20 09:00:00'
+
+    conn = sqlite3.connect(rules.db_path)
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM reminder_rules WHERE next_due > '' AND next_due <= 'z'")
+    assert 'idx_reminder_rules_due' in ' '.join(str(row) for row in plan)
+    conn.close()
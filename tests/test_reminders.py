@@ -0,0 +1,180 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from reminders import (OutboxSink, ReminderScheduler, SQLiteDeliveryLog, SQLiteReminderSource, TIME_FMT,
+                       due_at_for)
+
+NOW = datetime(2026, 10, 19, 12, 0)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'babycare.db')
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE reminders
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     user_id TEXT NOT NULL,
+                     message TEXT NOT NULL,
+                     remind_time TEXT NOT NULL,
+                     created_at TEXT NOT NULL)''')
+    conn.commit()
+    conn.close()
+    return path
+
+
+def add_reminder(db_path, due, message='Medicine', user_id='parent@example.com'):
+    conn = sqlite3.connect(db_path)
+    cur = conn.execute("INSERT INTO reminders (user_id, message, remind_time, created_at) VALUES (?, ?, ?, ?)",
+                       (user_id, message, due.strftime(TIME_FMT), (due - timedelta(hours=1)).strftime(TIME_FMT)))
+    conn.commit()
+    conn.close()
+    return cur.lastrowid
+
+
+def make_scheduler(db_path, sent):
+    return ReminderScheduler(db_path, [SQLiteReminderSource(db_path)], [sent.append])
+
+
+def test_fresh_scheduler_fires_reminders_due_within_grace(db_path):
+    add_reminder(db_path, NOW - timedelta(minutes=1))
+    sent = []
+    assert make_scheduler(db_path, sent).dispatch_due(NOW) == 1
+    assert [r['message'] for r in sent] == ['Medicine']
+
+
+def test_reminders_older_than_grace_are_not_fired(db_path):
+    add_reminder(db_path, NOW - timedelta(minutes=30))
+    sent = []
+    assert make_scheduler(db_path, sent).dispatch_due(NOW) == 0
+    assert sent == []
+
+
+def test_restarted_scheduler_does_not_fire_twice(db_path):
+    add_reminder(db_path, NOW - timedelta(minutes=1))
+    first, second = [], []
+    assert make_scheduler(db_path, first).dispatch_due(NOW) == 1
+    assert make_scheduler(db_path, second).dispatch_due(NOW + timedelta(minutes=1)) == 0
+    assert second == []
+
+
+def test_cancel_in_one_worker_stops_another(db_path):
+    reminder_id = add_reminder(db_path, NOW + timedelta(minutes=5))
+    sent_1, sent_2 = [], []
+    worker_1, worker_2 = make_scheduler(db_path, sent_1), make_scheduler(db_path, sent_2)
+    worker_1.dispatch_due(NOW)
+    worker_2.dispatch_due(NOW)
+    assert worker_2.pending() == 1
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("DELETE FROM reminders WHERE id = ?", (reminder_id,))
+    conn.commit()
+    conn.close()
+    worker_1.cancel(f'reminder:{reminder_id}')
+
+    assert worker_2.dispatch_due(NOW + timedelta(minutes=6)) == 0
+    assert worker_1.dispatch_due(NOW + timedelta(minutes=6)) == 0
+    assert sent_1 == sent_2 == []
+
+
+def test_reminder_deleted_after_loading_is_not_sent(db_path):
+    reminder_id = add_reminder(db_path, NOW + timedelta(minutes=5))
+    sent = []
+    scheduler = make_scheduler(db_path, sent)
+    scheduler.dispatch_due(NOW)
+    conn = sqlite3.connect(db_path)
+    conn.execute("DELETE FROM reminders WHERE id = ?", (reminder_id,))
+    conn.commit()
+    conn.close()
+    assert scheduler.dispatch_due(NOW + timedelta(minutes=6)) == 0
+    assert sent == []
+
+
+def test_outbox_sink_subject_is_one_line():
+    queued = []
+
+    class Outbox:
+        def enqueue(self, subject, body, to=None):
+            queued.append((subject, body, to))
+
+    OutboxSink(Outbox())({'id': 1, 'user_id': 'parent@example.com', 'message': 'Medicine\r\nBcc: x@example.com',
+                          'due_at': NOW})
+    subject, body, to = queued[0]
+    assert subject == 'Reminder: Medicine Bcc: x@example.com'
+    assert 'Medicine\r\nBcc: x@example.com' in body
+    assert to == 'parent@example.com'
+
+
+def test_due_at_for_clock_time_is_next_occurrence():
+    assert due_at_for('09:30', datetime(2026, 10, 19, 8, 0)) == datetime(2026, 10, 19, 9, 30)
+    assert due_at_for('07:00', datetime(2026, 10, 19, 8, 0)) == datetime(2026, 10, 20, 7, 0)
+    assert due_at_for('2026-12-01T10:15', NOW) == datetime(2026, 12, 1, 10, 15)
+
+
+def test_only_reminders_inside_the_horizon_are_loaded(db_path):
+    add_reminder(db_path, NOW + timedelta(minutes=20))
+    add_reminder(db_path, NOW + timedelta(hours=2), message='Later')
+    sent = []
+    scheduler = make_scheduler(db_path, sent)
+    scheduler.dispatch_due(NOW)
+    assert scheduler.pending() == 1
+
+    # The later reminder comes into view as the window slides forward
+    assert scheduler.dispatch_due(NOW + timedelta(minutes=100)) == 1
+    assert scheduler.pending() == 1
+    assert scheduler.dispatch_due(NOW + timedelta(hours=2)) == 1
+    assert [r['message'] for r in sent] == ['Medicine', 'Later']
+
+
+def test_add_and_cancel_inside_the_loaded_window(db_path):
+    sent = []
+    scheduler = make_scheduler(db_path, sent)
+    scheduler.dispatch_due(NOW)
+    reminder = {'id': 1, 'user_id': 'parent@example.com', 'message': 'Nap', 'due_at': NOW + timedelta(minutes=5)}
+    scheduler.add('manual:1', NOW + timedelta(minutes=5), reminder)
+    scheduler.add('manual:2', NOW + timedelta(minutes=6), dict(reminder, id=2))
+    # Past the loaded window: left for the range scan
+    scheduler.add('manual:3', NOW + timedelta(hours=3), dict(reminder, id=3))
+    assert scheduler.pending() == 2
+
+    scheduler.cancel('manual:2')
+    assert scheduler.dispatch_due(NOW + timedelta(minutes=10)) == 1
+    assert [r['id'] for r in sent] == [1]
+
+
+def test_claim_succeeds_once_per_key(db_path):
+    deliveries = SQLiteDeliveryLog(db_path)
+    assert deliveries.claim('reminder:1')
+    assert not deliveries.claim('reminder:1')
+    assert deliveries.claim('reminder:2')
+
+
+def test_failed_delivery_is_released_and_retried(db_path):
+    add_reminder(db_path, NOW)
+    attempts = []
+
+    def flaky_sink(reminder):
+        attempts.append(reminder['message'])
+        if len(attempts) == 1:
+            raise OSError('outbox unavailable')
+
+    scheduler = ReminderScheduler(db_path, [SQLiteReminderSource(db_path)], [flaky_sink])
+    assert scheduler.dispatch_due(NOW) == 0
+    # The claim was released, so the retry (or another process) can still deliver it
+    assert scheduler.dispatch_due(NOW + timedelta(seconds=30)) == 0
+    assert scheduler.dispatch_due(NOW + timedelta(minutes=1)) == 1
+    assert attempts == ['Medicine', 'Medicine']
+    assert scheduler.dispatch_due(NOW + timedelta(minutes=2)) == 0
+
+
+def test_failed_delivery_is_dropped_after_the_grace_period(db_path):
+    add_reminder(db_path, NOW)
+
+    def broken_sink(reminder):
+        raise OSError('outbox unavailable')
+
+    scheduler = ReminderScheduler(db_path, [SQLiteReminderSource(db_path)], [broken_sink])
+    for minute in range(0, 15):
+        scheduler.dispatch_due(NOW + timedelta(minutes=minute))
+    assert scheduler.pending() == 0